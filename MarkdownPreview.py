@@ -11,42 +11,53 @@ import json
 import time
 import codecs
 import cgi
+import threading
+import glob
 
 
 def is_ST3():
     ''' check if ST3 based on python version '''
     return sys.version_info >= (3, 0)
 
+_start = time.time()
 if is_ST3():
     from . import desktop
     from . import yaml
     from .settings import Settings
-    from .markdown_wrapper import StMarkdown as Markdown
+    from .build_cache import get_build_cache
+    from .critic import strip_critic
+    from .html_template import get_template, Page, DEFAULT_TEMPLATE, BODY_TEMPLATE
+    from .asset_cache import get_asset_cache, AssetInliner
+    from .github_client import get_github_client, split_markdown, merge_chunks, GithubError, GithubConnectionError, GITHUB_API_URL
+    from .markdown_wrapper import StMarkdownCache, record_startup_time, startup_report
+    from .stage_timer import StageTimer, PatternProfiler
     from .lib.markdown_preview_lib.pygments.formatters import HtmlFormatter
     from .helper import INSTALLED_DIRECTORY
-    from urllib.request import urlopen
-    from urllib.error import HTTPError, URLError
+    from . import headless
     from urllib.parse import quote
 
-    def Request(url, data, headers):
-        ''' Adapter for urllib2 used in ST2 '''
-        import urllib.request
-        return urllib.request.Request(url, data=data, headers=headers, method='POST')
-
     unicode_str = str
 
 else:
     import desktop
     import yaml
     from settings import Settings
-    from markdown_wrapper import StMarkdown as Markdown
+    from build_cache import get_build_cache
+    from critic import strip_critic
+    from html_template import get_template, Page, DEFAULT_TEMPLATE, BODY_TEMPLATE
+    from asset_cache import get_asset_cache, AssetInliner
+    from github_client import get_github_client, split_markdown, merge_chunks, GithubError, GithubConnectionError, GITHUB_API_URL
+    from markdown_wrapper import StMarkdownCache, record_startup_time, startup_report
+    from stage_timer import StageTimer, PatternProfiler
     from lib.markdown_preview_lib.pygments.formatters import HtmlFormatter
     from helper import INSTALLED_DIRECTORY
-    from urllib2 import Request, urlopen, HTTPError, URLError
+    import headless
     from urllib import quote
 
     unicode_str = unicode
 
+record_startup_time('total', _start)
+
 _CANNOT_CONVERT = u'cannot convert markdown'
 ABS_EXCLUDE = tuple(
     [
@@ -59,6 +70,67 @@ DEFAULT_EXT = [
     "meta", "sane_lists", "smarty", "wikilinks",
     "admonition"
 ]
+RE_WIN_DRIVE = re.compile(r"(^[A-Za-z]{1}:(?:\\|/))")
+# Sources to make absolute, keyed by whether images and files are converted
+RE_ABSOLUTE_SOURCES = dict(
+    (
+        (image_convert, file_convert),
+        re.compile(
+            r"""(?P<tag>(?P<begin><(?:%s%s%s)[^>]+(?:src%s)=["'])(?P<src>[^"']+)(?P<end>[^>]*>))""" % (
+                r"img" if image_convert else "",
+                r"|" if image_convert and file_convert else "",
+                r"script|a" if file_convert else "",
+                r"|href" if file_convert else ""
+            )
+        )
+    )
+    for image_convert in (True, False) for file_convert in (True, False)
+)
+RE_BASE64_SOURCES = re.compile(r"""(?P<tag>(?P<begin><(?:img)[^>]+(?:src)=["'])(?P<src>[^"']+)(?P<end>[^>]*>))""")
+# Strip out id, class and style attributes for a simple html output
+RE_SIMPLE_TAG = re.compile(
+    r'''(?P<open><[\w\:\.\-]+)(?P<attributes>(?:\s+[\w\-:]+(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'=<>`]+))?)*)(?P<close>\s*/?>)'''
+)
+RE_SIMPLE_ATTRIBUTE = re.compile(r'''\s+([\w\-:]+)(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'=<>`]+))?''')
+SIMPLE_EXCLUDE = ('id', 'class', 'style')
+RE_HEADER = re.compile(r'''(?P<open><h([1-6])>)(?P<text>.*?)(?P<close></h\2>)''', re.DOTALL)
+RE_HEADER_TAGS = re.compile(r'''</?[^>]*>''')
+RE_HEADER_WORD = re.compile(r'''[^\w\- ]''')
+BASE64_FILE_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif"
+}
+BASE64_EXCLUDE = tuple(
+    ['https://', 'http://', '#'] +
+    ["data:%s;base64," % ft for ft in BASE64_FILE_TYPES.values()]
+)
+PIPELINE_CACHE = StMarkdownCache()
+# Cached pipelines must not convert two documents at once
+PIPELINE_LOCK = threading.Lock()
+# Stylesheets, scripts and mathjax of the html head, see Compiler.get_head_assets
+HEAD_CACHE = {}
+HEAD_CACHE_ORDER = []
+HEAD_CACHE_SIZE = 32
+HEAD_LOCK = threading.Lock()
+# Pygments css, keyed by style
+HIGHLIGHT_CACHE = {}
+
+
+def plugin_loaded():
+    ''' drop cached markdown pipelines whenever the settings change '''
+    settings = sublime.load_settings('MarkdownPreview.sublime-settings')
+    if settings.get('show_startup_times', False):
+        print(startup_report())
+
+    def reload_pipelines():
+        PIPELINE_CACHE.clear()
+        PIPELINE_CACHE.resize(settings.get('markdown_pipeline_cache_size', 4))
+
+    settings.clear_on_change('markdown_pipeline_cache')
+    settings.add_on_change('markdown_pipeline_cache', reload_pipelines)
+    reload_pipelines()
 
 
 def getTempMarkdownPreviewPath(view):
@@ -131,6 +203,44 @@ def new_view(window, text, scratch=False):
     return new_view
 
 
+def cpu_count():
+    ''' return the number of CPUs, or 1 if it cannot be found '''
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+
+def settings_values(settings):
+    ''' return the values of the default and user settings, for the worker processes of a build '''
+    names = set(headless.parse_settings(load_resource(headless.SETTINGS_FILE)))
+    user_settings = os.path.join(sublime.packages_path(), 'User', headless.SETTINGS_FILE)
+    if os.path.isfile(user_settings):
+        names.update(headless.parse_settings(load_utf8(user_settings)))
+    return dict((name, settings.get(name)) for name in names if settings.has(name))
+
+
+def run_process(cmd, text):
+    '''
+    run cmd with text as its input and return its exit code, output and errors
+
+    The input is written at once while the output and errors are read
+    concurrently, so a big document can't fill a pipe and block the process.
+    '''
+    import subprocess
+    startupinfo = None
+    if sublime.platform() == "windows":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    p = subprocess.Popen(
+        cmd, startupinfo=startupinfo,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    output, errors = p.communicate(text.encode('utf-8'))
+    return p.returncode, output.decode('utf-8'), errors.decode('utf-8', 'replace')
+
+
 def get_references(file_name, encoding="utf-8"):
     """ Get footnote and general references from outside source """
     text = ''
@@ -146,58 +256,6 @@ def get_references(file_name, encoding="utf-8"):
     return text
 
 
-class CriticDump(object):
-    RE_CRITIC = re.compile(
-        r'''
-            ((?P<open>\{)
-                (?:
-                    (?P<ins_open>\+{2})(?P<ins_text>.*?)(?P<ins_close>\+{2})
-                  | (?P<del_open>\-{2})(?P<del_text>.*?)(?P<del_close>\-{2})
-                  | (?P<mark_open>\={2})(?P<mark_text>.*?)(?P<mark_close>\={2})
-                  | (?P<comment>(?P<com_open>\>{2})(?P<com_text>.*?)(?P<com_close>\<{2}))
-                  | (?P<sub_open>\~{2})(?P<sub_del_text>.*?)(?P<sub_mid>\~\>)(?P<sub_ins_text>.*?)(?P<sub_close>\~{2})
-                )
-            (?P<close>\})|.)
-        ''',
-        re.MULTILINE | re.DOTALL | re.VERBOSE
-    )
-
-    def process(self, m):
-        if self.accept:
-            if m.group('ins_open'):
-                return m.group('ins_text')
-            elif m.group('del_open'):
-                return ''
-            elif m.group('mark_open'):
-                return m.group('mark_text')
-            elif m.group('com_open'):
-                return ''
-            elif m.group('sub_open'):
-                return m.group('sub_ins_text')
-            else:
-                return m.group(0)
-        else:
-            if m.group('ins_open'):
-                return ''
-            elif m.group('del_open'):
-                return m.group('del_text')
-            elif m.group('mark_open'):
-                return m.group('mark_text')
-            elif m.group('com_open'):
-                return ''
-            elif m.group('sub_open'):
-                return m.group('sub_del_text')
-            else:
-                return m.group(0)
-
-    def dump(self, source, accept):
-        text = ''
-        self.accept = accept
-        for m in self.RE_CRITIC.finditer(source):
-            text += self.process(m)
-        return text
-
-
 class MarkdownPreviewListener(sublime_plugin.EventListener):
     ''' auto update the output html if markdown file has already been converted once '''
 
@@ -238,6 +296,10 @@ class Compiler(object):
     ''' Do the markdown converting '''
     default_css = "markdown.css"
 
+    def add_dependency(self, filename):
+        ''' remember the state of a file the output depends on '''
+        self.dependencies[filename] = self.settings.stat_cache.getmtime(filename)
+
     def isurl(self, css_name):
         match = re.match(r'https?://', css_name)
         if match:
@@ -251,7 +313,9 @@ class Compiler(object):
         if self.isurl(css_name):
             # link to remote URL
             return u"<link href='%s' rel='stylesheet' type='text/css'>" % css_name
-        elif os.path.isfile(os.path.expanduser(css_name)):
+        if css_name != 'default':
+            self.add_dependency(os.path.expanduser(css_name))
+        if self.settings.stat_cache.isfile(os.path.expanduser(css_name)):
             # use custom CSS file
             return u"<style>%s</style>" % load_utf8(os.path.expanduser(css_name))
         elif css_name == 'default':
@@ -271,7 +335,8 @@ class Compiler(object):
                 for filetype in filetypes:
                     if filename.endswith(filetype):
                         css_filename = filename.rpartition(filetype)[0] + '.css'
-                        if (os.path.isfile(css_filename)):
+                        self.add_dependency(css_filename)
+                        if self.settings.stat_cache.isfile(css_filename):
                             return u"<style>%s</style>" % load_utf8(css_filename)
         return ''
 
@@ -291,6 +356,7 @@ class Compiler(object):
             if isinstance(js_files, list):
                 for js_file in js_files:
                     if os.path.isabs(js_file):
+                        self.add_dependency(js_file)
                         # Load the script inline to avoid cross-origin.
                         scripts += u"<script>%s</script>" % load_utf8(js_file)
                     else:
@@ -307,6 +373,53 @@ class Compiler(object):
     def get_highlight(self):
         return ''
 
+    def get_head_assets(self, stylesheet=True):
+        '''
+        return the stylesheet, scripts and mathjax of the html head.
+
+        They are only built again when the settings they use or one of the
+        files they read changed since the last render.
+        '''
+        key = (
+            self.default_css, stylesheet, self.view.file_name(),
+            json.dumps([
+                self.settings.get(name) for name in
+                ('css', 'allow_css_overrides', 'markdown_filetypes', 'js', 'enable_mathjax')
+            ])
+        )
+        with HEAD_LOCK:
+            entry = HEAD_CACHE.get(key)
+        if entry is not None:
+            assets, files = entry
+            for filename, mtime in files:
+                if self.settings.stat_cache.getmtime(filename) != mtime:
+                    break
+            else:
+                for filename, mtime in files:
+                    self.add_dependency(filename)
+                return assets
+
+        # record the files read while building them
+        dependencies = self.dependencies
+        self.dependencies = {}
+        try:
+            assets = (
+                self.get_stylesheet() if stylesheet else '',
+                self.get_javascript(),
+                self.get_mathjax()
+            )
+            files = list(self.dependencies.items())
+        finally:
+            dependencies.update(self.dependencies)
+            self.dependencies = dependencies
+        with HEAD_LOCK:
+            if key not in HEAD_CACHE:
+                HEAD_CACHE_ORDER.append(key)
+                if len(HEAD_CACHE_ORDER) > HEAD_CACHE_SIZE:
+                    del HEAD_CACHE[HEAD_CACHE_ORDER.pop(0)]
+            HEAD_CACHE[key] = (assets, files)
+        return assets
+
     def get_contents(self, wholefile=False):
         ''' Get contents or selection from view and optionally strip the YAML front matter '''
         region = sublime.Region(0, self.view.size())
@@ -319,20 +432,27 @@ class Compiler(object):
 
         # Remove yaml front matter
         if self.settings.get('strip_yaml_front_matter') and contents.startswith('---'):
-            frontmatter, contents = self.preprocessor_yaml_frontmatter(contents)
+            frontmatter, contents = self.timed(
+                'yaml front matter', self.preprocessor_yaml_frontmatter, contents, sizes=False
+            )
             self.settings.apply_frontmatter(frontmatter)
 
         references = self.settings.get('builtin').get('references', [])
         for ref in references:
+            self.add_dependency(ref)
             contents += get_references(ref)
 
-        contents = self.parser_specific_preprocess(contents)
+        contents = self.timed('preprocess', self.parser_specific_preprocess, contents)
 
         return contents
 
     def parser_specific_preprocess(self, text):
         return text
 
+    def preprocessor_critic(self, text):
+        ''' Stip out multi-markdown critic marks.  Accept changes by default '''
+        return strip_critic(text, self.settings.get("strip_critic_marks", "accept"))
+
     def preprocessor_yaml_frontmatter(self, text):
         """ Get frontmatter from string """
         frontmatter = {}
@@ -351,176 +471,160 @@ class Compiler(object):
     def parser_specific_postprocess(self, text):
         return text
 
-    def postprocessor_absolute(self, html, image_convert, file_convert):
-        ''' fix relative paths in images, scripts, and links for the internal parser '''
-        def tag_fix(m):
-            tag = m.group('tag')
-            src = m.group('src')
-            filename = self.view.file_name()
-            if filename:
-                if (
-                    not src.startswith(ABS_EXCLUDE) and
-                    not (sublime.platform() == "windows" and RE_WIN_DRIVE.match(src) is not None)
-                ):
-                    # Don't explicitly add file:// prefix,
-                    # But don't remove them either
-                    abs_path = u'%s/%s' % (os.path.dirname(filename), src)
-                    # Don't replace just the first instance,
-                    # but explicitly place it where it was before
-                    # to ensure a file name 'img' dosen't replace
-                    # the tag name etc.
-                    if os.path.exists(abs_path):
-                        tag = m.group('begin') + abs_path + m.group('end')
-            return tag
-        # Compile the appropriate regex to find images and/or files
-        RE_WIN_DRIVE = re.compile(r"(^[A-Za-z]{1}:(?:\\|/))")
-        RE_SOURCES = re.compile(
-            r"""(?P<tag>(?P<begin><(?:%s%s%s)[^>]+(?:src%s)=["'])(?P<src>[^"']+)(?P<end>[^>]*>))""" % (
-                r"img" if image_convert else "",
-                r"|" if image_convert and file_convert else "",
-                r"script|a" if file_convert else "",
-                r"|href" if file_convert else ""
+    def fix_absolute_source(self, m):
+        ''' fix a relative path in an image, script or link tag for the internal parser '''
+        tag = m.group('tag')
+        src = m.group('src')
+        filename = self.view.file_name()
+        if filename:
+            if (
+                not src.startswith(ABS_EXCLUDE) and
+                not (sublime.platform() == "windows" and RE_WIN_DRIVE.match(src) is not None)
+            ):
+                # Don't explicitly add file:// prefix,
+                # But don't remove them either
+                abs_path = u'%s/%s' % (os.path.dirname(filename), src)
+                self.add_dependency(abs_path)
+                # Don't replace just the first instance,
+                # but explicitly place it where it was before
+                # to ensure a file name 'img' dosen't replace
+                # the tag name etc.
+                if self.settings.stat_cache.exists(abs_path):
+                    tag = m.group('begin') + abs_path + m.group('end')
+        return tag
+
+    def get_asset_inliner(self):
+        ''' return the AssetInliner embedding the images of this render '''
+        if self.assets is None:
+            self.assets = AssetInliner(
+                get_asset_cache(int(self.settings.get('base64_cache_size', 32) * 1024 * 1024)),
+                self.settings.stat_cache,
+                max_image=int(self.settings.get('base64_max_image_size', 0) * 1024),
+                max_total=int(self.settings.get('base64_max_total_size', 0) * 1024),
+                jobs=self.settings.get('base64_jobs', 4)
             )
-        )
-        return RE_SOURCES.sub(tag_fix, html)
-
-    def postprocessor_base64(self, html):
-        ''' convert resources (currently images only) to base64 '''
+        return self.assets
 
-        file_types = {
-            ".png": "image/png",
-            ".jpg": "image/jpeg",
-            ".jpeg": "image/jpeg",
-            ".gif": "image/gif"
-        }
-
-        exclusion_list = tuple(
-            ['https://', 'http://', '#'] +
-            ["data:%s;base64," % ft for ft in file_types.values()]
-        )
+    def get_base64_path(self, src):
+        ''' return the file an image source embedded in base64 points to, or None '''
+        base_path = self.settings.get("basepath")
+        if base_path is None:
+            base_path = ""
 
-        def b64(m):
-            import base64
-            src = m.group('src')
-            data = m.group('tag')
-            base_path = self.settings.get("basepath")
-            if base_path is None:
-                base_path = ""
-
-            # Format the link
-            absolute = False
-            if src.startswith('file://'):
-                src = src.replace('file://', '', 1)
-                if sublime.platform() == "windows" and not src.startswith('//'):
-                    src = src.lstrip("/")
-                absolute = True
-            elif sublime.platform() == "windows" and RE_WIN_DRIVE.match(src) is not None:
-                absolute = True
-
-            # Make sure we are working with an absolute path
-            if not src.startswith(exclusion_list):
-                if absolute:
-                    src = os.path.normpath(src)
-                else:
-                    src = os.path.normpath(os.path.join(base_path, src))
-
-                if os.path.exists(src):
-                    ext = os.path.splitext(src)[1].lower()
-                    if ext in file_types:
-                        try:
-                            with open(src, "rb") as f:
-                                data = m.group('begin') + "data:%s;base64,%s" % (
-                                    file_types[ext],
-                                    base64.b64encode(f.read()).decode('ascii')
-                                ) + m.group('end')
-                        except Exception:
-                            pass
-            return data
-        RE_WIN_DRIVE = re.compile(r"(^[A-Za-z]{1}:(?:\\|/))")
-        RE_SOURCES = re.compile(r"""(?P<tag>(?P<begin><(?:img)[^>]+(?:src)=["'])(?P<src>[^"']+)(?P<end>[^>]*>))""")
-        return RE_SOURCES.sub(b64, html)
-
-    def postprocessor_simple(self, html):
-        ''' Strip out ids and classes for a simplified HTML output '''
-        def strip_html(m):
-            tag = m.group('open')
-            if m.group('attr1'):
-                tag += m.group('attr1')
-            if m.group('attr2'):
-                tag += m.group('attr2')
-            if m.group('attr3'):
-                tag += m.group('attr3')
-            if m.group('attr4'):
-                tag += m.group('attr4')
-            if m.group('attr5'):
-                tag += m.group('attr5')
-            if m.group('attr6'):
-                tag += m.group('attr6')
-            tag += m.group('close')
+        # Format the link
+        absolute = False
+        if src.startswith('file://'):
+            src = src.replace('file://', '', 1)
+            if sublime.platform() == "windows" and not src.startswith('//'):
+                src = src.lstrip("/")
+            absolute = True
+        elif sublime.platform() == "windows" and RE_WIN_DRIVE.match(src) is not None:
+            absolute = True
+
+        # Make sure we are working with an absolute path
+        if src.startswith(BASE64_EXCLUDE):
+            return None
+        elif absolute:
+            return os.path.normpath(src)
+        return os.path.normpath(os.path.join(base_path, src))
+
+    def prefetch_base64_sources(self, html):
+        ''' read the images to embed in base64 concurrently '''
+        paths = []
+        for m in RE_BASE64_SOURCES.finditer(html):
+            src = self.get_base64_path(m.group('src'))
+            if src is not None:
+                paths.append(src)
+        self.get_asset_inliner().prefetch(paths)
+
+    def fix_base64_source(self, m):
+        ''' convert an image tag's source (currently images only) to base64 '''
+        src = self.get_base64_path(m.group('src'))
+        data = m.group('tag')
+        if src is not None:
+            self.add_dependency(src)
+            uri = self.get_asset_inliner().inline(src)
+            if uri is not None:
+                data = m.group('begin') + uri + m.group('end')
+        return data
+
+    def fix_simple_attributes(self, m):
+        ''' Strip out ids, classes and styles of a tag for a simplified HTML output '''
+        attributes = [
+            a.group(0) for a in RE_SIMPLE_ATTRIBUTE.finditer(m.group('attributes'))
+            if a.group(1) not in SIMPLE_EXCLUDE
+        ]
+        return m.group('open') + ''.join(attributes) + m.group('close')
+
+    def inject_header_id(self, tag, text, unique):
+        ''' Insert an id built from its text in a header tag '''
+        # Strip html tags and lower
+        id = RE_HEADER_TAGS.sub('', text).lower()
+        # Remove non word characters or non spaces and dashes
+        # Then convert spaces to dashes
+        id = RE_HEADER_WORD.sub('', id).replace(' ', '-')
+        # Encode anything that needs to be
+        id = quote(id)
+        if id == '':
             return tag
+        # Append a dash and number for uniqueness if needed
+        value = unique.get(id, None)
+        if value is None:
+            unique[id] = 1
+        else:
+            unique[id] += 1
+            id += "-%d" % value
+        return tag[:-1] + (' id="%s">' % id)
 
-        # Strip out id, class and style attributes for a simple html output
-        # Since we are stripping out two attributes, we need to set up the groups in such
-        # a way so we can retrieve the data we don't want to throw away
-        # up to these worst case scenarios:
-        #
-        # <tag attr=""... (id|class|style)=""... attr=""... (id|class|style)=""... attr=""... (id|class|style)=""...>
-        # <tag (id|class|style)=""... attr=""... (id|class|style)=""... attr=""... (id|class|style)=""... attr=""...>
-        STRIP_HTML = re.compile(
-            r'''
-                (?P<open><[\w\:\.\-]+)                                                      # Tag open
-                (?:
-                    (?P<attr1>(?:\s+(?!id|class|style)[\w\-:]+(?:\s*=\s*(?:"[^"]*"|'[^']*'))?)*)  # Attributes to keep
-                  | (?P<target1>\s+(?:id|class|style)(?:\s*=\s*(?:"[^"]*"|'[^']*'))*)             # Attributes to delte
-                )
-                (?:
-                    (?P<attr2>(?:\s+(?!id|class|style)[\w\-:]+(?:\s*=\s*(?:"[^"]*"|'[^']*'))?)*)  # Attributes to keep
-                  | (?P<target2>\s+(?:id|class|style)(?:\s*=\s*(?:"[^"]*"|'[^']*'))*)             # Attributes to delte
-                )?
-                (?:
-                    (?P<attr3>(?:\s+(?!id|class|style)[\w\-:]+(?:\s*=\s*(?:"[^"]*"|'[^']*'))?)*)  # Attributes to keep
-                  | (?P<target3>\s+(?:id|class|style)(?:\s*=\s*(?:"[^"]*"|'[^']*'))*)             # Attributes to delte
-                )?
-                (?:
-                    (?P<attr4>(?:\s+(?!id|class|style)[\w\-:]+(?:\s*=\s*(?:"[^"]*"|'[^']*'))?)*)  # Attributes to keep
-                  | (?P<target4>\s+(?:id|class|style)(?:\s*=\s*(?:"[^"]*"|'[^']*'))*)             # Attributes to delte
-                )?
-                (?:
-                    (?P<attr5>(?:\s+(?!id|class|style)[\w\-:]+(?:\s*=\s*(?:"[^"]*"|'[^']*'))?)*)  # Attributes to keep
-                  | (?P<target5>\s+(?:id|class|style)(?:\s*=\s*(?:"[^"]*"|'[^']*'))*)             # Attributes to delte
-                )?
-                (?:
-                    (?P<attr6>(?:\s+(?!id|class|style)[\w\-:]+(?:\s*=\s*(?:"[^"]*"|'[^']*'))?)*)  # Attributes to keep
-                  | (?P<target6>\s+(?:id|class|style)(?:\s*=\s*(?:"[^"]*"|'[^']*'))*)             # Attributes to delte
-                )?
-                (?P<close>\s*(?:\/?)>)                                                      # Tag end
-            ''',
-            re.MULTILINE | re.DOTALL | re.VERBOSE
-        )
-        return STRIP_HTML.sub(strip_html, html)
-
-    def convert_markdown(self, markdown_text):
-        ''' convert input markdown to HTML, with github or builtin parser '''
-
-        markdown_html = self.parser_specific_convert(markdown_text)
+    def header_ids_enabled(self):
+        ''' check if ids should be injected in headers without one '''
+        return False
 
+    def get_tag_processors(self):
+        '''
+        return the substitutions to apply to the html tags, in order, as
+        (regex, function) pairs.
+        '''
         image_convert = self.settings.get("image_path_conversion", "absolute")
         file_convert = self.settings.get("file_path_conversions", "absolute")
-
-        markdown_html = self.parser_specific_postprocess(markdown_html)
-
+        processors = []
         if "absolute" in (image_convert, file_convert):
-            markdown_html = self.postprocessor_absolute(markdown_html, image_convert, file_convert)
-
+            processors.append((
+                RE_ABSOLUTE_SOURCES[(bool(image_convert), bool(file_convert))],
+                self.fix_absolute_source
+            ))
         if image_convert == "base64":
-            markdown_html = self.postprocessor_base64(markdown_html)
-
+            processors.append((RE_BASE64_SOURCES, self.fix_base64_source))
         if self.settings.get("html_simple", False):
-            markdown_html = self.postprocessor_simple(markdown_html)
+            processors.append((RE_SIMPLE_TAG, self.fix_simple_attributes))
+        return processors
+
+    def postprocess_html(self, html):
+        ''' Inject header ids, fix paths, inline images and strip attributes '''
+        if self.settings.get("image_path_conversion", "absolute") == "base64":
+            self.prefetch_base64_sources(html)
+        if self.header_ids_enabled():
+            unique = {}
+
+            def inject_id(m):
+                return self.inject_header_id(m.group('open'), m.group('text'), unique) + m.group(0)[m.end('open') - m.start():]
+
+            html = RE_HEADER.sub(inject_id, html)
+        for regex, function in self.get_tag_processors():
+            html = regex.sub(function, html)
+        return html
 
-        return markdown_html
+    def convert_markdown(self, markdown_text):
+        ''' convert input markdown to HTML, with github or builtin parser '''
 
-    def get_title(self):
+        markdown_html = self.timed('convert', self.parser_specific_convert, markdown_text)
+
+        markdown_html = self.timed('postprocess', self.parser_specific_postprocess, markdown_html)
+
+        return self.timed('postprocess html', self.postprocess_html, markdown_html)
+
+    def get_title_text(self):
+        ''' return the title of the document, from its meta data or its file name '''
         if self.meta_title is not None:
             title = self.meta_title
         else:
@@ -528,7 +632,10 @@ class Compiler(object):
         if not title:
             fn = self.view.file_name()
             title = 'untitled' if not fn else os.path.splitext(os.path.basename(fn))[0]
-        return '<title>%s</title>' % cgi.escape(title)
+        return title
+
+    def get_title(self):
+        return '<title>%s</title>' % cgi.escape(self.get_title_text())
 
     def get_meta(self):
         self.meta_title = None
@@ -550,167 +657,158 @@ class Compiler(object):
                 )
         return '\n'.join(meta)
 
-    def run(self, view, wholefile=False):
-        ''' return full html and body html for view. '''
+    def setup(self, view):
+        ''' load the settings for view '''
         self.settings = Settings('MarkdownPreview.sublime-settings', view.file_name())
         self.view = view
+        self.dependencies = {}
+        self.assets = None
+        self.toc = u''
+        # a StageTimer recording how long each stage of the render takes
+        self.timer = None
+        # a PatternProfiler recording the inline patterns of the python-markdown parser
+        self.pattern_profiler = None
+
+    def timed(self, name, function, data, sizes=True):
+        ''' return function(data), timed as the stage name when there is a timer '''
+        if self.timer is None:
+            return function(data)
+        return self.timer.run(name, function, data, sizes)
+
+    def run(self, view, wholefile=False):
+        ''' return full html and body html for view. '''
+        self.setup(view)
+        return self.render(self.get_contents(wholefile))
 
-        contents = self.get_contents(wholefile)
+    def run_page(self, view, wholefile=False):
+        ''' return the page for view. '''
+        self.setup(view)
+        return self.render_page(self.get_contents(wholefile))
 
+    def render_page(self, contents):
+        ''' return the page for the contents of the view '''
         body = self.convert_markdown(contents)
 
         html_template = self.settings.get('html_template')
+        if html_template:
+            self.add_dependency(html_template)
 
         # use customized html template if given
         if self.settings.get('html_simple', False):
-            html = body
-        elif html_template and os.path.exists(html_template):
-            head = u''
-            head += self.get_meta()
-            if not self.settings.get('skip_default_stylesheet'):
-                head += self.get_stylesheet()
-            head += self.get_javascript()
-            head += self.get_highlight()
-            head += self.get_mathjax()
-            head += self.get_title()
-
-            html = load_utf8(html_template)
-            html = html.replace('{{ HEAD }}', head, 1)
-            html = html.replace('{{ BODY }}', body, 1)
+            return Page(BODY_TEMPLATE, {'BODY': body})
+        elif html_template and self.settings.stat_cache.exists(html_template):
+            template = get_template(html_template, self.settings.stat_cache.getmtime(html_template))
+            stylesheet, javascript, mathjax = self.get_head_assets(
+                not self.settings.get('skip_default_stylesheet')
+            )
         else:
-            html = u'<!DOCTYPE html>'
-            html += '<html><head><meta charset="utf-8">'
-            html += self.get_meta()
-            html += self.get_stylesheet()
-            html += self.get_javascript()
-            html += self.get_highlight()
-            html += self.get_mathjax()
-            html += self.get_title()
-            html += '</head><body>'
-            html += body
-            html += '</body>'
-            html += '</html>'
-
-        return html, body
+            template = DEFAULT_TEMPLATE
+            stylesheet, javascript, mathjax = self.get_head_assets()
+
+        meta = self.get_meta()
+        head = u''.join([
+            # the meta tags go in the head unless the template places them
+            u'' if 'META' in template else meta,
+            stylesheet,
+            javascript,
+            self.get_highlight(),
+            mathjax,
+            self.get_title()
+        ])
+        return Page(template, {
+            'HEAD': head,
+            'BODY': body,
+            'META': meta,
+            'TITLE': cgi.escape(self.get_title_text()),
+            'TOC': self.toc
+        })
+
+    def render(self, contents):
+        ''' return full html and body html for the contents of the view. '''
+        page = self.render_page(contents)
+        return page.html(), page.body
 
 
 class GithubCompiler(Compiler):
     default_css = "github.css"
 
-    def curl_convert(self, data):
-        try:
-            import subprocess
-
-            # It looks like the text does NOT need to be escaped and
-            # surrounded with double quotes.
-            # Tested in ubuntu 13.10, python 2.7.5+
-            shell_safe_json = data.decode('utf-8')
-            curl_args = [
-                'curl',
-                '-H',
-                'Content-Type: application/json',
-                '-d',
-                shell_safe_json,
-                'https://api.github.com/markdown'
-            ]
-
-            github_oauth_token = self.settings.get('github_oauth_token')
-            if github_oauth_token:
-                curl_args[1:1] = [
-                    '-u',
-                    github_oauth_token
-                ]
-
-            markdown_html = subprocess.Popen(curl_args, stdout=subprocess.PIPE).communicate()[0].decode('utf-8')
-            return markdown_html
-        except subprocess.CalledProcessError:
-            sublime.error_message('cannot use github API to convert markdown. SSL is not included in your Python installation. And using curl didn\'t work either')
-        return None
+    def builtin_convert(self, markdown_text):
+        ''' convert with the builtin parser when the github API can't be reached '''
+        compiler = MarkdownCompiler()
+        compiler.settings = self.settings
+        compiler.view = self.view
+        compiler.dependencies = self.dependencies
+        compiler.assets = self.get_asset_inliner()
+        compiler.timer = self.timer
+        compiler.pattern_profiler = self.pattern_profiler
+        self.builtin_compiler = compiler
+        markdown_html = compiler.parser_specific_convert(markdown_text)
+        self.toc = compiler.toc
+        return markdown_html
 
-    def preprocessor_critic(self, text):
-        ''' Stip out multi-markdown critic marks.  Accept changes by default '''
-        return CriticDump().dump(text, self.settings.get("strip_critic_marks", "accept") == "accept")
+    def get_highlight(self):
+        ''' return the Pygments css if the builtin parser was used '''
+        if self.builtin_compiler is not None:
+            return self.builtin_compiler.get_highlight()
+        return ''
 
     def parser_specific_preprocess(self, text):
-        if self.settings.get("strip_critic_marks", "accept") in ["accept", "reject"]:
+        if self.settings.get("strip_critic_marks", "accept") in ["accept", "reject", "view"]:
             text = self.preprocessor_critic(text)
         return text
 
-    def parser_specific_postprocess(self, html):
-        ''' Post-processing for github API '''
-
-        if self.settings.get("github_inject_header_ids", False):
-            html = self.postprocess_inject_header_id(html)
-        return html
-
-    def postprocess_inject_header_id(self, html):
-        ''' Insert header ids when no anchors are present '''
-        unique = {}
-
-        def header_to_id(text):
-            if text is None:
-                return ''
-            # Strip html tags and lower
-            id = RE_TAGS.sub('', text).lower()
-            # Remove non word characters or non spaces and dashes
-            # Then convert spaces to dashes
-            id = RE_WORD.sub('', id).replace(' ', '-')
-            # Encode anything that needs to be
-            return quote(id)
-
-        def inject_id(m):
-            id = header_to_id(m.group('text'))
-            if id == '':
-                return m.group(0)
-            # Append a dash and number for uniqueness if needed
-            value = unique.get(id, None)
-            if value is None:
-                unique[id] = 1
-            else:
-                unique[id] += 1
-                id += "-%d" % value
-            return m.group('open')[:-1] + (' id="%s">' % id) + m.group('text') + m.group('close')
-
-        RE_TAGS = re.compile(r'''</?[^>]*>''')
-        RE_WORD = re.compile(r'''[^\w\- ]''')
-        RE_HEADER = re.compile(r'''(?P<open><h([1-6])>)(?P<text>.*?)(?P<close></h\2>)''', re.DOTALL)
-        return RE_HEADER.sub(inject_id, html)
+    def header_ids_enabled(self):
+        ''' check if ids should be injected in headers without one '''
+        return self.settings.get("github_inject_header_ids", False)
 
     def parser_specific_convert(self, markdown_text):
         ''' convert input markdown to HTML, with github or builtin parser '''
 
         markdown_html = _CANNOT_CONVERT
+        self.builtin_compiler = None
         github_oauth_token = self.settings.get('github_oauth_token')
 
         # use the github API
         sublime.status_message('converting markdown with github API...')
         github_mode = self.settings.get('github_mode', 'gfm')
-        data = {
-            "text": markdown_text,
-            "mode": github_mode
-        }
-        data = json.dumps(data).encode('utf-8')
+        cache_dir = None
+        if self.settings.get('github_disk_cache', True):
+            cache_dir = os.path.join(tempfile.gettempdir(), 'MarkdownPreviewGithubCache')
+        client = get_github_client(
+            self.settings.get('github_api_url', GITHUB_API_URL),
+            cache_dir,
+            self.settings.get('github_cache_size', 50),
+            self.settings.get('github_cache_ttl', 3600)
+        )
 
+        chunk_size = self.settings.get('github_chunk_size', 0)
         try:
-            headers = {
-                'Content-Type': 'application/json'
-            }
-            if github_oauth_token:
-                headers['Authorization'] = "token %s" % github_oauth_token
-            url = "https://api.github.com/markdown"
-            sublime.status_message(url)
-            request = Request(url, data, headers)
-            markdown_html = urlopen(request).read().decode('utf-8')
-        except HTTPError:
+            if chunk_size > 0 and len(markdown_text) > chunk_size:
+                # render large documents in parts, concurrently
+                markdown_html = merge_chunks(client.render_chunks(
+                    split_markdown(markdown_text, chunk_size),
+                    github_mode,
+                    github_oauth_token,
+                    self.settings.get('github_jobs', 4)
+                ))
+            else:
+                markdown_html = client.render(markdown_text, github_mode, github_oauth_token)
+        except GithubError:
             e = sys.exc_info()[1]
             if e.code == 401:
                 sublime.error_message('github API auth failed. Please check your OAuth token.')
             else:
                 sublime.error_message('github API responded in an unfashion way :/')
-        except URLError:
-            # Maybe this is a Linux-install of ST which doesn't bundle with SSL support
-            # So let's try wrapping curl instead
-            markdown_html = self.curl_convert(data)
+        except GithubConnectionError:
+            # No network, or a Linux-install of ST which doesn't bundle with SSL support:
+            # render with the builtin parser instead if allowed
+            e = sys.exc_info()[1]
+            print(e)
+            if self.settings.get('github_offline_fallback', True):
+                sublime.status_message('cannot reach github API, converted markdown with Python markdown')
+                markdown_html = self.builtin_convert(markdown_text)
+            else:
+                sublime.error_message('cannot reach github API: %s' % e)
         except:
             e = sys.exc_info()[1]
             print(e)
@@ -726,7 +824,6 @@ class MultiMarkdownCompiler(Compiler):
     default_css = "markdown.css"
 
     def parser_specific_convert(self, markdown_text):
-        import subprocess
         binary = self.settings.get("multimarkdown_binary", "")
         if os.path.exists(binary):
             cmd = [binary]
@@ -734,25 +831,12 @@ class MultiMarkdownCompiler(Compiler):
             if critic_mode in ("accept", "reject"):
                 cmd.append('-a' if critic_mode == "accept" else '-r')
             sublime.status_message('converting markdown with multimarkdown...')
-            if sublime.platform() == "windows":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                p = subprocess.Popen(
-                    cmd, startupinfo=startupinfo,
-                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-                )
-            else:
-                p = subprocess.Popen(
-                    cmd,
-                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-                )
-            for line in markdown_text.split('\n'):
-                p.stdin.write((line + '\n').encode('utf-8'))
-            markdown_html = p.communicate()[0].decode("utf-8")
-            if p.returncode:
+            returncode, markdown_html, errors = run_process(cmd, markdown_text + '\n')
+            if returncode:
                 # Log info to console
                 sublime.error_message("Could not convert file! See console for more info.")
                 print(markdown_html)
+                print(errors)
                 markdown_html = _CANNOT_CONVERT
         else:
             sublime.error_message("Cannot find multimarkdown binary!")
@@ -768,16 +852,16 @@ class MarkdownCompiler(Compiler):
 
         highlight = ''
         if self.pygments_style and not self.noclasses:
-            highlight += '<style>%s</style>' % HtmlFormatter(style=self.pygments_style).get_style_defs('.codehilite pre')
+            highlight = HIGHLIGHT_CACHE.get(self.pygments_style)
+            if highlight is None:
+                highlight = HIGHLIGHT_CACHE[self.pygments_style] = '<style>%s</style>' % HtmlFormatter(
+                    style=self.pygments_style
+                ).get_style_defs('.codehilite pre')
 
         return highlight
 
-    def preprocessor_critic(self, text):
-        ''' Stip out multi-markdown critic marks.  Accept changes by default '''
-        return CriticDump().dump(text, self.settings.get("strip_critic_marks", "accept") == "accept")
-
     def parser_specific_preprocess(self, text):
-        if self.settings.get("strip_critic_marks", "accept") in ["accept", "reject"]:
+        if self.settings.get("strip_critic_marks", "accept") in ["accept", "reject", "view"]:
             text = self.preprocessor_critic(text)
         return text
 
@@ -833,7 +917,7 @@ class MarkdownCompiler(Compiler):
     def get_config_extensions(self, default_extensions):
         config_extensions = self.settings.get('enabled_extensions')
         if not config_extensions or config_extensions == 'default':
-            return self.process_extensions(default_extensions)
+            return self.process_extensions(default_extensions[:])
         if 'default' in config_extensions:
             config_extensions.remove('default')
             config_extensions.extend(default_extensions)
@@ -842,13 +926,64 @@ class MarkdownCompiler(Compiler):
     def parser_specific_convert(self, markdown_text):
         sublime.status_message('converting markdown with Python markdown...')
         config_extensions = self.get_config_extensions(DEFAULT_EXT)
-        md = Markdown(extensions=config_extensions)
-        html_text = md.convert(markdown_text)
-        # Retrieve the meta data returned from the "meta" extension
-        self.settings.add_meta(md.Meta)
+        with PIPELINE_LOCK:
+            md = PIPELINE_CACHE.get(
+                config_extensions,
+                incremental=bool(self.settings.get('enable_incremental_render', False)),
+                linear_inline=bool(self.settings.get('enable_linear_inline', False))
+            )
+            md.stat_cache = self.settings.stat_cache
+            md.asset_inliner = self.get_asset_inliner()
+            md.dependency_callback = self.add_dependency
+            md.stage_timer = self.timer
+            md.pattern_profiler = self.pattern_profiler
+            try:
+                html_text = md.convert(markdown_text)
+            finally:
+                md.stat_cache = None
+                md.asset_inliner = None
+                md.dependency_callback = None
+                md.stage_timer = None
+                md.pattern_profiler = None
+            # Retrieve the meta data returned from the "meta" extension
+            self.settings.add_meta(md.Meta)
+            # and the table of contents of the "toc" extension
+            self.toc = getattr(md, 'toc', u'')
         return html_text
 
 
+def get_compiler(parser):
+    ''' return a compiler for the parser name '''
+    if parser == "github":
+        return GithubCompiler()
+    elif parser == "multimarkdown":
+        return MultiMarkdownCompiler()
+    return MarkdownCompiler()
+
+
+class FileView(object):
+    ''' The parts of a view compilers use, for a markdown file that is not open '''
+
+    def __init__(self, file_name):
+        self._file_name = file_name
+        self._text = load_utf8(file_name)
+
+    def file_name(self):
+        return self._file_name
+
+    def name(self):
+        return ''
+
+    def id(self):
+        return 0
+
+    def size(self):
+        return len(self._text)
+
+    def substr(self, region):
+        return self._text[region.begin():region.end()]
+
+
 class MarkdownPreviewSelectCommand(sublime_plugin.TextCommand):
     def run(self, edit, target='browser'):
         parsers = [
@@ -901,16 +1036,12 @@ class MarkdownPreviewCommand(sublime_plugin.TextCommand):
         self.view.settings().set('parser', parser)
         self.view.settings().set('target', target)
 
-        if parser == "github":
-            compiler = GithubCompiler()
-        elif parser == "multimarkdown":
-            compiler = MultiMarkdownCompiler()
-        else:
-            compiler = MarkdownCompiler()
+        compiler = get_compiler(parser)
 
-        html, body = compiler.run(self.view)
+        page = compiler.run_page(self.view)
 
         if target in ['disk', 'browser']:
+            livereload = u''
             # do not use LiveReload unless autoreload is enabled
             if settings.get('enable_autoreload', True):
                 # check if LiveReload ST2 extension installed and add its script to the resulting HTML
@@ -918,10 +1049,10 @@ class MarkdownPreviewCommand(sublime_plugin.TextCommand):
                 # build the html
                 if livereload_installed:
                     port = sublime.load_settings('LiveReload.sublime-settings').get('port', 35729)
-                    html += '<script>document.write(\'<script src="http://\' + (location.host || \'localhost\').split(\':\')[0] + \':%d/livereload.js?snipver=1"></\' + \'script>\')</script>' % port
+                    livereload = '<script>document.write(\'<script src="http://\' + (location.host || \'localhost\').split(\':\')[0] + \':%d/livereload.js?snipver=1"></\' + \'script>\')</script>' % port
             # update output html file
             tmp_fullpath = getTempMarkdownPreviewPath(self.view)
-            save_utf8(tmp_fullpath, html)
+            page.save(tmp_fullpath, livereload)
             # now opens in browser if needed
             if target == 'browser':
                 self.__class__.open_in_browser(tmp_fullpath, settings.get('browser', 'default'))
@@ -929,13 +1060,13 @@ class MarkdownPreviewCommand(sublime_plugin.TextCommand):
             # create a new buffer and paste the output HTML
             embed_css = settings.get('embed_css_for_sublime_output', True)
             if embed_css:
-                new_view(self.view.window(), html, scratch=True)
+                new_view(self.view.window(), page.html(), scratch=True)
             else:
-                new_view(self.view.window(), body, scratch=True)
+                new_view(self.view.window(), page.body, scratch=True)
             sublime.status_message('Markdown preview launched in sublime')
         elif target == 'clipboard':
             # clipboard copy the full HTML
-            sublime.set_clipboard(html)
+            sublime.set_clipboard(page.html())
             sublime.status_message('Markdown export copied to clipboard')
         elif target == 'save':
             save_location = compiler.settings.get('builtin').get('destination', None)
@@ -943,15 +1074,15 @@ class MarkdownPreviewCommand(sublime_plugin.TextCommand):
                 save_location = self.view.file_name()
                 if save_location is None or not os.path.exists(save_location):
                     # Save as...
-                    v = new_view(self.view.window(), html)
+                    v = new_view(self.view.window(), page.html())
                     if v is not None:
                         v.run_command('save')
                 else:
                     # Save
                     htmlfile = os.path.splitext(save_location)[0] + '.html'
-                    save_utf8(htmlfile, html)
+                    page.save(htmlfile)
             else:
-                save_utf8(save_location, html)
+                page.save(save_location)
 
     @classmethod
     def open_in_browser(cls, path, browser='default'):
@@ -1041,24 +1172,176 @@ class MarkdownBuildCommand(sublime_plugin.WindowCommand):
 
         self.puts("Compiling %s..." % mdfile)
 
-        if parser == "github":
-            compiler = GithubCompiler()
-        elif parser == "multimarkdown":
-            compiler = MultiMarkdownCompiler()
-        else:
-            compiler = MarkdownCompiler()
+        for message in self.build(view, parser, settings):
+            self.puts(message)
 
-        html, body = compiler.run(view, True)
+        elapsed = time.time() - start_time
+        self.puts("[Finished in %.1fs]" % (elapsed))
+        sublime.status_message("Build finished")
 
-        htmlfile = compiler.settings.get('builtin').get('destination', None)
+    def build(self, view, parser, settings, htmlfile=None):
+        '''
+        build the html file of view, to htmlfile or to the destination of its
+        front matter, and return the messages for the panel
+        '''
+        mdfile = view.file_name()
+        compiler = get_compiler(parser)
+
+        compiler.setup(view)
+        if settings.get('show_build_stage_times', False):
+            compiler.timer = StageTimer()
+        profiled_patterns = settings.get('show_build_pattern_profile', 0)
+        if profiled_patterns:
+            compiler.pattern_profiler = PatternProfiler()
+        contents = compiler.get_contents(True)
+
+        if htmlfile is None:
+            htmlfile = compiler.settings.get('builtin').get('destination', None)
 
         if htmlfile is None:
             htmlfile = os.path.splitext(mdfile)[0] + '.html'
-        self.puts("        ->" + htmlfile)
-        save_utf8(htmlfile, html)
+
+        cache = get_build_cache(
+            os.path.dirname(getTempMarkdownPreviewPath(view)),
+            settings.get('build_cache_size', 100)
+        )
+        key = cache.key(parser, mdfile, view.substr(sublime.Region(0, view.size())))
+        if cache.is_current(key, htmlfile, settings):
+            return ["        ->" + htmlfile + " (unchanged)"]
+
+        messages = ["        ->" + htmlfile]
+        page = compiler.render_page(contents)
+        if compiler.assets is not None and compiler.assets.report():
+            messages.append("        " + compiler.assets.report())
+        compiler.timed('save', page.save, htmlfile, sizes=False)
+        if page.body == _CANNOT_CONVERT:
+            messages.append(_CANNOT_CONVERT)
+        else:
+            cache.store(key, htmlfile, compiler.settings.used, compiler.dependencies)
+        if compiler.timer is not None:
+            messages.append("        stage times:")
+            messages.extend("        " + line for line in compiler.timer.summary())
+        if compiler.pattern_profiler is not None and compiler.pattern_profiler.patterns:
+            messages.append("        slowest inline patterns:")
+            messages.extend(
+                "        " + line for line in compiler.pattern_profiler.summary(profiled_patterns)
+            )
+        return messages
+
+
+class MarkdownBuildAllCommand(MarkdownBuildCommand):
+    ''' build every markdown file of a folder, or matching a glob pattern '''
+
+    def run(self, path=None):
+        if path is None:
+            view = self.window.active_view()
+            if view is not None and view.file_name():
+                path = os.path.dirname(view.file_name())
+            elif self.window.folders():
+                path = self.window.folders()[0]
+            else:
+                return
+
+        self.init_panel()
+
+        settings = sublime.load_settings('MarkdownPreview.sublime-settings')
+        parser = settings.get('parser', 'markdown')
+        if parser == 'default':
+            parser = 'markdown'
+
+        if settings.get("show_panel_on_build", True):
+            self.window.run_command("show_panel", {"panel": "output.markdown"})
+
+        filetypes = tuple(settings.get('markdown_filetypes', ['.md', '.markdown', '.mdown']))
+        if os.path.isdir(path):
+            files = []
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(filetypes))
+        else:
+            files = sorted(f for f in glob.glob(os.path.expanduser(path)) if os.path.isfile(f))
+
+        if not files:
+            self.puts("No markdown files found in %s" % path)
+            return
+
+        jobs = settings.get('build_jobs', 0)
+        if jobs <= 0:
+            jobs = cpu_count()
+        if parser == 'markdown' and not (is_ST3() and os.name == 'posix'):
+            # Python-markdown holds the GIL and processes can't be forked
+            # here (see build_all), so more threads would only wait
+            jobs = 1
+        jobs = min(jobs, len(files))
+
+        self.puts("Compiling %d files in %s with %d jobs..." % (len(files), path, jobs))
+        if is_ST3():
+            # Keep the editor responsive, ST3's API can be used from other threads
+            sublime.set_timeout_async(lambda: self.build_all(files, parser, settings, jobs), 0)
+        else:
+            self.build_all(files, parser, settings, 1)
+
+    def build_file(self, mdfile, parser, settings, htmlfile=None):
+        ''' build one file and return it with its messages, the time it took and its error '''
+        start_time = time.time()
+        try:
+            messages = self.build(FileView(mdfile), parser, settings, htmlfile)
+            error = None
+        except Exception:
+            messages = []
+            error = traceback.format_exc()
+        return mdfile, messages, time.time() - start_time, error
+
+    def report(self, result):
+        ''' show the result of build_file in the panel '''
+        mdfile, messages, elapsed, error = result
+        self.puts("%s [%.2fs]" % (mdfile, elapsed))
+        for message in messages:
+            self.puts(message)
+        if error is not None:
+            self.puts(error)
+
+    def build_all(self, files, parser, settings, jobs):
+        ''' build the files on ``jobs`` threads or processes and report them as they finish '''
+        start_time = time.time()
+        if parser == 'markdown' and jobs > 1:
+            # Python-markdown holds the GIL: build the files in processes forked
+            # from this one, which import the plugin again with stubs of the
+            # sublime modules and a copy of the settings
+            tasks = [(mdfile, None, parser) for mdfile in files]
+            for result in headless.build_files(tasks, settings_values(settings), jobs, fork=True):
+                self.report(result)
+        else:
+            self.build_threads(files, parser, settings, jobs)
 
         elapsed = time.time() - start_time
-        if body == _CANNOT_CONVERT:
-            self.puts(_CANNOT_CONVERT)
-        self.puts("[Finished in %.1fs]" % (elapsed))
+        self.puts("[Finished %d files in %.1fs]" % (len(files), elapsed))
         sublime.status_message("Build finished")
+
+    def build_threads(self, files, parser, settings, jobs):
+        ''' build the files on ``jobs`` threads '''
+        pending = list(reversed(files))
+        lock = threading.Lock()
+
+        def report(result):
+            with lock:
+                self.report(result)
+
+        def worker():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    mdfile = pending.pop()
+                report(self.build_file(mdfile, parser, settings))
+
+        threads = [threading.Thread(target=worker) for i in range(jobs - 1)]
+        for thread in threads:
+            thread.start()
+        worker()
+        for thread in threads:
+            thread.join()
+
+
+if not is_ST3():
+    plugin_loaded()
@@ -0,0 +1,195 @@
+import os
+import stat
+import base64
+import threading
+
+ASSET_FILE_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif"
+}
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache(size=32 * 1024 * 1024):
+    ''' return the shared cache of encoded files '''
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AssetCache(size)
+        _cache.resize(size)
+        return _cache
+
+
+class AssetCache(object):
+    '''
+    Remember files encoded as base64 data uris.
+
+    Entries are keyed by the path, size and modification time of the file,
+    so a file that changed is encoded again.  The most recently used
+    entries are kept, up to ``size`` characters of data uris.  A size of 0
+    disables the cache.
+    '''
+
+    def __init__(self, size=32 * 1024 * 1024):
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.order = []
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def resize(self, size):
+        ''' set the cache size and evict the entries that no longer fit '''
+        with self.lock:
+            self.size = size
+            self._evict()
+
+    def _evict(self):
+        while self.order and self.used > max(self.size, 0):
+            self.used -= len(self.entries.pop(self.order.pop(0)))
+
+    def encode(self, path, result):
+        '''
+        return the data uri of the file at path, given its os.stat result,
+        and whether it came from the cache
+        '''
+        key = (path, result.st_size, result.st_mtime)
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.hits += 1
+                self.order.remove(key)
+                self.order.append(key)
+                return data, True
+            self.misses += 1
+        with open(path, 'rb') as f:
+            data = 'data:%s;base64,%s' % (
+                ASSET_FILE_TYPES[os.path.splitext(path)[1].lower()],
+                base64.b64encode(f.read()).decode('ascii')
+            )
+        if len(data) <= self.size:
+            with self.lock:
+                if key not in self.entries:
+                    self.entries[key] = data
+                    self.order.append(key)
+                    self.used += len(data)
+                    self._evict()
+        return data, False
+
+
+class AssetInliner(object):
+    '''
+    Embed the images of a document as base64 data uris.
+
+    Each image is encoded once per document however often it is used, and
+    the encoded data is shared with later renders through an AssetCache.
+    Images bigger than ``max_image`` bytes are not embedded, and neither
+    are the images that would bring the embedded files of the document
+    over ``max_total`` bytes (0 means no limit).  ``prefetch`` reads and
+    encodes a list of images with up to ``jobs`` threads.
+    '''
+
+    def __init__(self, cache, stat_cache, max_image=0, max_total=0, jobs=4):
+        self.cache = cache
+        self.stat_cache = stat_cache
+        self.max_image = max_image
+        self.max_total = max_total
+        self.jobs = jobs
+        self.encoded = {}
+        self.inlined = set()
+        self.total = 0
+        self.embedded = 0
+        self.reused = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _encode(self, path):
+        try:
+            return self.encoded[path]
+        except KeyError:
+            pass
+        entry = None
+        result = self.stat_cache.stat(path)
+        if (
+            result is not None and stat.S_ISREG(result.st_mode) and
+            os.path.splitext(path)[1].lower() in ASSET_FILE_TYPES
+        ):
+            if self.max_image and result.st_size > self.max_image:
+                # too big, keep the path
+                entry = (None, result.st_size)
+            else:
+                try:
+                    data, hit = self.cache.encode(path, result)
+                except Exception:
+                    pass
+                else:
+                    entry = (data, result.st_size)
+                    with self.lock:
+                        if hit:
+                            self.hits += 1
+                        else:
+                            self.misses += 1
+        self.encoded[path] = entry
+        return entry
+
+    def prefetch(self, paths):
+        ''' encode the images at paths, several at a time '''
+        pending = []
+        for path in paths:
+            if path not in self.encoded and path not in pending:
+                pending.append(path)
+        if len(pending) < 2 or self.jobs < 2:
+            return
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    path = pending.pop(0)
+                self._encode(path)
+
+        workers = [threading.Thread(target=work) for _ in range(min(self.jobs, len(pending)) - 1)]
+        for worker in workers:
+            worker.start()
+        work()
+        for worker in workers:
+            worker.join()
+
+    def inline(self, path):
+        ''' return the data uri to use for the image at path, or None to keep the path '''
+        entry = self._encode(path)
+        if entry is None:
+            return None
+        data, size = entry
+        if data is None or (self.max_total and self.total + size > self.max_total):
+            self.skipped += 1
+            return None
+        self.total += size
+        self.embedded += 1
+        if path in self.inlined:
+            self.reused += 1
+        self.inlined.add(path)
+        return data
+
+    def report(self):
+        ''' return a summary of the embedded images, or an empty string if there were none '''
+        if not self.embedded and not self.skipped:
+            return ''
+        report = 'base64 images: %d embedded (%d KB, %d reused)' % (
+            self.embedded, self.total // 1024, self.reused
+        )
+        if self.hits or self.misses:
+            report += ', %d of %d files from cache (%d%%)' % (
+                self.hits, self.hits + self.misses, 100 * self.hits // (self.hits + self.misses)
+            )
+        if self.skipped:
+            report += ', %d over the size limit' % self.skipped
+        return report
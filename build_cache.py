@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import codecs
+import hashlib
+import threading
+
+BUILD_CACHE_FILE = 'markdown_build_cache.json'
+_caches = {}
+_caches_lock = threading.Lock()
+# Held while an index is merged with the one on disk and saved again.  The
+# worker processes of a build share a multiprocessing lock instead (see
+# headless.init_worker)
+index_lock = threading.Lock()
+
+
+def file_state(filename):
+    ''' return the modification time of a file, or None if it does not exist '''
+    try:
+        return os.path.getmtime(filename)
+    except (OSError, TypeError):
+        return None
+
+
+def get_build_cache(directory, size=100):
+    ''' return the shared build cache for a directory '''
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = _caches[directory] = BuildCache(directory, size)
+        cache.size = size
+        return cache
+
+
+class BuildCache(object):
+    '''
+    Remember which builds are still up to date.
+
+    Builds are indexed by a hash of the parser, the file name and the text
+    of the view as it is in the editor, front matter included.  An entry
+    also records the settings the build read, the files it depended on
+    (reference files, templates, stylesheets, scripts, images...) with
+    their modification times, and the output it wrote.  A build with the
+    same hash can be skipped as long as none of those changed.
+
+    The index is a json file in the given directory and keeps the ``size``
+    most recently used entries.  A size of 0 disables the cache.  A cache can
+    be shared by builds running in several threads, and an index by builds
+    running in several processes that share the ``index_lock``: each store
+    adds the entries the others saved since.
+    '''
+
+    def __init__(self, directory, size=100):
+        self.filename = os.path.join(directory, BUILD_CACHE_FILE)
+        self.size = size
+        self.lock = threading.RLock()
+        self.entries = self.load() if self.size > 0 else {}
+
+    def load(self):
+        ''' return the entries of the index on disk '''
+        if not os.path.exists(self.filename):
+            return {}
+        try:
+            with codecs.open(self.filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def key(self, *parts):
+        ''' return the hash identifying a build '''
+        sha = hashlib.sha1()
+        for part in parts:
+            sha.update(part.encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def is_current(self, key, htmlfile, settings):
+        ''' check if htmlfile is the up to date output of the build '''
+        with self.lock:
+            return self._is_current(key, htmlfile, settings)
+
+    def _is_current(self, key, htmlfile, settings):
+        entry = self.entries.get(key)
+        if self.size <= 0 or entry is None or entry['html'] != htmlfile:
+            return False
+        if file_state(htmlfile) != entry['mtime']:
+            return False
+        for name, value in entry['settings'].items():
+            if settings.get(name) != value:
+                return False
+        for filename, mtime in entry['files'].items():
+            if file_state(filename) != mtime:
+                return False
+        # The index is only written when an entry changes: the new use
+        # time is saved with the next build that is stored
+        entry['used'] = time.time()
+        return True
+
+    def store(self, key, htmlfile, settings, files):
+        ''' record a build that just wrote htmlfile '''
+        if self.size <= 0:
+            return
+        with self.lock:
+            self._store(key, htmlfile, settings, files)
+
+    def _store(self, key, htmlfile, settings, files):
+        with index_lock:
+            for k, entry in self.load().items():
+                if k not in self.entries or entry['used'] > self.entries[k]['used']:
+                    self.entries[k] = entry
+            self._add(key, htmlfile, settings, files)
+            self.save()
+
+    def _add(self, key, htmlfile, settings, files):
+        self.entries[key] = {
+            'html': htmlfile,
+            'mtime': file_state(htmlfile),
+            'settings': settings,
+            'files': files,
+            'used': time.time()
+        }
+        if len(self.entries) > self.size:
+            keys = sorted(self.entries, key=lambda k: self.entries[k]['used'])
+            for k in keys[:len(self.entries) - self.size]:
+                del self.entries[k]
+
+    def save(self):
+        ''' write the index to disk '''
+        replace = getattr(os, 'replace', None)
+        filename = self.filename if replace is None else '%s.%d' % (self.filename, os.getpid())
+        try:
+            with codecs.open(filename, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(self.entries))
+            if replace is not None:
+                replace(filename, self.filename)
+        except Exception:
+            pass
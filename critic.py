@@ -0,0 +1,149 @@
+CRITIC_MODES = ('accept', 'reject', 'view')
+
+# closing delimiters of each critic mark, keyed by the two characters after '{'
+CRITIC_MARKS = {
+    '++': ('++}',),
+    '--': ('--}',),
+    '==': ('==}',),
+    '>>': ('<<}',),
+    '~~': ('~>', '~~}')
+}
+
+
+def strip_critic(text, mode='accept'):
+    ''' return text with its critic marks accepted, rejected or rendered as html '''
+    return CriticStripper(mode).strip(text)
+
+
+class CriticStripper(object):
+    '''
+    Strip multi-markdown critic marks.
+
+    The text is only scanned for the ``{++``, ``{--``, ``{==``, ``{>>`` and
+    ``{~~`` openers and their closing delimiters; everything in between is
+    copied as a whole.  Marks are handled like the regular expression this
+    replaces: the shortest match wins and an opener without its closing
+    delimiters is left alone.
+
+    Modes:
+        accept: keep insertions and the new text of substitutions
+        reject: keep deletions and the old text of substitutions
+        view: render the marks as ins, del, mark and span html tags
+    Highlighted text is kept and comments are dropped when accepting or
+    rejecting.
+
+    Text can be given all at once to ``strip`` or in chunks to ``feed``,
+    followed by ``close``.  An opener whose closing delimiters were not
+    seen yet is held back until they come in or the text ends.
+    '''
+
+    def __init__(self, mode='accept'):
+        if mode not in CRITIC_MODES:
+            raise ValueError('unknown critic mode %r' % mode)
+        self.mode = mode
+        self.reset()
+
+    def reset(self):
+        ''' forget any text held back from the previous chunks '''
+        self._buffer = ''
+        self._state = None
+
+    def feed(self, chunk):
+        ''' process a chunk of text and return the output that is complete '''
+        self._buffer += chunk
+        return self._process(False)
+
+    def close(self):
+        ''' process the text held back and return the rest of the output '''
+        output = self._process(True)
+        self.reset()
+        return output
+
+    def strip(self, text):
+        ''' process a whole text '''
+        return self.feed(text) + self.close()
+
+    def render(self, kind, parts):
+        ''' return the replacement of a critic mark '''
+        if self.mode == 'view':
+            if kind == '++':
+                return '<ins class="critic">%s</ins>' % parts[0]
+            elif kind == '--':
+                return '<del class="critic">%s</del>' % parts[0]
+            elif kind == '==':
+                return '<mark class="critic">%s</mark>' % parts[0]
+            elif kind == '>>':
+                return '<span class="critic comment">%s</span>' % parts[0]
+            return '<del class="critic">%s</del><ins class="critic">%s</ins>' % tuple(parts)
+        accept = self.mode == 'accept'
+        if kind == '++':
+            return parts[0] if accept else ''
+        elif kind == '--':
+            return '' if accept else parts[0]
+        elif kind == '==':
+            return parts[0]
+        elif kind == '>>':
+            return ''
+        return parts[1] if accept else parts[0]
+
+    def _process(self, final):
+        text = self._buffer
+        state = self._state
+        self._state = None
+        output = []
+        pos = 0
+        # position of the text after which each delimiter no longer occurs,
+        # so that the openers past it are not searched to the end again
+        missing = {}
+        start = text.find('{')
+        while start >= 0:
+            kind = text[start + 1:start + 3]
+            if len(kind) < 2 and not final:
+                break
+            delimiters = CRITIC_MARKS.get(kind)
+            if delimiters is None:
+                start = text.find('{', start + 1)
+                continue
+
+            # find the closing delimiters, resuming the search from the
+            # previous chunk if this opener was held back
+            if start == 0 and state is not None:
+                found, index = state
+            else:
+                found, index = [], start + 3
+            while len(found) < len(delimiters):
+                delimiter = delimiters[len(found)]
+                if index >= missing.get(delimiter, len(text) + 1):
+                    break
+                end = text.find(delimiter, index)
+                if end < 0:
+                    missing[delimiter] = index
+                    break
+                found.append(end)
+                index = end + len(delimiter)
+            else:
+                output.append(text[pos:start])
+                parts = []
+                index = start + 3
+                for end, delimiter in zip(found, delimiters):
+                    parts.append(text[index:end])
+                    index = end + len(delimiter)
+                output.append(self.render(kind, parts))
+                pos = index
+                start = text.find('{', pos)
+                continue
+
+            if not final:
+                # wait for more text, the closing delimiter can still come
+                self._state = (
+                    [end - start for end in found],
+                    max(index, len(text) - len(delimiter) + 1) - start
+                )
+                break
+            start = text.find('{', start + 1)
+
+        if start < 0 or final:
+            start = len(text)
+        output.append(text[pos:start])
+        self._buffer = text[start:]
+        return ''.join(output)
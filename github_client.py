@@ -0,0 +1,444 @@
+import os
+import re
+import sys
+import json
+import time
+import base64
+import codecs
+import socket
+import hashlib
+import threading
+
+if sys.version_info >= (3, 0):
+    import http.client as httplib
+    from urllib.parse import urlparse, unquote
+    from urllib.request import getproxies, proxy_bypass
+else:
+    import httplib
+    from urlparse import urlparse
+    from urllib import getproxies, proxy_bypass, unquote
+
+GITHUB_API_URL = 'https://api.github.com/markdown'
+RE_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+# reference definitions, but not the [^note]: definitions of footnotes
+RE_REFERENCE = re.compile(r'^ {0,3}\[(?!\^)[^\]]+\]:[ \t]*\S')
+RE_FOOTNOTE = re.compile(r'^ {0,3}\[\^[^\]]+\]:')
+RE_HTML_OPEN = re.compile(r'^ {0,3}<([a-zA-Z][a-zA-Z0-9]*)')
+HTML_VOID = ('area', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source')
+# html blocks that end at a given string and may contain blank lines:
+# raw text elements, comments, processing instructions, cdata and declarations
+HTML_BLOCKS = (
+    (re.compile(r'^ {0,3}<(script|pre|style|textarea)(?=[\s>]|$)', re.I), None),
+    (re.compile(r'^ {0,3}<!--'), '-->'),
+    (re.compile(r'^ {0,3}<\?'), '?>'),
+    (re.compile(r'^ {0,3}<!\[CDATA\['), ']]>'),
+    (re.compile(r'^ {0,3}<![a-zA-Z]'), '>')
+)
+RE_HTML_ID = re.compile(r'(\sid=")([^"]+)(")')
+RE_HTML_HREF = re.compile(r'(\shref="#)([^"]+)(")')
+GITHUB_ID_PREFIX = 'user-content-'
+# lines that may continue the block before them even after a blank line:
+# indented code or list content, list items, block quotes, tables and html
+RE_CONTINUATION = re.compile(r'^([ \t]|[*+-][ \t]|\d+[.)][ \t]|[>|<])')
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class GithubError(Exception):
+    ''' the github API answered with an error status '''
+
+    def __init__(self, code, reason):
+        Exception.__init__(self, 'github API error %d: %s' % (code, reason))
+        self.code = code
+
+
+class GithubConnectionError(Exception):
+    ''' the github API could not be reached '''
+
+
+def get_github_client(url=GITHUB_API_URL, cache_dir=None, size=50, ttl=3600):
+    ''' return the shared client for a github API url and cache directory '''
+    with _clients_lock:
+        client = _clients.get((url, cache_dir))
+        if client is None:
+            client = _clients[(url, cache_dir)] = GithubClient(url, cache_dir)
+        client.cache.resize(size)
+        client.ttl = ttl
+        return client
+
+
+def split_markdown(text, size):
+    '''
+    Split a markdown document into chunks of about size characters.
+
+    Chunks only end at a blank line that is followed by a top level heading
+    or paragraph, so fenced code, lists, block quotes, tables, html blocks
+    and comments are never cut.  The reference definitions of the whole
+    document are appended to every chunk, so reference links keep working.
+    A document with footnote definitions is not split: github numbers the
+    footnotes of each chunk and lists them under it.
+    '''
+    chunks = []
+    references = []
+    current = []
+    length = 0
+    fence = None
+    html = None
+    blank = True
+    for line in text.splitlines(True):
+        m = RE_FENCE.match(line)
+        if fence is not None:
+            if m is not None and m.group(1)[0] == fence[0] and len(m.group(1)) >= len(fence):
+                fence = None
+        elif html is not None:
+            if html in line:
+                html = None
+        elif m is not None:
+            fence = m.group(1)
+        elif RE_REFERENCE.match(line):
+            references.append(line if line.endswith('\n') else line + '\n')
+        elif RE_FOOTNOTE.match(line):
+            return [text]
+        elif (
+            blank and length >= size and line.strip() and
+            not RE_CONTINUATION.match(line)
+        ):
+            chunks.append(''.join(current))
+            current = []
+            length = 0
+        if fence is None and html is None:
+            html = html_block_end(line, blank)
+        current.append(line)
+        length += len(line)
+        blank = fence is None and html is None and not line.strip()
+    if current or not chunks:
+        chunks.append(''.join(current))
+    if references and len(chunks) > 1:
+        references = '\n' + ''.join(references)
+        chunks = [chunk + references for chunk in chunks]
+    return chunks
+
+
+class ResponseCache(object):
+    '''
+    Remember the html the github API returned for a document.
+
+    Entries are kept in memory and, when a directory is given, as json files
+    on disk so they survive restarts.  Both keep the ``size`` most recently
+    used entries.  A size of 0 disables the cache.
+    '''
+
+    def __init__(self, directory=None, size=50):
+        self.directory = directory
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.order = []
+
+    def resize(self, size):
+        ''' set the cache size and evict the entries that no longer fit '''
+        with self.lock:
+            self.size = size
+            self._evict()
+
+    def _evict(self):
+        while len(self.order) > max(self.size, 0):
+            del self.entries[self.order.pop(0)]
+        if self.directory and os.path.isdir(self.directory):
+            names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+            if len(names) > max(self.size, 0):
+                paths = sorted(
+                    [os.path.join(self.directory, name) for name in names],
+                    key=lambda path: os.path.getmtime(path)
+                )
+                for path in paths[:len(paths) - max(self.size, 0)]:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        ''' return the entry for key, or None '''
+        if self.size <= 0:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.order.remove(key)
+                self.order.append(key)
+                return entry
+            if self.directory:
+                try:
+                    with codecs.open(self._path(key), 'r', encoding='utf-8') as f:
+                        entry = json.load(f)
+                except Exception:
+                    return None
+                self.entries[key] = entry
+                self.order.append(key)
+                self._evict()
+            return entry
+
+    def set(self, key, entry):
+        ''' store the entry for key '''
+        if self.size <= 0:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.order.remove(key)
+            self.entries[key] = entry
+            self.order.append(key)
+            if self.directory:
+                try:
+                    if not os.path.isdir(self.directory):
+                        os.makedirs(self.directory)
+                    with codecs.open(self._path(key), 'w', encoding='utf-8') as f:
+                        f.write(json.dumps(entry))
+                except Exception:
+                    pass
+            self._evict()
+
+
+def html_block_end(line, blank):
+    '''
+    return the string that ends the html block opened by line, or None if
+    line opens none or closes it already; only comments and the like can
+    interrupt a paragraph, other blocks must follow a blank line.
+    '''
+    for regex, end in HTML_BLOCKS:
+        m = regex.match(line)
+        if m is not None:
+            if end is None:
+                end = '</%s>' % m.group(1).lower()
+                return end if end not in line.lower() else None
+            return end if line.find(end, m.end()) < 0 else None
+    m = RE_HTML_OPEN.match(line) if blank else None
+    if (
+        m is not None and m.group(1).lower() not in HTML_VOID and
+        ('</%s>' % m.group(1)) not in line
+    ):
+        return '</%s>' % m.group(1)
+    return None
+
+
+def merge_chunks(chunks):
+    '''
+    Join the html rendered for the chunks of a document.
+
+    Each chunk is rendered on its own, so the ids of its headings can
+    repeat ones of the chunks before it.  Repeated ids get a
+    number appended, as github numbers repeated headings, and the links of
+    the chunk to them are changed to match.
+    '''
+    seen = set()
+    counts = {}
+    merged = []
+    for chunk in chunks:
+        ids = [m.group(2) for m in RE_HTML_ID.finditer(chunk)]
+        own = set(ids)
+        renamed = {}
+        for id in ids:
+            if id not in seen:
+                seen.add(id)
+                continue
+            if id in renamed:
+                continue
+            count = counts.get(id, 0)
+            new = id
+            while new in seen or new in own:
+                count += 1
+                new = '%s-%d' % (id, count)
+            counts[id] = count
+            renamed[id] = new
+            seen.add(new)
+        if renamed:
+            chunk = RE_HTML_ID.sub(lambda m: m.group(1) + renamed.get(m.group(2), m.group(2)) + m.group(3), chunk)
+            chunk = RE_HTML_HREF.sub(lambda m: m.group(1) + rename_target(m.group(2), renamed) + m.group(3), chunk)
+        merged.append(chunk)
+    return '\n'.join(merged)
+
+
+def rename_target(target, renamed):
+    ''' return the renamed target of a link, github drops the id prefix in links to headings '''
+    if target in renamed:
+        return renamed[target]
+    new = renamed.get(GITHUB_ID_PREFIX + target)
+    if new is not None:
+        return new[len(GITHUB_ID_PREFIX):]
+    return target
+
+
+class GithubClient(object):
+    '''
+    Render markdown with the github API.
+
+    Connections are kept alive and reused between requests.  Responses are
+    cached by a hash of the document and the rendering mode: a cached
+    response younger than ``ttl`` seconds is returned without a request,
+    an older one is revalidated with its ETag.
+    '''
+
+    max_idle = 8
+
+    def __init__(self, url=GITHUB_API_URL, cache_dir=None, size=50, ttl=3600, timeout=60):
+        parsed = urlparse(url)
+        self.url = url
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path = parsed.path or '/'
+        if parsed.query:
+            self.path += '?' + parsed.query
+        self.timeout = timeout
+        self.ttl = ttl
+        self.find_proxy()
+        self.cache = ResponseCache(cache_dir, size)
+        self.lock = threading.Lock()
+        self.idle = []
+
+    def key(self, text, mode):
+        ''' return the cache key of a document '''
+        sha = hashlib.sha1()
+        for part in (self.url, mode, text):
+            sha.update(part.encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def render(self, text, mode='markdown', token=None):
+        ''' return the html github renders for text '''
+        key = self.key(text, mode)
+        entry = self.cache.get(key)
+        if entry is not None and time.time() - entry['time'] < self.ttl:
+            return entry['html']
+
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = 'token %s' % token
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        body = json.dumps({'text': text, 'mode': mode}).encode('utf-8')
+        status, reason, etag, data = self.post(body, headers)
+
+        if status == 304 and entry is not None:
+            entry['time'] = time.time()
+        elif status == 200:
+            entry = {'html': data.decode('utf-8'), 'etag': etag, 'time': time.time()}
+        else:
+            raise GithubError(status, reason)
+        self.cache.set(key, entry)
+        return entry['html']
+
+    def render_chunks(self, chunks, mode='markdown', token=None, jobs=4):
+        '''
+        Render the chunks of a document with up to jobs concurrent requests
+        and return their html in order.
+        '''
+        results = [None] * len(chunks)
+        errors = []
+        pending = list(range(len(chunks)))
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                with lock:
+                    if not pending or errors:
+                        return
+                    index = pending.pop(0)
+                try:
+                    results[index] = self.render(chunks[index], mode, token)
+                except Exception:
+                    with lock:
+                        errors.append(sys.exc_info()[1])
+
+        workers = [threading.Thread(target=work) for _ in range(max(1, min(jobs, len(chunks)) - 1))]
+        for worker in workers:
+            worker.start()
+        work()
+        for worker in workers:
+            worker.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def find_proxy(self):
+        '''
+        Find the proxy to reach the API through, as urllib does: from the
+        environment or the system settings, unless the host is in no_proxy.
+        '''
+        self.proxy = None
+        self.proxy_headers = {}
+        self.target = self.path
+        proxy = getproxies().get(self.scheme)
+        netloc = self.host if self.port is None else '%s:%d' % (self.host, self.port)
+        if not proxy or proxy_bypass(netloc):
+            return
+        self.proxy = urlparse(proxy if '://' in proxy else 'http://' + proxy)
+        if self.proxy.username is not None:
+            credentials = '%s:%s' % (unquote(self.proxy.username), unquote(self.proxy.password or ''))
+            self.proxy_headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(
+                credentials.encode('utf-8')
+            ).decode('ascii')
+        if self.scheme != 'https':
+            # plain http requests are sent to the proxy with the absolute url
+            self.target = self.url
+
+    def connect(self):
+        ''' open a new connection to the API, through a proxy if one is configured '''
+        if self.scheme == 'https':
+            connection_class = getattr(httplib, 'HTTPSConnection', None)
+            if connection_class is None:
+                raise GithubConnectionError('SSL is not included in your Python installation')
+            default_port = 443
+        else:
+            connection_class = httplib.HTTPConnection
+            default_port = 80
+        proxy = self.proxy
+        if proxy is None or (self.scheme == 'https' and not hasattr(connection_class, 'set_tunnel')):
+            return connection_class(self.host, self.port or default_port, timeout=self.timeout)
+        connection = connection_class(
+            proxy.hostname, proxy.port or (443 if proxy.scheme == 'https' else 80), timeout=self.timeout
+        )
+        if self.scheme == 'https':
+            # https requests go through a CONNECT tunnel
+            connection.set_tunnel(self.host, self.port or default_port, self.proxy_headers)
+        return connection
+
+    def post(self, body, headers):
+        ''' post body and return the status, reason, etag and data of the response '''
+        for attempt in range(2):
+            with self.lock:
+                connection = self.idle.pop() if self.idle else None
+            reused = connection is not None
+            if not reused:
+                connection = self.connect()
+            try:
+                if self.proxy_headers and self.scheme != 'https':
+                    headers = dict(headers, **self.proxy_headers)
+                connection.request('POST', self.target, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (httplib.HTTPException, socket.error):
+                connection.close()
+                if reused and attempt == 0:
+                    # the server closed the kept alive connection, try a new one
+                    continue
+                raise GithubConnectionError(str(sys.exc_info()[1]))
+            if response.will_close:
+                connection.close()
+            else:
+                with self.lock:
+                    if len(self.idle) < self.max_idle:
+                        self.idle.append(connection)
+                        connection = None
+                if connection is not None:
+                    connection.close()
+            return response.status, response.reason, response.getheader('etag'), data
+
+    def close(self):
+        ''' close the idle connections '''
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            connection.close()
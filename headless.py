@@ -0,0 +1,172 @@
+'''
+Build markdown files outside of Sublime Text, like the build command does.
+
+The plugin is imported with stubs of the sublime and sublime_plugin
+modules, and its settings are given as a dictionary.  This is how
+"python -m markdown" builds several files, and how "Build All Markdown
+Files in Folder" builds them in worker processes with python-markdown.
+The tests and benchmarks load the plugin the same way.
+'''
+from __future__ import print_function
+import copy
+import json
+import os
+import re
+import sys
+import types
+import zipfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# The plugin imports some modules by the name of its package, which it
+# finds like this (see helper.INSTALLED_DIRECTORY)
+_installed = re.search(r'[ \\/]Packages[\\/]([^\\/\.]+)', ROOT + os.sep)
+PACKAGE = _installed.group(1) if _installed else 'Markdown Preview'
+SETTINGS_FILE = 'MarkdownPreview.sublime-settings'
+
+RE_SETTINGS = re.compile(r'("(?:[^"\\]|\\.)*")|/\*.*?\*/|//[^\n]*', re.DOTALL)
+
+# The plugin and settings of a worker process
+_worker = {}
+
+
+class Settings(object):
+    ''' stub of sublime.Settings, returning copies like Sublime Text does '''
+
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, key, default=None):
+        return copy.deepcopy(self.values.get(key, default))
+
+    def has(self, key):
+        return key in self.values
+
+    def set(self, key, value):
+        self.values[key] = value
+
+    def add_on_change(self, key, callback):
+        pass
+
+    def clear_on_change(self, key):
+        pass
+
+
+class Region(object):
+    ''' stub of sublime.Region '''
+
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+
+def read_resource(name):
+    ''' return the text of a file of the plugin, installed as a folder or as a .sublime-package '''
+    if os.path.isdir(ROOT):
+        with open(os.path.join(ROOT, name), 'rb') as f:
+            data = f.read()
+    else:
+        archive = zipfile.ZipFile(ROOT)
+        try:
+            data = archive.read(name.replace(os.sep, '/'))
+        finally:
+            archive.close()
+    return data.decode('utf-8')
+
+
+def parse_settings(text):
+    ''' return the values of a .sublime-settings file, without its comments '''
+    # strings are matched first so that the "//" of urls is kept
+    return json.loads(RE_SETTINGS.sub(lambda m: m.group(1) or '', text))
+
+
+def load_default_settings():
+    ''' return the default settings of the plugin '''
+    return parse_settings(read_resource(SETTINGS_FILE))
+
+
+def install_sublime_stub(settings):
+    ''' add the sublime and sublime_plugin modules the plugin imports '''
+    sublime = types.ModuleType('sublime')
+    sublime.version = lambda: '3000' if sys.version_info >= (3, 0) else '2221'
+    sublime.platform = lambda: {'darwin': 'osx', 'win32': 'windows'}.get(sys.platform, 'linux')
+    sublime.packages_path = lambda: os.path.dirname(ROOT)
+    sublime.load_settings = lambda name: settings
+    sublime.status_message = lambda message: None
+    sublime.error_message = lambda message: print('error:', message)
+    sublime.set_timeout = lambda function, delay=0: function()
+    sublime.set_timeout_async = sublime.set_timeout
+    sublime.Region = Region
+    sublime.load_resource = lambda name: read_resource(name.split('/', 2)[2])
+    sys.modules['sublime'] = sublime
+
+    sublime_plugin = types.ModuleType('sublime_plugin')
+    for name in ('EventListener', 'TextCommand', 'WindowCommand', 'ApplicationCommand'):
+        setattr(sublime_plugin, name, type(name, (object,), {}))
+    sys.modules['sublime_plugin'] = sublime_plugin
+
+
+def load_plugin(reload=False):
+    '''
+    import the plugin as a package, like Sublime Text 3 does, and return its
+    main module.  With reload, the modules of the plugin imported before
+    (by Sublime Text, in a process forked from it) are imported again, so
+    that they use the stubs.
+    '''
+    import importlib
+    if reload:
+        for name in list(sys.modules):
+            if (name == PACKAGE or name.startswith(PACKAGE + '.')) and name != __name__:
+                del sys.modules[name]
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ROOT]
+    sys.modules[PACKAGE] = package
+    return importlib.import_module(PACKAGE + '.MarkdownPreview')
+
+
+def init_worker(values, lock):
+    '''
+    load the plugin in a worker process, with the settings values and the
+    lock of the build cache index the workers share
+    '''
+    settings = Settings(values)
+    install_sublime_stub(settings)
+    _worker['plugin'] = load_plugin(reload=True)
+    _worker['settings'] = settings
+    sys.modules[PACKAGE + '.build_cache'].index_lock = lock
+
+
+def build_file(task):
+    '''
+    build the file of a (mdfile, htmlfile, parser) task in a worker process
+    and return the file, its messages, the time it took and its error.  The
+    html goes to the destination of the build command if htmlfile is None.
+    '''
+    mdfile, htmlfile, parser = task
+    command = _worker['plugin'].MarkdownBuildAllCommand()
+    return command.build_file(mdfile, parser, _worker['settings'], htmlfile)
+
+
+def build_files(tasks, values, jobs, fork=False):
+    '''
+    build the tasks of build_file on a pool of jobs processes, with the
+    settings values, and yield their results as they finish.  With fork,
+    the processes are forked even where Python would start new ones, which
+    Sublime Text can't do.
+    '''
+    import multiprocessing
+    if fork and hasattr(multiprocessing, 'get_context'):
+        multiprocessing = multiprocessing.get_context('fork')
+    pool = multiprocessing.Pool(jobs, init_worker, (values, multiprocessing.Lock()))
+    try:
+        for result in pool.imap_unordered(build_file, tasks):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
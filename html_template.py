@@ -0,0 +1,94 @@
+import re
+import codecs
+import threading
+
+RE_PLACEHOLDER = re.compile(r'\{\{ (HEAD|BODY|TITLE|META|TOC) \}\}')
+TEMPLATE_CACHE_SIZE = 8
+_templates = {}
+_templates_order = []
+_templates_lock = threading.Lock()
+
+
+def get_template(filename, mtime):
+    ''' return the template in a file, parsed once for each modification time '''
+    key = (filename, mtime)
+    with _templates_lock:
+        template = _templates.get(key)
+    if template is None:
+        with codecs.open(filename, 'r', encoding='utf-8') as f:
+            template = Template(f.read())
+        with _templates_lock:
+            if key not in _templates:
+                _templates_order.append(key)
+                if len(_templates_order) > TEMPLATE_CACHE_SIZE:
+                    del _templates[_templates_order.pop(0)]
+            _templates[key] = template
+    return template
+
+
+class Template(object):
+    '''
+    An html template, split into its text and its placeholders.
+
+    Placeholders are {{ HEAD }}, {{ BODY }}, {{ TITLE }}, {{ META }} and
+    {{ TOC }}.  Only the first occurrence of each one is replaced, later
+    ones are kept as they are.
+    '''
+
+    def __init__(self, text):
+        self.segments = []
+        self.placeholders = set()
+        pos = 0
+        for m in RE_PLACEHOLDER.finditer(text):
+            name = m.group(1)
+            if name in self.placeholders:
+                continue
+            self.segments.append(text[pos:m.start()])
+            self.segments.append(name)
+            self.placeholders.add(name)
+            pos = m.end()
+        self.segments.append(text[pos:])
+
+    def __contains__(self, name):
+        return name in self.placeholders
+
+    def parts(self, values):
+        ''' yield the parts of the filled template, placeholder values included '''
+        for index, segment in enumerate(self.segments):
+            if index % 2:
+                yield values.get(segment, u'')
+            elif segment:
+                yield segment
+
+    def render(self, values):
+        ''' return the filled template '''
+        return u''.join(self.parts(values))
+
+
+DEFAULT_TEMPLATE = Template(
+    u'<!DOCTYPE html><html><head><meta charset="utf-8">{{ HEAD }}</head><body>{{ BODY }}</body></html>'
+)
+BODY_TEMPLATE = Template(u'{{ BODY }}')
+
+
+class Page(object):
+    ''' a template with the values of its placeholders '''
+
+    def __init__(self, template, values):
+        self.template = template
+        self.values = values
+
+    @property
+    def body(self):
+        return self.values.get('BODY', u'')
+
+    def html(self, tail=u''):
+        ''' return the whole page, followed by tail '''
+        return self.template.render(self.values) + tail
+
+    def save(self, filename, tail=u''):
+        ''' write the page and tail to a file, without building the whole page first '''
+        with codecs.open(filename, 'w', encoding='utf-8') as f:
+            for part in self.template.parts(self.values):
+                f.write(part)
+            f.write(tail)
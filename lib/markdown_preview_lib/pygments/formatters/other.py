@@ -1,4 +1,4 @@
-from __future__ import absolute_import# -*- coding: utf-8 -*-
+# -*- coding: utf-8 -*-
 """
     pygments.formatters.other
     ~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+    pygments.lexers._guess_index
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Index used by ``guess_lexer_indexed``. This file is generated by itself.
+    Everytime a builtin lexer gets or loses an ``analyse_text`` method, or its
+    aliases change, regenerate it from the directory containing ``lib``:
+
+        python -m lib.markdown_preview_lib.pygments.lexers._guess_index
+
+    GUESS_LEXERS lists, in the order ``guess_lexer`` tries them, the lexers
+    that implement ``analyse_text``; all of the others always score 0.
+    SHEBANGS maps shebang interpreters to the lexer they are an alias of,
+    when ``guess_lexer`` recognizes that lexer from the shebang alone.
+    GUESS_INDEX_SIZE is the number of lexers the index was built from, so a
+    stale index can be detected.
+
+    Do not alter the index by hand.
+"""
+
+from __future__ import print_function
+
+GUESS_INDEX_SIZE = 341
+
+GUESS_LEXERS = (
+    'ActionScript3Lexer',
+    'AntlrActionScriptLexer',
+    'AntlrCSharpLexer',
+    'AntlrCppLexer',
+    'AntlrJavaLexer',
+    'AntlrLexer',
+    'AntlrObjectiveCLexer',
+    'AntlrPerlLexer',
+    'AntlrPythonLexer',
+    'AntlrRubyLexer',
+    'BashLexer',
+    'BugsLexer',
+    'CLexer',
+    'CMakeLexer',
+    'CSharpAspxLexer',
+    'Ca65Lexer',
+    'CbmBasicV2Lexer',
+    'CoqLexer',
+    'CppLexer',
+    'CssDjangoLexer',
+    'CssErbLexer',
+    'CssGenshiLexer',
+    'CssPhpLexer',
+    'CssSmartyLexer',
+    'CudaLexer',
+    'DiffLexer',
+    'DjangoLexer',
+    'DtdLexer',
+    'ECLexer',
+    'ErbLexer',
+    'GasLexer',
+    'GenshiLexer',
+    'GroffLexer',
+    'GroovyLexer',
+    'HaxeLexer',
+    'HtmlDjangoLexer',
+    'HtmlGenshiLexer',
+    'HtmlLexer',
+    'HtmlPhpLexer',
+    'HtmlSmartyLexer',
+    'HyLexer',
+    'IniLexer',
+    'JagsLexer',
+    'JasminLexer',
+    'JavascriptDjangoLexer',
+    'JavascriptErbLexer',
+    'JavascriptGenshiLexer',
+    'JavascriptPhpLexer',
+    'JavascriptSmartyLexer',
+    'JspLexer',
+    'JuliaLexer',
+    'LassoCssLexer',
+    'LassoHtmlLexer',
+    'LassoJavascriptLexer',
+    'LassoLexer',
+    'LassoXmlLexer',
+    'LimboLexer',
+    'LogosLexer',
+    'LogtalkLexer',
+    'MakefileLexer',
+    'MasonLexer',
+    'MatlabLexer',
+    'MqlLexer',
+    'NesCLexer',
+    'NixLexer',
+    'NumPyLexer',
+    'ObjectiveCLexer',
+    'ObjectiveCppLexer',
+    'ObjectiveJLexer',
+    'Perl6Lexer',
+    'PerlLexer',
+    'PhpLexer',
+    'PikeLexer',
+    'PrologLexer',
+    'Python3Lexer',
+    'PythonLexer',
+    'QBasicLexer',
+    'RagelCLexer',
+    'RagelCppLexer',
+    'RagelDLexer',
+    'RagelEmbeddedLexer',
+    'RagelJavaLexer',
+    'RagelObjectiveCLexer',
+    'RagelRubyLexer',
+    'RebolLexer',
+    'RegeditLexer',
+    'RexxLexer',
+    'RhtmlLexer',
+    'RslLexer',
+    'RstLexer',
+    'RubyLexer',
+    'SLexer',
+    'SmaliLexer',
+    'SmartyLexer',
+    'SourcesListLexer',
+    'SspLexer',
+    'StanLexer',
+    'SwiftLexer',
+    'SwigLexer',
+    'SystemVerilogLexer',
+    'TclLexer',
+    'TeaTemplateLexer',
+    'TexLexer',
+    'VbNetAspxLexer',
+    'VbNetLexer',
+    'VelocityLexer',
+    'VelocityXmlLexer',
+    'XmlDjangoLexer',
+    'XmlErbLexer',
+    'XmlLexer',
+    'XmlPhpLexer',
+    'XmlSmartyLexer',
+    'XsltLexer',
+)
+
+SHEBANGS = {
+    'bash': 'BashLexer',
+    'julia': 'JuliaLexer',
+    'perl': 'PerlLexer',
+    'perl6': 'Perl6Lexer',
+    'python': 'PythonLexer',
+    'python3': 'Python3Lexer',
+    'ruby': 'RubyLexer',
+    'sh': 'BashLexer',
+    'tcl': 'TclLexer',
+}
+
+if __name__ == '__main__':
+    import io
+    from . import LEXERS, _iter_lexerclasses, guess_lexer
+    from ..lexer import Lexer
+
+    def implements_analyse_text(cls):
+        for base in cls.__mro__:
+            if base is Lexer:
+                return False
+            if 'analyse_text' in base.__dict__:
+                return True
+        return False
+
+    names = dict((LEXERS[key][1], key) for key in LEXERS)
+    guess_lexers = []
+    for cls in _iter_lexerclasses():
+        if cls.name in names and implements_analyse_text(cls):
+            guess_lexers.append(names[cls.name])
+
+    shebangs = []
+    for key in sorted(LEXERS):
+        for alias in LEXERS[key][2]:
+            text = '#!/usr/bin/env %s\nx\n' % alias
+            try:
+                cls = type(guess_lexer(text))
+            except Exception:
+                continue
+            if cls.name == LEXERS[key][1] and cls.analyse_text(text) == 1.0:
+                shebangs.append((alias, key))
+    shebangs.sort()
+
+    # extract useful sourcecode from this file
+    with io.open(__file__, encoding='utf-8') as f:
+        content = f.read()
+    header = content[:content.find('GUESS_INDEX_SIZE = ')]
+    footer = content[content.find("if __name__ == '__main__':"):]
+
+    # write new file
+    with io.open(__file__, 'w', encoding='utf-8') as f:
+        f.write(header)
+        f.write('GUESS_INDEX_SIZE = %d\n\n' % len(LEXERS))
+        f.write('GUESS_LEXERS = (\n%s)\n\n' %
+                ''.join('    %r,\n' % str(key) for key in guess_lexers))
+        f.write('SHEBANGS = {\n%s}\n\n' %
+                ''.join('    %r: %r,\n' % (str(a), str(k)) for a, k in shebangs))
+        f.write(footer)
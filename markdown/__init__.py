@@ -39,7 +39,7 @@ import logging
 from . import util
 from .preprocessors import build_preprocessors
 from .blockprocessors import build_block_parser
-from .treeprocessors import build_treeprocessors
+from .treeprocessors import build_treeprocessors, run_treeprocessors
 from .inlinepatterns import build_inlinepatterns
 from .postprocessors import build_postprocessors
 from .extensions import Extension
@@ -61,6 +61,8 @@ class Markdown(object):
         'enable_attributes'     : True,
         'smart_emphasis'        : True,
         'lazy_ol'               : True,
+        'incremental'           : False,
+        'linear_inline'         : False,
     }
 
     output_formats = {
@@ -102,6 +104,12 @@ class Markdown(object):
         * enable_attributes: Enable the conversion of attributes. Default: True
         * smart_emphasis: Treat `_connected_words_` intelligently Default: True
         * lazy_ol: Ignore number of first item of ordered lists. Default: True
+        * incremental: Reuse the parsed blocks and inline results of the
+           unchanged parts of the document when the same instance converts
+           it again. Default: False
+        * linear_inline: Search for inline patterns from the position of the
+           last match instead of matching the whole text again. Overlapping
+           markup such as `**a* b*` can come out differently. Default: False
 
         """
 
@@ -128,6 +136,15 @@ class Markdown(object):
         self.registeredExtensions = []
         self.docType = ""
         self.stripTopLevelTags = True
+        # Set to an object with a `run_stage`-like `run` method to time
+        # each stage of the conversions
+        self.stage_timer = None
+        # Set to an object with an `add(name, seconds, size, matched)` method
+        # to record each regular expression run of the inline patterns
+        self.pattern_profiler = None
+        # Set to a function called with the name of each local file the
+        # conversion reads (such as the images embedded by b64)
+        self.dependency_callback = None
 
         self.build_parser()
 
@@ -282,22 +299,21 @@ class Markdown(object):
             e.reason += '. -- Note: Markdown only accepts unicode input!'
             raise
 
+        run = util.run_stage if self.stage_timer is None else self.stage_timer.run
+
         # Split into lines and run the line preprocessors.
         self.lines = source.split("\n")
-        for prep in self.preprocessors.values():
-            self.lines = prep.run(self.lines)
+        for name, prep in self.preprocessors.items():
+            self.lines = run('preprocessor ' + name, prep.run, self.lines)
 
         # Parse the high-level elements.
-        root = self.parser.parseDocument(self.lines).getroot()
+        root = run('blockparser', self.parser.parseDocument, self.lines).getroot()
 
         # Run the tree-processors
-        for treeprocessor in self.treeprocessors.values():
-            newRoot = treeprocessor.run(root)
-            if newRoot is not None:
-                root = newRoot
+        root = run_treeprocessors(root, self.treeprocessors.items(), run)
 
         # Serialize _properly_.  Strip top-level tags.
-        output = self.serializer(root)
+        output = run('serializer', self.serializer, root)
         if self.stripTopLevelTags:
             try:
                 start = output.index('<%s>'%self.doc_tag)+len(self.doc_tag)+2
@@ -312,8 +328,8 @@ class Markdown(object):
                     raise ValueError('Markdown failed to strip top-level tags. Document=%r' % output.strip())
 
         # Run the text post-processors
-        for pp in self.postprocessors.values():
-            output = pp.run(output)
+        for name, pp in self.postprocessors.items():
+            output = run('postprocessor ' + name, pp.run, output)
 
         return output.strip()
 
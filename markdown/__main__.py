@@ -6,7 +6,11 @@ COMMAND-LINE SPECIFIC STUFF
 
 import markdown
 import sys
+import os
+import glob
+import time
 import optparse
+import multiprocessing
 
 import logging
 from logging import DEBUG, INFO, CRITICAL
@@ -18,15 +22,26 @@ def parse_options():
     Define and parse `optparse` options for command-line usage.
     """
     usage = """%prog [options] [INPUTFILE]
-       (STDIN is assumed if no INPUTFILE is given)"""
+       (STDIN is assumed if no INPUTFILE is given)
+       %prog [options] DIRECTORY|PATTERN|INPUTFILE...
+       (Each file is built like the Markdown Preview build command does,
+       next to its source or to the same path under OUTPUT_DIR)"""
     desc = "A Python implementation of John Gruber's Markdown. " \
            "http://packages.python.org/Markdown/"
     ver = "%%prog %s" % markdown.version
     
     parser = optparse.OptionParser(usage=usage, description=desc, version=ver)
     parser.add_option("-f", "--file", dest="filename", default=None,
-                      help="Write output to OUTPUT_FILE. Defaults to STDOUT.",
+                      help="Write output to OUTPUT_FILE. Defaults to STDOUT. "
+                           "The output directory when converting several files.",
                       metavar="OUTPUT_FILE")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=None,
+                      help="Number of processes converting several files. "
+                           "Defaults to the number of CPUs.")
+    parser.add_option("--settings", dest="settings", default=None,
+                      help="Build several files with the Markdown Preview "
+                           "settings of SETTINGS_FILE over the defaults.",
+                      metavar="SETTINGS_FILE")
     parser.add_option("-e", "--encoding", dest="encoding",
                       help="Encoding for input and output files.",)
     parser.add_option("-q", "--quiet", default = CRITICAL,
@@ -54,13 +69,18 @@ def parse_options():
 
     if len(args) == 0:
         input_file = None
-    else:
+    elif len(args) == 1 and not os.path.isdir(args[0]) and \
+            not glob.has_magic(args[0]):
         input_file = args[0]
+    else:
+        input_file = find_files(args)
 
     if not options.extensions:
         options.extensions = []
 
     return {'input': input_file,
+            'jobs': options.jobs,
+            'settings': options.settings,
             'output': options.filename,
             'safe_mode': options.safe,
             'extensions': options.extensions,
@@ -68,6 +88,120 @@ def parse_options():
             'output_format': options.output_format,
             'lazy_ol': options.lazy_ol}, options.verbose
 
+MARKDOWN_EXTENSIONS = ('.md', '.markdown', '.mdown', '.mkd', '.mkdn', '.mdwn')
+
+def find_files(paths):
+    """
+    Return the markdown files in the given directories, glob patterns and
+    file names.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                        files.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            files.extend(sorted(f for f in glob.glob(path) if os.path.isfile(f)))
+    return files
+
+def load_headless():
+    """ Import the module building files like the Sublime Text plugin does. """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    import headless
+    return headless
+
+def load_settings(filename=None, extensions=None):
+    """
+    Return the default settings of the Sublime Text plugin, with the values
+    of the ``filename`` settings file and more ``extensions``.
+    """
+    headless = load_headless()
+    settings = headless.load_default_settings()
+    if filename:
+        with open(filename, 'rb') as f:
+            settings.update(headless.parse_settings(f.read().decode('utf-8')))
+    if extensions:
+        settings['enabled_extensions'] = list(settings.get('enabled_extensions', [])) + list(extensions)
+    return settings
+
+def common_directory(files):
+    """ Return the deepest directory holding all of the files. """
+    common = None
+    for input_file in files:
+        names = os.path.dirname(os.path.abspath(input_file)).split(os.sep)
+        if common is None:
+            common = names
+        else:
+            for i, (name, other) in enumerate(zip(common, names)):
+                if name != other:
+                    common = common[:i]
+                    break
+            else:
+                common = common[:len(names)]
+    return os.sep.join(common or []) or os.sep
+
+def convert_files(files, output_dir=None, jobs=None, settings=None):
+    """
+    Build several markdown files like the build command of the Sublime Text
+    plugin does, spread over a pool of ``jobs`` processes.
+
+    Each file is written next to its source, or to ``output_dir``, with an
+    ".html" extension.  In ``output_dir`` the files keep their path from the
+    deepest directory holding all of them, so files of the same name in
+    different folders don't overwrite each other.  Returns the number of
+    files that failed.
+
+    ``settings`` are the values of the plugin settings, its defaults if
+    None.  The front matter, references and html template of each file are
+    used like in a single-file build, and files that didn't change since
+    their last build are skipped.
+    """
+    tasks = []
+    outputs = {}
+    if output_dir:
+        root = common_directory(files)
+    for input_file in files:
+        output_file = os.path.splitext(input_file)[0] + '.html'
+        if output_dir:
+            output_file = os.path.join(output_dir, os.path.relpath(
+                os.path.abspath(output_file), root))
+        key = os.path.normcase(os.path.abspath(output_file))
+        if key in outputs:
+            sys.stderr.write('%s and %s would both be written to %s\n' %
+                             (outputs[key], input_file, output_file))
+            return len(files)
+        outputs[key] = input_file
+        tasks.append((os.path.abspath(input_file), os.path.abspath(output_file), 'markdown'))
+    for input_file, output_file, parser in tasks:
+        directory = os.path.dirname(output_file)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    if settings is None:
+        settings = load_settings()
+    jobs = min(jobs or multiprocessing.cpu_count(), len(tasks))
+    start = time.time()
+    failed = 0
+    # The plugin is imported in the worker processes only, with stubs of
+    # the sublime modules
+    for input_file, messages, elapsed, error in load_headless().build_files(tasks, settings, max(jobs, 1)):
+        sys.stdout.write('%s [%.2fs]\n' % (input_file, elapsed))
+        for message in messages:
+            sys.stdout.write(message + '\n')
+        if error:
+            failed += 1
+            sys.stderr.write(error)
+    sys.stdout.write('[%d files in %.2fs, %d jobs]\n' %
+                     (len(tasks), time.time() - start, max(jobs, 1)))
+    return failed
+
 def run():
     """Run Markdown from the command line."""
 
@@ -78,7 +212,14 @@ def run():
     logger.addHandler(logging.StreamHandler())
 
     # Run
-    markdown.markdownFromFile(**options)
+    jobs = options.pop('jobs')
+    settings = options.pop('settings')
+    if isinstance(options['input'], list):
+        settings = load_settings(settings, options['extensions'])
+        if convert_files(options['input'], options['output'], jobs, settings):
+            sys.exit(1)
+    else:
+        markdown.markdownFromFile(**options)
 
 if __name__ == '__main__':
     # Support running module as a commandline command. 
@@ -2,6 +2,8 @@ from __future__ import unicode_literals
 from __future__ import absolute_import
 from . import util
 from . import odict
+from .incremental import FragmentCache
+from collections import deque
 
 class State(list):
     """ Track the current and nested state of the parser. 
@@ -36,6 +38,71 @@ class State(list):
         else:
             return False
 
+class BlockQueue(deque):
+    """ The remaining blocks of a document.
+
+    BlockProcessors take blocks from and put blocks back at the front of the
+    queue, which a deque does in constant time where a list has to move all
+    of the other blocks.
+
+    The list methods BlockProcessors have always used on their ``blocks``
+    (``pop(0)``, ``insert(0, block)``, slicing...) keep working, so
+    processors written for a list need not be changed.
+
+    """
+
+    def pop(self, index=-1):
+        """ Remove and return the block at index (default last). """
+        if index == 0:
+            return self.popleft()
+        if index == -1:
+            return deque.pop(self)
+        block = self[index]
+        del self[index]
+        return block
+
+    def insert(self, index, block):
+        """ Insert a block before index. """
+        if index < 0:
+            index = max(len(self) + index, 0)
+        if index == 0:
+            self.appendleft(block)
+        elif index >= len(self):
+            self.append(block)
+        else:
+            self.rotate(-index)
+            self.appendleft(block)
+            self.rotate(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        return deque.__getitem__(self, index)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            blocks = list(self)
+            blocks[index] = value
+            self.clear()
+            self.extend(blocks)
+        else:
+            deque.__setitem__(self, index, value)
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if start == 0 and step == 1:
+                for i in range(stop):
+                    self.popleft()
+            else:
+                blocks = list(self)
+                del blocks[index]
+                self.clear()
+                self.extend(blocks)
+        else:
+            deque.__delitem__(self, index)
+
+
 class BlockParser:
     """ Parse Markdown blocks into an ElementTree object. 
     
@@ -43,10 +110,17 @@ class BlockParser:
     looping through them and creating an ElementTree object.
     """
 
+    # Blocks nested deeper than this (such as a line of hundreds of ">") are
+    # kept as text: each level of nesting takes a few frames of the stack
+    # and another pass over the text of the block.
+    max_depth = 50
+
     def __init__(self, markdown):
         self.blockprocessors = odict.OrderedDict()
         self.state = State()
         self.markdown = markdown
+        self.cache = None
+        self.depth = 0
 
     def parseDocument(self, lines):
         """ Parse a markdown document into an ElementTree. 
@@ -60,9 +134,62 @@ class BlockParser:
         """
         # Create a ElementTree from the lines
         self.root = util.etree.Element(self.markdown.doc_tag)
-        self.parseChunk(self.root, '\n'.join(lines))
+        if getattr(self.markdown, 'incremental', False) and \
+                not self.markdown.htmlStash.tag_data:
+            self.parseSections(self.root, '\n'.join(lines))
+        else:
+            self.parseChunk(self.root, '\n'.join(lines))
         return util.etree.ElementTree(self.root)
 
+    def isSectionStart(self, block):
+        """ Check if a block is a top level hash header.
+
+        Hash headers never look back at the blocks before them, so the
+        document can be parsed one section at a time from such a header to
+        the next one.
+
+        """
+        from .blockprocessors import HashHeaderProcessor
+        if not block.startswith('#'):
+            return False
+        for processor in self.blockprocessors.values():
+            if processor.test(self.root, block):
+                return isinstance(processor, HashHeaderProcessor)
+        return False
+
+    def parseSections(self, parent, text):
+        """ Parse a document section by section, reusing unchanged sections.
+
+        The blocks are the same ones ``parseChunk`` would produce. The
+        ElementTree fragment of each section is cached and a copy of it is
+        used the next time the same section is parsed.
+
+        """
+        if self.cache is None:
+            self.cache = FragmentCache(self.markdown)
+        self.cache.start()
+        sections = []
+        for block in text.split('\n\n'):
+            if sections and not self.isSectionStart(block):
+                sections[-1].append(block)
+            else:
+                sections.append([block])
+
+        for blocks in sections:
+            indexes = []
+            section = self.cache.normalize('\n\n'.join(blocks), indexes)
+            key = (section, self.cache.stashed(indexes))
+            elements = self.cache.get(key, indexes)
+            if elements is None:
+                base = self.markdown.htmlStash.html_counter
+                temp = util.etree.Element(parent.tag)
+                self.parseBlocks(temp, blocks)
+                elements = list(temp)
+                self.cache.set(key, indexes, elements, base)
+            for element in elements:
+                parent.append(element)
+        self.cache.finish()
+
     def parseChunk(self, parent, text):
         """ Parse a chunk of markdown text and attach to given etree node. 
         
@@ -75,13 +202,13 @@ class BlockParser:
         Nothing is returned.
 
         """
-        self.parseBlocks(parent, text.split('\n\n'))
+        self.parseBlocks(parent, BlockQueue(text.split('\n\n')))
 
     def parseBlocks(self, parent, blocks):
         """ Process blocks of markdown text and attach to given etree node. 
         
-        Given a list of ``blocks``, each blockprocessor is stepped through
-        until there are no blocks left. While an extension could potentially
+        Given a list or BlockQueue of ``blocks``, each blockprocessor is stepped
+        through until there are no blocks left. While an extension could potentially
         call this method directly, it's generally expected to be used internally.
 
         This is a public method as an extension may need to add/alter additional
@@ -89,11 +216,28 @@ class BlockParser:
         block.
 
         """
-        while blocks:
-            for processor in self.blockprocessors.values():
-                if processor.test(parent, blocks[0]):
-                    if processor.run(parent, blocks) is not False:
-                        # run returns True or None
-                        break
+        if isinstance(blocks, BlockQueue):
+            queue = blocks
+        else:
+            queue = BlockQueue(blocks)
+        if self.depth >= self.max_depth:
+            text = '\n\n'.join(queue).strip()
+            queue.clear()
+            if text:
+                util.etree.SubElement(parent, 'p').text = text
+        else:
+            self.depth += 1
+            try:
+                while queue:
+                    for processor in self.blockprocessors.values():
+                        if processor.test(parent, queue[0]):
+                            if processor.run(parent, queue) is not False:
+                                # run returns True or None
+                                break
+            finally:
+                self.depth -= 1
+        if queue is not blocks and isinstance(blocks, list):
+            # All of the blocks of a list have been used up
+            del blocks[:]
 
 
@@ -121,7 +121,8 @@ class BlockProcessor:
         Keywords:
 
         * ``parent``: A etree element which is the parent of the current block.
-        * ``blocks``: A list of all remaining blocks of the document.
+        * ``blocks``: A BlockQueue of all remaining blocks of the document.
+          It supports the list methods used on blocks as well.
         """
         pass
 
@@ -410,8 +411,11 @@ class UListProcessor(OListProcessor):
 class HashHeaderProcessor(BlockProcessor):
     """ Process Hash Headers. """
 
-    # Detect a header at start of any line in block
-    RE = re.compile(r'(^|\n)(?P<level>#{1,6})(?P<header>.*?)#*(\n|$)')
+    # Detect a header at start of any line in block. The header is the rest
+    # of the line up to its closing hashes, which each step of the group
+    # ends before: "(?P<header>.*?)#*" backtracks in quadratic time on long
+    # runs of hashes.
+    RE = re.compile(r'(^|\n)(?P<level>#{1,6})(?P<header>(?:#*[^#\n])*)#*(\n|$)')
 
     def test(self, parent, block):
         return bool(self.RE.search(block))
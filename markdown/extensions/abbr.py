@@ -40,7 +40,22 @@ class AbbrExtension(Extension):
     def extendMarkdown(self, md, md_globals):
         """ Insert AbbrPreprocessor before ReferencePreprocessor. """
         md.preprocessors.add('abbr', AbbrPreprocessor(md), '<reference')
-        
+        self.md = md
+        md.registerExtension(self)
+
+    def reset(self):
+        """ Remove the abbreviations defined by the previous document. """
+        for key in list(self.md.inlinePatterns.keys()):
+            if key.startswith('abbr-'):
+                del self.md.inlinePatterns[key]
+
+    def getIncrementalKey(self):
+        """ Return the abbreviations of the current document. """
+        return tuple([
+            (key, self.md.inlinePatterns[key].title)
+            for key in self.md.inlinePatterns.keys() if key.startswith('abbr-')
+        ])
+
            
 class AbbrPreprocessor(Preprocessor):
     """ Abbreviation Preprocessor - parse text for abbr references. """
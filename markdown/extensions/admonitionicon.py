@@ -16,22 +16,21 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 from __future__ import unicode_literals
 from __future__ import absolute_import
 from ..extensions import Extension
-from ..treeprocessors import Treeprocessor
+from ..treeprocessors import TreeVisitor
 from ..util import etree
 
 
-class AdmonitionIconTreeprocessor(Treeprocessor):
+class AdmonitionIconTreeprocessor(TreeVisitor):
     CLASSNAME_ICON = 'admonition-icon'
+    tags = set(["div"])
 
-    def run(self, root):
+    def visit(self, tag):
         """ Add admontion icon """
-        for tag in root.getiterator("div"):
-            classes = tag.attrib.get("class", "").split()
-            if "admonition" in classes:
-                span = etree.Element('span')
-                span.set('class', self.CLASSNAME_ICON)
-                tag.insert(0, span)
-        return root
+        classes = tag.attrib.get("class", "").split()
+        if "admonition" in classes:
+            span = etree.Element('span')
+            span.set('class', self.CLASSNAME_ICON)
+            tag.insert(0, span)
 
 
 class AdmonitionIconExtension(Extension):
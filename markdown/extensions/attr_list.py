@@ -21,7 +21,7 @@ Dependencies:
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from . import Extension
-from ..treeprocessors import Treeprocessor
+from ..treeprocessors import TreeVisitor
 from ..util import isBlockLevel
 import re
 
@@ -64,7 +64,7 @@ def get_attrs(str):
 def isheader(elem):
     return elem.tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
 
-class AttrListTreeprocessor(Treeprocessor):
+class AttrListTreeprocessor(TreeVisitor):
     
     BASE_RE = r'\{\:?([^\}]*)\}'
     HEADER_RE = re.compile(r'[ ]+%s[ ]*$' % BASE_RE)
@@ -75,67 +75,66 @@ class AttrListTreeprocessor(Treeprocessor):
                          r'\u3001-\ud7ff\uf900-\ufdcf\ufdf0-\ufffd'
                          r'\:\-\.0-9\u00b7\u0300-\u036f\u203f-\u2040]+')
 
-    def run(self, doc):
-        for elem in doc.getiterator():
-            if isBlockLevel(elem.tag):
-                # Block level: check for attrs on last line of text
-                RE = self.BLOCK_RE
-                if isheader(elem) or elem.tag == 'dt':
-                    # header or def-term: check for attrs at end of line
-                    RE = self.HEADER_RE
-                if len(elem) and elem.tag == 'li':
-                    # special case list items. children may include a ul or ol.
-                    pos = None
-                    # find the ul or ol position
-                    for i, child in enumerate(elem):
-                        if child.tag in ['ul', 'ol']:
-                            pos = i
-                            break
-                    if pos is None and elem[-1].tail:
-                        # use tail of last child. no ul or ol.
-                        m = RE.search(elem[-1].tail)
-                        if m:
-                            self.assign_attrs(elem, m.group(1))
-                            elem[-1].tail = elem[-1].tail[:m.start()]
-                    elif pos is not None and pos > 0 and elem[pos-1].tail:
-                        # use tail of last child before ul or ol
-                        m = RE.search(elem[pos-1].tail)
-                        if m:
-                            self.assign_attrs(elem, m.group(1))
-                            elem[pos-1].tail = elem[pos-1].tail[:m.start()]
-                    elif elem.text:
-                        # use text. ul is first child.
-                        m = RE.search(elem.text)
-                        if m:
-                            self.assign_attrs(elem, m.group(1))
-                            elem.text = elem.text[:m.start()]
-                elif len(elem) and elem[-1].tail:
-                    # has children. Get from tail of last child
+    def visit(self, elem):
+        if isBlockLevel(elem.tag):
+            # Block level: check for attrs on last line of text
+            RE = self.BLOCK_RE
+            if isheader(elem) or elem.tag == 'dt':
+                # header or def-term: check for attrs at end of line
+                RE = self.HEADER_RE
+            if len(elem) and elem.tag == 'li':
+                # special case list items. children may include a ul or ol.
+                pos = None
+                # find the ul or ol position
+                for i, child in enumerate(elem):
+                    if child.tag in ['ul', 'ol']:
+                        pos = i
+                        break
+                if pos is None and elem[-1].tail:
+                    # use tail of last child. no ul or ol.
                     m = RE.search(elem[-1].tail)
                     if m:
                         self.assign_attrs(elem, m.group(1))
                         elem[-1].tail = elem[-1].tail[:m.start()]
-                        if isheader(elem):
-                            # clean up trailing #s
-                            elem[-1].tail = elem[-1].tail.rstrip('#').rstrip()
+                elif pos is not None and pos > 0 and elem[pos-1].tail:
+                    # use tail of last child before ul or ol
+                    m = RE.search(elem[pos-1].tail)
+                    if m:
+                        self.assign_attrs(elem, m.group(1))
+                        elem[pos-1].tail = elem[pos-1].tail[:m.start()]
                 elif elem.text:
-                    # no children. Get from text.
+                    # use text. ul is first child.
                     m = RE.search(elem.text)
-                    if not m and elem.tag == 'td':
-                        m = re.search(self.BASE_RE, elem.text)
                     if m:
                         self.assign_attrs(elem, m.group(1))
                         elem.text = elem.text[:m.start()]
-                        if isheader(elem):
-                            # clean up trailing #s
-                            elem.text = elem.text.rstrip('#').rstrip()
-            else:
-                # inline: check for attrs at start of tail
-                if elem.tail:
-                    m = self.INLINE_RE.match(elem.tail)
-                    if m:
-                        self.assign_attrs(elem, m.group(1))
-                        elem.tail = elem.tail[m.end():]
+            elif len(elem) and elem[-1].tail:
+                # has children. Get from tail of last child
+                m = RE.search(elem[-1].tail)
+                if m:
+                    self.assign_attrs(elem, m.group(1))
+                    elem[-1].tail = elem[-1].tail[:m.start()]
+                    if isheader(elem):
+                        # clean up trailing #s
+                        elem[-1].tail = elem[-1].tail.rstrip('#').rstrip()
+            elif elem.text:
+                # no children. Get from text.
+                m = RE.search(elem.text)
+                if not m and elem.tag == 'td':
+                    m = re.search(self.BASE_RE, elem.text)
+                if m:
+                    self.assign_attrs(elem, m.group(1))
+                    elem.text = elem.text[:m.start()]
+                    if isheader(elem):
+                        # clean up trailing #s
+                        elem.text = elem.text.rstrip('#').rstrip()
+        else:
+            # inline: check for attrs at start of tail
+            if elem.tail:
+                m = self.INLINE_RE.match(elem.tail)
+                if m:
+                    self.assign_attrs(elem, m.group(1))
+                    elem.tail = elem.tail[m.end():]
 
     def assign_attrs(self, elem, attrs):
         """ Assign attrs to element. """
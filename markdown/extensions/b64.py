@@ -20,7 +20,7 @@ Modified to work with Sublime Markdown Preview
 from __future__ import unicode_literals
 from __future__ import absolute_import
 from ..extensions import Extension
-from ..treeprocessors import Treeprocessor
+from ..treeprocessors import TreeVisitor
 from os.path import exists, normpath, splitext, join
 import sys
 import base64
@@ -45,13 +45,13 @@ exclusion_list = tuple(
     ["data:%s;base64," % ft for ft in file_types.values()]
 )
 
+RE_WIN_DRIVE = re.compile(r"(^[A-Za-z]{1}:(?:\\|/))")
 
-def repl(path, base_path):
-    """ Replace path with b64 encoded data """
 
-    link = path
+def get_file_name(path, base_path):
+    """ Get the local file an image path points to, or None """
+
     absolute = False
-    re_win_drive = re.compile(r"(^[A-Za-z]{1}:(?:\\|/))")
 
     # Format the link
     if path.startswith('file://'):
@@ -59,38 +59,77 @@ def repl(path, base_path):
         if _PLATFORM == "windows" and not path.startswith('//'):
             path = path.lstrip("/")
         absolute = True
-    elif _PLATFORM == "windows" and re_win_drive.match(path) is not None:
+    elif _PLATFORM == "windows" and RE_WIN_DRIVE.match(path) is not None:
         absolute = True
 
-    if not path.startswith(exclusion_list):
-        if absolute:
-            file_name = normpath(path)
-        else:
-            file_name = normpath(join(base_path, path))
+    if path.startswith(exclusion_list):
+        return None
+    elif absolute:
+        return normpath(path)
+    return normpath(join(base_path, path))
+
 
-        if exists(file_name):
+def repl(path, base_path, exists=exists, inline=None):
+    """
+    Replace path with b64 encoded data.
+    If given, inline(file_name) returns the encoded data, or None to keep the path.
+    """
+
+    link = path
+    file_name = get_file_name(path, base_path)
+
+    if file_name is not None and splitext(file_name)[1].lower() in file_types:
+        if inline is not None:
+            data = inline(file_name)
+            if data is not None:
+                link = data
+        elif exists(file_name):
             ext = splitext(file_name)[1].lower()
-            if ext in file_types:
-                try:
-                    with open(file_name, "rb") as f:
-                        link = "data:%s;base64,%s" % (file_types[ext], base64.b64encode(f.read()).decode('ascii'))
-                except Exception as e:
-                    pass
+            try:
+                with open(file_name, "rb") as f:
+                    link = "data:%s;base64,%s" % (file_types[ext], base64.b64encode(f.read()).decode('ascii'))
+            except Exception as e:
+                pass
     return link
 
 
-class B64Treeprocessor(Treeprocessor):
-    def run(self, root):
-        """Replace resource with b64 encoded data"""
+class B64Treeprocessor(TreeVisitor):
+    tags = set(['img'])
+
+    def start(self, root):
         if self.config['base_path'] is None:
-            return root
+            return False
+        self.links = []
 
-        links = root.getiterator('img')
+    def visit(self, link):
+        if link.attrib.get("src") is not None:
+            self.links.append(link)
+
+    def finish(self, root):
+        """Replace resource with b64 encoded data"""
+        links, self.links = self.links, []
+
+        # Share the file checks and encoded images of the render
+        # if the markdown instance has them
+        stat_cache = getattr(self.markdown, 'stat_cache', None)
+        file_exists = exists if stat_cache is None else stat_cache.exists
+        inliner = getattr(self.markdown, 'asset_inliner', None)
+        # Report the images read, so that a build is redone when they change
+        dependency_callback = getattr(self.markdown, 'dependency_callback', None)
+
+        if inliner is not None or dependency_callback is not None:
+            file_names = [get_file_name(link.attrib["src"], self.config['base_path']) for link in links]
+            file_names = [f for f in file_names if f is not None and splitext(f)[1].lower() in file_types]
+            if dependency_callback is not None:
+                for file_name in file_names:
+                    dependency_callback(file_name)
+            if inliner is not None:
+                inliner.prefetch(file_names)
         for link in links:
-            src = link.attrib.get("src")
-            if src is not None:
-                link.attrib["src"] = repl(src, self.config['base_path'])
-        return root
+            link.attrib["src"] = repl(
+                link.attrib["src"], self.config['base_path'], file_exists,
+                None if inliner is None else inliner.inline
+            )
 
 
 class B64Extension(Extension):
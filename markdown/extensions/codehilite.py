@@ -21,19 +21,17 @@ Dependencies:
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from . import Extension
-from ..treeprocessors import Treeprocessor
+from ..treeprocessors import TreeVisitor
 import warnings
 try:
     import sys
     if sys.version_info >= (3, 0):
         from ...lib.markdown_preview_lib.pygments import highlight
-        from ...lib.markdown_preview_lib.pygments.lexers import get_lexer_by_name, guess_lexer
-        from ...lib.markdown_preview_lib.pygments.lexers.special import TextLexer
+        from ...lib.markdown_preview_lib.pygments.lexers import get_lexer_by_name, guess_lexer_indexed
         from ...lib.markdown_preview_lib.pygments.formatters import HtmlFormatter
     else:
         from lib.markdown_preview_lib.pygments import highlight
-        from lib.markdown_preview_lib.pygments.lexers import get_lexer_by_name, guess_lexer
-        from lib.markdown_preview_lib.pygments.lexers.special import TextLexer
+        from lib.markdown_preview_lib.pygments.lexers import get_lexer_by_name, guess_lexer_indexed
         from lib.markdown_preview_lib.pygments.formatters import HtmlFormatter
     pygments = True
 except ImportError as e:
@@ -56,6 +54,69 @@ def parse_hl_lines(expr):
         return []
 
 
+class HiliteCache(object):
+    """
+    Remember the highlighted html of the last ``size`` code blocks along with
+    the formatters and lexers used to build it.
+
+    Code blocks are keyed by their source and all of the options that affect
+    the output, so documents that are converted again only pass the code
+    blocks that changed through pygments.
+
+    """
+
+    def __init__(self, size=512):
+        self.size = size
+        self.tick = 0
+        self.html = {}
+        self.formatters = {}
+        self.lexers = {}
+
+    def get(self, key):
+        """ Return the html cached for key or None. """
+        entry = self.html.get(key)
+        if entry is None:
+            return None
+        self.tick += 1
+        entry[1] = self.tick
+        return entry[0]
+
+    def set(self, key, html):
+        """ Cache html for key, dropping the least recently used entries. """
+        if self.size <= 0:
+            return
+        if len(self.html) >= self.size:
+            # Drop the oldest quarter at once so eviction stays cheap
+            keys = sorted(self.html, key=lambda k: self.html[k][1])
+            for k in keys[:max(len(keys) // 4, 1)]:
+                del self.html[k]
+        self.tick += 1
+        self.html[key] = [html, self.tick]
+
+    def get_formatter(self, **options):
+        """ Return a shared HtmlFormatter for the given options. """
+        key = tuple(sorted(options.items()))
+        formatter = self.formatters.get(key)
+        if formatter is None:
+            formatter = self.formatters[key] = HtmlFormatter(**options)
+        return formatter
+
+    def get_lexer(self, lang):
+        """ Return a shared lexer for lang.  Raises ValueError if unknown. """
+        lexer = self.lexers.get(lang)
+        if lexer is None:
+            lexer = self.lexers[lang] = get_lexer_by_name(lang)
+        return lexer
+
+    def clear(self):
+        self.html.clear()
+        self.formatters.clear()
+        self.lexers.clear()
+
+
+HILITE_CACHE = HiliteCache()
+
+
 # ------------------ The Main CodeHilite Class ----------------------
 class CodeHilite(object):
     """
@@ -114,22 +175,30 @@ class CodeHilite(object):
             self._parseHeader()
 
         if pygments:
+            key = (self.src, self.lang, self.linenums, self.guess_lang,
+                   self.css_class, self.style, self.noclasses,
+                   tuple(self.hl_lines))
+            html = HILITE_CACHE.get(key)
+            if html is not None:
+                return html
             try:
-                lexer = get_lexer_by_name(self.lang)
+                lexer = HILITE_CACHE.get_lexer(self.lang)
             except ValueError:
                 try:
                     if self.guess_lang:
-                        lexer = guess_lexer(self.src)
+                        lexer = guess_lexer_indexed(self.src)
                     else:
-                        lexer = TextLexer()
+                        lexer = HILITE_CACHE.get_lexer('text')
                 except ValueError:
-                    lexer = TextLexer()
-            formatter = HtmlFormatter(linenos=self.linenums,
-                                      cssclass=self.css_class,
-                                      style=self.style,
-                                      noclasses=self.noclasses,
-                                      hl_lines=self.hl_lines)
-            return highlight(self.src, lexer, formatter)
+                    lexer = HILITE_CACHE.get_lexer('text')
+            formatter = HILITE_CACHE.get_formatter(linenos=self.linenums,
+                                                   cssclass=self.css_class,
+                                                   style=self.style,
+                                                   noclasses=self.noclasses,
+                                                   hl_lines=tuple(self.hl_lines))
+            html = highlight(self.src, lexer, formatter)
+            HILITE_CACHE.set(key, html)
+            return html
         else:
             # just escape and build markup usable by JS highlighting libs
             txt = self.src.replace('&', '&amp;')
@@ -205,30 +274,30 @@ class CodeHilite(object):
 
 
 # ------------------ The Markdown Extension -------------------------------
-class HiliteTreeprocessor(Treeprocessor):
+class HiliteTreeprocessor(TreeVisitor):
     """ Hilight source code in code blocks. """
 
-    def run(self, root):
+    tags = set(['pre'])
+
+    def visit(self, block):
         """ Find code blocks and store in htmlStash. """
-        blocks = root.getiterator('pre')
-        for block in blocks:
-            children = block.getchildren()
-            if len(children) == 1 and children[0].tag == 'code':
-                code = CodeHilite(children[0].text,
-                            linenums=self.config['linenums'],
-                            guess_lang=self.config['guess_lang'],
-                            css_class=self.config['css_class'],
-                            style=self.config['pygments_style'],
-                            noclasses=self.config['noclasses'],
-                            tab_length=self.markdown.tab_length)
-                placeholder = self.markdown.htmlStash.store(code.hilite(),
-                                                            safe=True)
-                # Clear codeblock in etree instance
-                block.clear()
-                # Change to p element which will later
-                # be removed when inserting raw html
-                block.tag = 'p'
-                block.text = placeholder
+        children = block.getchildren()
+        if len(children) == 1 and children[0].tag == 'code':
+            code = CodeHilite(children[0].text,
+                        linenums=self.config['linenums'],
+                        guess_lang=self.config['guess_lang'],
+                        css_class=self.config['css_class'],
+                        style=self.config['pygments_style'],
+                        noclasses=self.config['noclasses'],
+                        tab_length=self.markdown.tab_length)
+            placeholder = self.markdown.htmlStash.store(code.hilite(),
+                                                        safe=True)
+            # Clear codeblock in etree instance
+            block.clear()
+            # Change to p element which will later
+            # be removed when inserting raw html
+            block.tag = 'p'
+            block.text = placeholder
 
 
 class CodeHiliteExtension(Extension):
@@ -30,7 +30,9 @@ class DeleteExtension(Extension):
     def extendMarkdown(self, md, md_globals):
         """Add support for <del>test</del> tags as ~~test~~"""
         md.ESCAPED_CHARS.append('~')
-        md.inlinePatterns.add("del", SimpleTagPattern(RE_DEL, "del"), "<not_strong")
+        delete = SimpleTagPattern(RE_DEL, "del")
+        delete.needles = ('~~', '~~')
+        md.inlinePatterns.add("del", delete, "<not_strong")
 
 
 def makeExtension(configs={}):
@@ -49,6 +49,8 @@ class ExtraExtension(Extension):
     def extendMarkdown(self, md, md_globals):
         """ Register extension instances. """
         md.registerExtensions(extensions, self.config)
+        md.registerExtension(self)
+        self.md = md
         if not md.safeMode:
             # Turn on processing of markdown text within raw html
             md.preprocessors['html_block'].markdown_in_raw = True
@@ -59,6 +61,11 @@ class ExtraExtension(Extension):
             md.parser.blockprocessors.contain_span_tags = re.compile(
                 r'^(p|h[1-6]|li|dd|dt|td|th|legend|address)$', re.IGNORECASE)
 
+    def reset(self):
+        """ Restart the tag count along with the stashed tag data. """
+        if 'markdown_block' in self.md.parser.blockprocessors:
+            self.md.parser.blockprocessors.tag_counter = -1
+
 
 def makeExtension(configs={}):
     return ExtraExtension(configs=dict(configs))
@@ -137,8 +137,13 @@ class FencedBlockPreprocessor(Preprocessor):
             self.checked_for_codehilite = True
 
         text = "\n".join(lines)
+        # The text before each placeholder, each placeholder, and the rest.
+        # The search goes on from the end of the last block rather than
+        # from the start of the text.
+        parts = []
+        start = 0
         while 1:
-            m = self.FENCED_BLOCK_RE.search(text)
+            m = self.FENCED_BLOCK_RE.search(text, start)
             if m:
                 lang = ''
                 if m.group('lang'):
@@ -161,10 +166,12 @@ class FencedBlockPreprocessor(Preprocessor):
                     code = self.CODE_WRAP % (lang, self._escape(m.group('code')))
 
                 placeholder = self.markdown.htmlStash.store(code, safe=True)
-                text = '%s\n%s\n%s'% (text[:m.start()], placeholder, text[m.end():])
+                parts.append('%s\n%s\n'% (text[start:m.start()], placeholder))
+                start = m.end()
             else:
                 break
-        return text.split("\n")
+        parts.append(text[start:])
+        return "".join(parts).split("\n")
 
     def _escape(self, txt):
         """ basic html escaping """
@@ -74,8 +74,9 @@ class FootnoteExtension(Extension):
                              "<reference")
         # Insert an inline pattern before ImageReferencePattern
         FOOTNOTE_RE = r'\[\^([^\]]*)\]' # blah blah [^1] blah
-        md.inlinePatterns.add("footnote", FootnotePattern(FOOTNOTE_RE, self),
-                              "<reference")
+        footnotePattern = FootnotePattern(FOOTNOTE_RE, self)
+        footnotePattern.needles = ('[^', ']')
+        md.inlinePatterns.add("footnote", footnotePattern, "<reference")
         # Insert a tree-processor that would actually add the footnote div
         # This must be before all other treeprocessors (i.e., inline and 
         # codehilite) so they can run on the the contents of the div.
@@ -90,6 +91,12 @@ class FootnoteExtension(Extension):
         self.footnotes = OrderedDict()
         self.unique_prefix += 1
 
+    def getIncrementalKey(self):
+        """ Return the footnote state the footnote references depend on. """
+        if self.getConfig("UNIQUE_IDS"):
+            return (tuple(self.footnotes.keys()), self.unique_prefix)
+        return tuple(self.footnotes.keys())
+
     def findFootnotesPlaceholder(self, root):
         """ Return ElementTree Element that contains Footnote placeholder. """
         def finder(element):
@@ -16,35 +16,47 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 from __future__ import unicode_literals
 from __future__ import absolute_import
 from ..extensions import Extension
-from ..treeprocessors import Treeprocessor
-from .headerid import slugify, stashedHTML2text, itertext, unique
+from ..treeprocessors import TreeVisitor
+from .headerid import slugify, stashedHTML2text, itertext, unique, IdSet
 
 LINK = '<a name="user-content-%(id)s" href="#%(id)s" class="headeranchor-link"  aria-hidden="true"><span class="headeranchor"></span></a>'
 
 
-class HeaderAnchorTreeprocessor(Treeprocessor):
-    def run(self, root):
+class HeaderAnchorTreeprocessor(TreeVisitor):
+    def start(self, root):
+        self.used_ids = IdSet()
+        self.headers = []
+
+    def visit(self, tag):
+        """ Collect the headers and the id attributes """
+
+        if tag.tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            self.headers.append(tag)
+        elif "id" in tag.attrib:
+            self.used_ids.add(tag.attrib["id"])
+
+    def finish(self, root):
         """ Add header anchors """
 
-        # Get a list of id attributes
-        used_ids = set()
-        for tag in root.getiterator():
+        # Headers can get their id after they were visited (in the finish
+        # of headerid or toc)
+        used_ids, self.used_ids = self.used_ids, IdSet()
+        headers, self.headers = self.headers, []
+        for tag in headers:
             if "id" in tag.attrib:
                 used_ids.add(tag.attrib["id"])
 
-        for tag in root.getiterator():
-            if tag.tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
-                if "id" in tag.attrib:
-                    id = tag.get('id')
-                else:
-                    id = stashedHTML2text(''.join(itertext(tag)), self.md)
-                    id = unique(slugify(id, self.config.get('sep')), used_ids)
-                    tag.set('id', id)
-                tag.text = self.markdown.htmlStash.store(
-                    LINK % {"id": id},
-                    safe=True
-                ) + tag.text if tag.text is not None else ''
-        return root
+        for tag in headers:
+            if "id" in tag.attrib:
+                id = tag.get('id')
+            else:
+                id = stashedHTML2text(''.join(itertext(tag)), self.md)
+                id = unique(slugify(id, self.config.get('sep')), used_ids)
+                tag.set('id', id)
+            tag.text = self.markdown.htmlStash.store(
+                LINK % {"id": id},
+                safe=True
+            ) + tag.text if tag.text is not None else ''
 
 
 class HeaderAnchorExtension(Extension):
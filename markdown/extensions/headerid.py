@@ -77,7 +77,7 @@ Dependencies:
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from . import Extension
-from ..treeprocessors import Treeprocessor
+from ..treeprocessors import TreeVisitor
 from ..util import HTML_PLACEHOLDER_RE, parseBoolValue
 import re
 import logging
@@ -101,14 +101,38 @@ def slugify(value, separator):
     return re.sub('[%s\s]+' % separator, separator, value)
 
 
+class IdSet(set):
+    """
+    A set of ids which remembers how far unique() went for each base id:
+    '<base>_1' up to the one before counters[base] are all in the set.
+    Ids are never removed from it.
+    """
+
+    def __init__(self, *args):
+        set.__init__(self, *args)
+        self.counters = {}
+
+
 def unique(id, ids):
     """ Ensure id is unique in set of ids. Append '_1', '_2'... if not """
+    counters = getattr(ids, 'counters', None)
+    # the base whose ids were tried from '<base>_1' on, if any
+    counted = None
     while id in ids or not id:
         m = IDCOUNT_RE.match(id)
         if m:
-            id = '%s_%d'% (m.group(1), int(m.group(2))+1)
+            base, count = m.group(1), int(m.group(2))+1
+        else:
+            base, count = id, 1
+        if counters is not None and (count == 1 or base == counted):
+            # skip the ids already known to be taken
+            count = max(count, counters.get(base, 1))
+            counted = base
         else:
-            id = '%s_%d'% (id, 1)
+            counted = None
+        id = '%s_%d'% (base, count)
+    if counted is not None:
+        counters[counted] = count + 1
     ids.add(id)
     return id
 
@@ -144,29 +168,38 @@ def stashedHTML2text(text, md):
     return HTML_PLACEHOLDER_RE.sub(_html_sub, text)
 
 
-class HeaderIdTreeprocessor(Treeprocessor):
+class HeaderIdTreeprocessor(TreeVisitor):
     """ Assign IDs to headers. """
 
-    IDs = set()
+    IDs = IdSet()
+    tags = set(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+
+    def start(self, doc):
+        self.headers = []
+
+    def visit(self, elem):
+        self.headers.append(elem)
 
-    def run(self, doc):
+    def finish(self, doc):
+        # The text of the headers is only complete once the other
+        # treeprocessors are done with the whole tree.
+        headers, self.headers = self.headers, []
         start_level, force_id = self._get_meta()
         slugify = self.config['slugify']
         sep = self.config['separator']
-        for elem in doc.getiterator():
-            if elem.tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                if force_id:
-                    if "id" in elem.attrib:
-                        id = elem.get('id')
-                    else:
-                        id = stashedHTML2text(''.join(itertext(elem)), self.md)
-                        id = slugify(id, sep)
-                    elem.set('id', unique(id, self.IDs))
-                if start_level:
-                    level = int(elem.tag[-1]) + start_level
-                    if level > 6:
-                        level = 6
-                    elem.tag = 'h%d' % level
+        for elem in headers:
+            if force_id:
+                if "id" in elem.attrib:
+                    id = elem.get('id')
+                else:
+                    id = stashedHTML2text(''.join(itertext(elem)), self.md)
+                    id = slugify(id, sep)
+                elem.set('id', unique(id, self.IDs))
+            if start_level:
+                level = int(elem.tag[-1]) + start_level
+                if level > 6:
+                    level = 6
+                elem.tag = 'h%d' % level
 
 
     def _get_meta(self):
@@ -207,7 +240,7 @@ class HeaderIdExtension(Extension):
             md.treeprocessors.add('headerid', self.processor, '>prettify')
 
     def reset(self):
-        self.processor.IDs = set()
+        self.processor.IDs = IdSet()
 
 
 def makeExtension(configs=None):
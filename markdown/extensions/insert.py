@@ -27,7 +27,9 @@ class InsertExtension(Extension):
     def extendMarkdown(self, md, md_globals):
         """Add support for <ins>test</ins> tags as ^^test^^"""
         md.ESCAPED_CHARS.append('^')
-        md.inlinePatterns.add("ins", SimpleTagPattern(RE_INS, "ins"), "<not_strong")
+        insert = SimpleTagPattern(RE_INS, "ins")
+        insert.needles = ('^^', '^^')
+        md.inlinePatterns.add("ins", insert, "<not_strong")
 
 
 def makeExtension(configs={}):
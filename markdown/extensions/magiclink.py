@@ -65,7 +65,9 @@ class MagiclinkExtension(Extension):
         """Adds support for turning html links to link tags"""
 
         md.inlinePatterns.add("magiclink", MagiclinkPattern(RE_LINK, md), "<not_strong")
-        md.inlinePatterns.add("magicmail", MagicMailPattern(RE_MAIL, md), "<not_strong")
+        magicmail = MagicMailPattern(RE_MAIL, md)
+        magicmail.needles = ('@', '.')
+        md.inlinePatterns.add("magicmail", magicmail, "<not_strong")
 
 
 def makeExtension(configs={}):
@@ -26,17 +26,24 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from . import Extension
 from ..inlinepatterns import SimpleTagPattern
+import re
 
 SMART_STRONG_RE = r'(?<!\w)(_{2})(?!_)(.+?)(?<!_)\2(?!\w)'
 STRONG_RE = r'(\*{2})(.+?)\2'
+# a closing '__' is not followed by a word character
+SMART_STRONG_END_RE = re.compile(r'__(?!\w)', re.UNICODE)
 
 class SmartEmphasisExtension(Extension):
     """ Add smart_emphasis extension to Markdown class."""
 
     def extendMarkdown(self, md, md_globals):
         """ Modify inline patterns. """
-        md.inlinePatterns['strong'] = SimpleTagPattern(STRONG_RE, 'strong')
-        md.inlinePatterns.add('strong2', SimpleTagPattern(SMART_STRONG_RE, 'strong'), '>emphasis2')
+        strong = SimpleTagPattern(STRONG_RE, 'strong')
+        strong.needles = ('**', '**')
+        strong2 = SimpleTagPattern(SMART_STRONG_RE, 'strong')
+        strong2.needles = ('__', SMART_STRONG_END_RE)
+        md.inlinePatterns['strong'] = strong
+        md.inlinePatterns.add('strong2', strong2, '>emphasis2')
 
 def makeExtension(configs={}):
     return SmartEmphasisExtension(configs=dict(configs))
@@ -16,7 +16,7 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from ..extensions import Extension
-from ..treeprocessors import Treeprocessor
+from ..treeprocessors import TreeVisitor
 import re
 
 RE_CHECKBOX = re.compile(r"^(?P<checkbox> *\[(?P<state>(?:x|X| ){1})\] +)(?P<line>.*)")
@@ -26,7 +26,9 @@ def get_checkbox(state):
     return '<input type="checkbox" disabled%s> ' % (' checked' if state.lower() == 'x' else '')
 
 
-class TasklistTreeprocessor(Treeprocessor):
+class TasklistTreeprocessor(TreeVisitor):
+    tags = set(["ul", "ol"])
+
     def inline(self, li):
         """ Search for checkbox directly in li tag """
         found = False
@@ -55,13 +57,13 @@ class TasklistTreeprocessor(Treeprocessor):
                     found = True
         return found
 
-    def run(self, root):
-        """ Replace relative paths with absolute """
+    def visit(self, ul):
+        """ Replace list item checkbox markers with checkboxes """
 
-        parent_map = dict((c, p) for p in root.getiterator() for c in p)
-        task_items = []
-        lilinks = root.getiterator('li')
-        for li in lilinks:
+        found = False
+        for li in ul:
+            if li.tag != "li":
+                continue
             if li.text is None or li.text == "":
                 if not self.sub_paragraph(li):
                     continue
@@ -73,16 +75,14 @@ class TasklistTreeprocessor(Treeprocessor):
             classes = [] if c == "" else c.split()
             classes.append("task-list-item")
             li.attrib["class"] = ' '.join(classes)
-            task_items.append(li)
+            found = True
 
-        for li in task_items:
-            parent = parent_map[li]
-            c = parent.attrib.get("class", "")
+        if found:
+            c = ul.attrib.get("class", "")
             classes = [] if c == "" else c.split()
             if "task-list" not in classes:
                 classes.append("task-list")
-            parent.attrib["class"] = ' '.join(classes)
-        return root
+            ul.attrib["class"] = ' '.join(classes)
 
 
 class TasklistExtension(Extension):
@@ -12,9 +12,9 @@ Dependencies:
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from . import Extension
-from ..treeprocessors import Treeprocessor
+from ..treeprocessors import TreeVisitor
 from ..util import etree, parseBoolValue, AMP_SUBSTITUTE
-from .headerid import slugify, unique, itertext, stashedHTML2text
+from .headerid import slugify, unique, itertext, stashedHTML2text, IdSet
 import re
 
 
@@ -30,57 +30,36 @@ def order_toc_list(toc_list):
     [{'level': 2, 'children': []}, {'level': 1, 'children': []}]
     """
     
-    def build_correct(remaining_list, prev_elements=[{'level': 1000}]):
-        
-        if not remaining_list:
-            return [], []
-        
-        current = remaining_list.pop(0)
+    ordered_list = []
+    # The headers that can still get children, the last one opened last
+    prev_elements = [{'level': 1000}]
+    # The headers left to place, the next one last
+    remaining_list = toc_list[::-1]
+    while remaining_list:
+        current = remaining_list.pop()
         if not 'children' in current.keys():
             current['children'] = []
-        
-        if not prev_elements:
-            # This happens for instance with [8, 1, 1], ie. when some
-            # header level is outside a scope. We treat it as a
-            # top-level
-            next_elements, children = build_correct(remaining_list, [current])
-            current['children'].append(children)
-            return [current] + next_elements, []
-        
+
         prev_element = prev_elements.pop()
-        children = []
-        next_elements = []
         # Is current part of the child list or next list?
         if current['level'] > prev_element['level']:
-            #print "%d is a child of %d" % (current['level'], prev_element['level'])
             prev_elements.append(prev_element)
             prev_elements.append(current)
             prev_element['children'].append(current)
-            next_elements2, children2 = build_correct(remaining_list, prev_elements)
-            children += children2
-            next_elements += next_elements2
+        elif not prev_elements:
+            # No previous elements, so appending to the next set
+            ordered_list.append(current)
+            prev_elements = [current]
         else:
-            #print "%d is ancestor of %d" % (current['level'], prev_element['level'])
-            if not prev_elements:
-                #print "No previous elements, so appending to the next set"
-                next_elements.append(current)
-                prev_elements = [current]
-                next_elements2, children2 = build_correct(remaining_list, prev_elements)
-                current['children'].extend(children2)
-            else:
-                #print "Previous elements, comparing to those first"
-                remaining_list.insert(0, current)
-                next_elements2, children2 = build_correct(remaining_list, prev_elements)
-                children.extend(children2)
-            next_elements += next_elements2
-        
-        return next_elements, children
-    
-    ordered_list, __ = build_correct(toc_list)
+            # Previous elements, comparing to those first
+            remaining_list.append(current)
+
     return ordered_list
 
 
-class TocTreeprocessor(Treeprocessor):
+class TocTreeprocessor(TreeVisitor):
+
+    header_rgx = re.compile("[Hh][123456]")
     
     # Iterator wrapper to get parent and child all at once
     def iterparent(self, root):
@@ -128,27 +107,53 @@ class TocTreeprocessor(Treeprocessor):
             return ul
         
         return build_etree_ul(toc_list, div)
-        
-    def run(self, doc):
+
+    def is_marker(self, c):
+        return c.text and c.text.strip() == self.config["marker"] and \
+            not self.header_rgx.match(c.tag) and c.tag not in ['pre', 'code']
+
+    def start(self, doc):
+        self.used_ids = IdSet()
+        self.headers = []
+        self.markers = set()
+
+    def visit(self, c):
+        # Get a list of id attributes (headers get theirs in the finish of
+        # headerid), of the headers and of the markers
+        if self.header_rgx.match(c.tag):
+            self.headers.append(c)
+        else:
+            if "id" in c.attrib:
+                self.used_ids.add(c.attrib["id"])
+            if self.is_marker(c):
+                self.markers.add(c)
+
+    def finish(self, doc):
 
         div = etree.Element("div")
         div.attrib["class"] = "toc"
-        header_rgx = re.compile("[Hh][123456]")
+        header_rgx = self.header_rgx
         
         self.use_anchors = parseBoolValue(self.config["anchorlink"])
         self.use_permalinks = parseBoolValue(self.config["permalink"], False)
         if self.use_permalinks is None:
             self.use_permalinks = self.config["permalink"]
         
-        # Get a list of id attributes
-        used_ids = set()
-        for c in doc.getiterator():
+        used_ids, self.used_ids = self.used_ids, IdSet()
+        headers, self.headers = self.headers, []
+        for c in headers:
             if "id" in c.attrib:
                 used_ids.add(c.attrib["id"])
+        candidates, self.markers = self.markers, set()
+        candidates.update(headers)
 
         toc_list = []
         marker_found = False
-        for (p, c) in self.iterparent(doc):
+        # Headers and markers are handled in the order of the tree as it is
+        # changed (markers are replaced, header content is moved into links).
+        for (p, c) in (self.iterparent(doc) if candidates else []):
+            if c not in candidates:
+                continue
             text = ''.join(itertext(c)).strip()
             if not text:
                 continue
@@ -159,8 +164,7 @@ class TocTreeprocessor(Treeprocessor):
             # We do not allow the marker inside a header as that
             # would causes an enless loop of placing a new TOC 
             # inside previously generated TOC.
-            if c.text and c.text.strip() == self.config["marker"] and \
-               not header_rgx.match(c.tag) and c.tag not in ['pre', 'code']:
+            if self.is_marker(c):
                 for i in range(len(p)):
                     if p[i] == c:
                         p[i] = div
@@ -187,6 +191,8 @@ class TocTreeprocessor(Treeprocessor):
                     self.add_anchor(c, elem_id)
                 if self.use_permalinks:
                     self.add_permalink(c, elem_id)
+                if self.use_anchors or self.use_permalinks:
+                    candidates.update(a for a in c if self.is_marker(a))
                 
         toc_list_nested = order_toc_list(toc_list)
         self.build_toc_etree(div, toc_list_nested)
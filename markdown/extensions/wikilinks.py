@@ -110,6 +110,7 @@ class WikiLinkExtension(Extension):
         WIKILINK_RE = r'\[\[([\w0-9_ -]+)\]\]'
         wikilinkPattern = WikiLinks(WIKILINK_RE, self.getConfigs())
         wikilinkPattern.md = md
+        wikilinkPattern.needles = ('[[', ']]')
         md.inlinePatterns.add('wikilink', wikilinkPattern, "<not_strong")
 
 
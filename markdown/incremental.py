@@ -0,0 +1,157 @@
+"""
+INCREMENTAL RENDERING
+=============================================================================
+
+When the ``incremental`` option is set, a Markdown instance keeps the results
+of its expensive per block stages between conversions and reuses them for the
+parts of the document that did not change:
+
+* The BlockParser splits the document into sections that start at top level
+  hash headers and reuses the ElementTree fragments of unchanged sections.
+
+* The InlineProcessor reuses the processed fragment of every top level element
+  whose content, and the document wide state that inline patterns depend on
+  (references, meta data, abbreviations, footnotes...), did not change.
+
+The treeprocessors that work on the document as a whole (toc, headerid,
+footnotes...) still run on the assembled tree, so their output is the same as
+for a full conversion.
+
+Raw html placeholders are numbered in document order, so they are left out of
+the cache keys and renumbered when a cached fragment is reused.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from . import util
+from copy import deepcopy
+
+PLACEHOLDER_KEY = util.HTML_PLACEHOLDER % '*'
+
+
+def get_context(md):
+    """ Return the document wide state the inline patterns depend on. """
+    context = [
+        tuple(sorted(md.references.items())),
+        tuple(sorted((k, tuple(v)) for k, v in getattr(md, 'Meta', {}).items()))
+    ]
+    for extension in md.registeredExtensions:
+        if hasattr(extension, 'getIncrementalKey'):
+            context.append(extension.getIncrementalKey())
+    return tuple(context)
+
+
+class FragmentCache(object):
+    """
+    Cache ElementTree fragments for a processing stage.
+
+    Only the entries used by the last conversion are kept, so the cache never
+    grows much larger than the document itself.
+
+    """
+
+    def __init__(self, markdown):
+        self.markdown = markdown
+        self.entries = {}
+        self.used = {}
+
+    def start(self):
+        """ Prepare for a new document. """
+        self.used = {}
+
+    def finish(self):
+        """ Drop the entries the last document did not use. """
+        self.entries = self.used
+        self.used = {}
+
+    def normalize(self, text, indexes):
+        """
+        Replace the html placeholders in text with a constant.
+
+        The stash index of each placeholder is appended to ``indexes``.
+
+        """
+        def placeholder(m):
+            indexes.append(int(m.group(1)))
+            return PLACEHOLDER_KEY
+        if text and util.STX in text:
+            return util.HTML_PLACEHOLDER_RE.sub(placeholder, text)
+        return text
+
+    def signature(self, elem, indexes):
+        """ Return a hashable description of an element and its children. """
+        return (
+            elem.tag,
+            tuple(sorted((k, self.normalize(v, indexes)) for k, v in elem.attrib.items())),
+            isinstance(elem.text, util.AtomicString),
+            self.normalize(elem.text, indexes),
+            tuple([self.signature(child, indexes) for child in elem]),
+            self.normalize(elem.tail, indexes)
+        )
+
+    def stashed(self, indexes):
+        """ Return the stashed html for the given placeholder indexes. """
+        blocks = self.markdown.htmlStash.rawHtmlBlocks
+        return tuple([blocks[i] if i < len(blocks) else None for i in indexes])
+
+    def get(self, key, indexes):
+        """
+        Return a copy of the fragment cached for key, or None.
+
+        ``indexes`` are the current stash indexes of the placeholders that
+        were normalized when building the key.  The html stored in the stash
+        while building the fragment is stored again and the placeholders of
+        the copy are renumbered to match.
+
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.used[key] = entry
+        elements, old_indexes, stored, base = entry
+
+        stash = self.markdown.htmlStash
+        mapping = {}
+        for old, new in zip(old_indexes, indexes):
+            if old != new:
+                mapping[old] = new
+        if stash.html_counter != base:
+            for i in range(len(stored)):
+                mapping[base + i] = stash.html_counter + i
+
+        def renumber(text):
+            if mapping and text and util.STX in text:
+                return util.HTML_PLACEHOLDER_RE.sub(
+                    lambda m: util.HTML_PLACEHOLDER % mapping.get(int(m.group(1)), m.group(1)),
+                    text
+                )
+            return text
+
+        for html, safe in stored:
+            stash.store(renumber(html), safe)
+        elements = deepcopy(elements)
+        if mapping:
+            for element in elements:
+                for elem in element.getiterator():
+                    if elem.text:
+                        text = renumber(elem.text)
+                        if text is not elem.text:
+                            elem.text = type(elem.text)(text)
+                    if elem.tail:
+                        elem.tail = renumber(elem.tail)
+                    for k, v in elem.attrib.items():
+                        elem.set(k, renumber(v))
+        return elements
+
+    def set(self, key, indexes, elements, base):
+        """
+        Cache the fragment built for key.
+
+        ``base`` is the stash counter from before the fragment was built;
+        any html stored since then is kept with the fragment.
+
+        """
+        stash = self.markdown.htmlStash
+        stored = stash.rawHtmlBlocks[base:stash.html_counter]
+        self.used[key] = (deepcopy(elements), list(indexes), stored, base)
@@ -120,6 +120,34 @@ HTML_RE = r'(\<([a-zA-Z/][^\>]*?|\!--.*?--)\>)'               # <...>
 ENTITY_RE = r'(&[\#a-zA-Z0-9]*;)'               # &amp;
 LINE_BREAK_RE = r'  \n'                     # two spaces at end of line
 
+# Strings (or simple regular expressions) every match of a regular expression
+# contains, in this order.  Texts missing one of them are not searched (see
+# `Pattern.couldMatch`).
+NEEDLES = {
+    BACKTICK_RE: ('`', '`'),
+    ESCAPE_RE: ('\\',),
+    EMPHASIS_RE: ('*', '*'),
+    SMART_EMPHASIS_RE: ('_', re.compile(r'_(?!\w)', re.UNICODE)),
+    EMPHASIS_2_RE: ('_', '_'),
+    LINK_RE: ('[', '](', ')'),
+    IMAGE_LINK_RE: ('![', ']', '(', ')'),
+    REFERENCE_RE: ('[', ']', '[', ']'),
+    SHORT_REF_RE: ('[', ']'),
+    IMAGE_REFERENCE_RE: ('![', ']', '[', ']'),
+    AUTOLINK_RE: ('<', '://', '>'),
+    AUTOMAIL_RE: ('<', '@', '>'),
+    HTML_RE: ('<', '>'),
+    ENTITY_RE: ('&', ';'),
+    LINE_BREAK_RE: ('  \n',),
+}
+
+RE_BACKTICKS = re.compile('`+')
+# The start of LINK_RE, up to the "(" of the url
+RE_LINK_HEAD = re.compile(NOIMG + BRK + r'\(', re.DOTALL | re.UNICODE)
+RE_SPACES = re.compile(r'\s*', re.UNICODE)
+# Characters after which a url can't end
+RE_URL_TEXT = re.compile(r'''[^\s()"']*''', re.UNICODE)
+
 
 def dequote(string):
     """Remove quotes from around a string."""
@@ -158,6 +186,7 @@ class Pattern(object):
         self.pattern = pattern
         self.compiled_re = re.compile("^(.*?)%s(.*?)$" % pattern, 
                                       re.DOTALL | re.UNICODE)
+        self.needles = NEEDLES.get(pattern, ())
 
         # Api for Markdown to pass safe_mode into instance
         self.safe_mode = False
@@ -168,6 +197,27 @@ class Pattern(object):
         """ Return a compiled regular expression. """
         return self.compiled_re
 
+    def couldMatch(self, text, start=0):
+        """
+        Return False if the text from start can't match the pattern because
+        it lacks one of the `needles` of the pattern, or has them in another
+        order.  That takes linear time, where a regular expression that
+        doesn't match may try every position against the rest of the text.
+
+        """
+        for needle in self.needles:
+            if isinstance(needle, util.string_type):
+                start = text.find(needle, start)
+                if start == -1:
+                    return False
+                start += len(needle)
+            else:
+                m = needle.search(text, start)
+                if m is None:
+                    return False
+                start = m.end()
+        return True
+
     def handleMatch(self, m):
         """Return a ElementTree element from the given match.
 
@@ -262,12 +312,152 @@ class BacktickPattern(Pattern):
         Pattern.__init__(self, pattern)
         self.tag = "code"
 
+    def getCompiledRegExp(self):
+        """ Return a matcher of BACKTICK_RE that doesn't backtrack. """
+        if self.pattern == BACKTICK_RE:
+            return BACKTICK_MATCHER
+        return self.compiled_re
+
+    def getSearchRegExp(self):
+        """ Return an unanchored matcher of BACKTICK_RE that doesn't backtrack. """
+        if self.pattern == BACKTICK_RE:
+            return BACKTICK_MATCHER
+        return None
+
     def handleMatch(self, m):
         el = util.etree.Element(self.tag)
         el.text = util.AtomicString(m.group(3).strip())
         return el
 
 
+class SpanMatch(object):
+    """ A match object made of the spans of its groups, the whole match first. """
+    def __init__(self, string, spans):
+        self.string = string
+        self.spans = spans
+
+    def span(self, group=0):
+        return self.spans[group]
+
+    def start(self, group=0):
+        return self.spans[group][0]
+
+    def end(self, group=0):
+        return self.spans[group][1]
+
+    def group(self, *groups):
+        values = tuple(None if self.spans[group][0] < 0 else
+                       self.string[self.spans[group][0]:self.spans[group][1]]
+                       for group in groups or (0,))
+        if len(values) == 1:
+            return values[0]
+        return values
+
+    def groups(self):
+        return tuple(self.group(group) for group in range(1, len(self.spans)))
+
+
+class BacktickMatcher(object):
+    """
+    Match BACKTICK_RE in linear time.
+
+    The regular expression tries every length of every run of backticks
+    with every later position of the text, which takes cubic time on long
+    runs of backticks.  Its matches start at the first run (after an
+    escaped backtick) that is followed by a run as long or shorter, and end
+    at the first of the longest such runs.
+
+    """
+    def find(self, string, pos=0):
+        """
+        Return the start of the first match from pos, the length of its
+        backticks and the start of its closing backticks, or None.
+
+        """
+        runs = []
+        unread = RE_BACKTICKS.finditer(string, pos)
+        exhausted = False
+        # the length of the shortest run after each run, once all are read
+        shortest = None
+        index = 0
+        while index < len(runs) or not exhausted:
+            if index == len(runs):
+                m = next(unread, None)
+                if m is None:
+                    exhausted = True
+                    continue
+                runs.append(m.span())
+            start, end = runs[index]
+            index += 1
+            if start and string[start - 1] == '\\':
+                start += 1
+            longest = end - start
+            if not longest or shortest is not None and \
+                    (shortest[index - 1] is None or shortest[index - 1] > longest):
+                continue
+            # the first of the longest runs that are short enough
+            length = close = 0
+            following = index
+            while length < longest:
+                if following == len(runs):
+                    m = None if exhausted else next(unread, None)
+                    if m is None:
+                        exhausted = True
+                        break
+                    runs.append(m.span())
+                begin, finish = runs[following]
+                following += 1
+                if length < finish - begin <= longest:
+                    length, close = finish - begin, begin
+            if length:
+                return start, length, close
+            if shortest is None:
+                shortest = []
+                length = None
+                for begin, finish in reversed(runs):
+                    shortest.append(length)
+                    if length is None or finish - begin < length:
+                        length = finish - begin
+                shortest.reverse()
+        return None
+
+    def match(self, string, pos=0):
+        """ Return the match of the pattern with the groups `Pattern` adds. """
+        if pos:
+            # "^" never matches after the start of the string
+            return None
+        found = self.find(string)
+        if found is None:
+            return None
+        start, length, close = found
+        end = len(string)
+        if string.endswith('\n') and close + length < end:
+            # "$" matches before a final newline
+            end -= 1
+        return SpanMatch(string, [(0, end), (0, start),
+                                  (start, start + length),
+                                  (start + length, close),
+                                  (close + length, end)])
+
+    def search(self, string, pos=0):
+        """
+        Return the first match of the pattern from pos, wrapped in empty
+        groups like `InlineProcessor` searches patterns.
+
+        """
+        found = self.find(string, pos)
+        if found is None:
+            return None
+        start, length, close = found
+        end = close + length
+        return SpanMatch(string, [(start, end), (start, start),
+                                  (start, start + length),
+                                  (start + length, close), (end, end)])
+
+
+BACKTICK_MATCHER = BacktickMatcher()
+
+
 class DoubleTagPattern(SimpleTagPattern):
     """Return a ElementTree element nested in tag2 nested in tag1.
 
@@ -307,8 +497,201 @@ class HtmlPattern(Pattern):
         return util.INLINE_PLACEHOLDER_RE.sub(get_stash, text)
 
 
+class LinkScan(object):
+    """
+    The parts of LINK_RE after the "(" of the url, matched in a text.
+
+    The results found for a position are kept, so each character of the
+    text is read about once however many "[text](" there are before it.
+
+    """
+    def __init__(self, string):
+        self.string = string
+        self.urls = {}
+        self.angles = {}
+        self.titles = {'"': {}, "'": {}}
+        self.gaps = {}
+
+    def find(self, char, pos):
+        """ Return string.find(char, pos), remembering the last gap searched. """
+        start, found = self.gaps.get(char, (0, None))
+        if start <= pos and found is not None and (found < 0 or pos <= found):
+            return found
+        found = self.string.find(char, pos)
+        self.gaps[char] = (pos, found)
+        return found
+
+    def first(self, memo, char, pos, accept):
+        """ Return the first char from pos that accept(position) accepts, or -1. """
+        tried = []
+        found = self.find(char, pos)
+        while found >= 0 and found not in memo:
+            tried.append(found)
+            if accept(found):
+                break
+            found = self.find(char, found + 1)
+        result = memo[found] if found in memo else found
+        for position in tried:
+            memo[position] = result
+        return result
+
+    def endsTitle(self, pos):
+        return self.string.startswith(')', RE_SPACES.match(self.string, pos + 1).end())
+
+    def close(self, pos):
+        """
+        Match `\s*((['"])(.*?)\12\s*)?\)` at pos: return the spans of its
+        three groups, or None for each, and its end.  Return None if it
+        doesn't match.
+
+        """
+        string = self.string
+        pos = RE_SPACES.match(string, pos).end()
+        char = string[pos:pos + 1]
+        if char == ')':
+            return (None, None, None), pos + 1
+        if char in self.titles:
+            quote = self.first(self.titles[char], char, pos + 1, self.endsTitle)
+            if quote >= 0:
+                end = RE_SPACES.match(string, quote + 1).end()
+                return ((pos, end), (pos, pos + 1), (pos + 1, quote)), end + 1
+        return None
+
+    def endsAngle(self, pos):
+        return self.close(pos + 1) is not None
+
+    def urlEnd(self, pos):
+        """
+        Return the first position from pos where the url of
+        `((?:(?:\(.*?\))|[^\(\)]))*?` can end, or -1.
+
+        Its "\(.*?\)" can take the first ")" after a "(" every time: when
+        a longer one lets the link match, the next one does already.
+
+        """
+        string = self.string
+        tried = []
+        while pos not in self.urls:
+            tried.append(pos)
+            if self.close(pos) is not None:
+                break
+            if string.startswith('(', pos):
+                pos = self.find(')', pos + 1)
+                if pos < 0:
+                    break
+                pos += 1
+            elif pos < len(string):
+                # the url can't end before the next space, parenthesis or
+                # quote, nor inside spaces it can't end before
+                end = RE_SPACES.match(string, pos).end()
+                pos = end if end > pos else RE_URL_TEXT.match(string, pos + 1).end()
+            else:
+                pos = -1
+                break
+        result = self.urls.get(pos, pos)
+        for position in tried:
+            self.urls[position] = result
+        return result
+
+    def match(self, pos):
+        """
+        Match `\s*(<.*?>|(URL))\s*(TITLE)?\)` at pos: return the spans of
+        its groups and its end, or None if it doesn't match.
+
+        """
+        start = RE_SPACES.match(self.string, pos).end()
+        if self.string.startswith('<', start):
+            angle = self.first(self.angles, '>', start + 1, self.endsAngle)
+            if angle >= 0:
+                title, end = self.close(angle + 1)
+                return ((start, angle + 1), None) + title, end
+        url = self.urlEnd(start)
+        if url < 0:
+            return None
+        # the repeated group holds the last part of the url: a character,
+        # or a "(" up to the ")" it ends at, after the ")" before it
+        if url == start:
+            last = None
+        elif self.string[url - 1] == ')':
+            after = max(start, self.string.rfind(')', start, url - 1) + 1)
+            last = (self.string.find('(', after), url)
+        else:
+            last = (url - 1, url)
+        title, end = self.close(url)
+        return ((start, url), last) + title, end
+
+
+class LinkMatcher(object):
+    """
+    Match LINK_RE without trying the rest of the text for every "[text](".
+
+    The brackets of the text are matched by the regular expression, which
+    can only match them one way, the url and the title by a `LinkScan`.
+
+    """
+    def find(self, string, pos=0):
+        """
+        Return the spans of the groups of the first match from pos, the
+        whole match first, or None.
+
+        """
+        scan = LinkScan(string)
+        head = RE_LINK_HEAD.search(string, pos)
+        while head is not None:
+            tail = scan.match(head.end())
+            if tail is not None:
+                spans, end = tail
+                return [(head.start(), end)] + \
+                    [head.span(group) for group in range(1, 8)] + \
+                    [span or (-1, -1) for span in spans]
+            head = RE_LINK_HEAD.search(string, head.start() + 1)
+        return None
+
+    def match(self, string, pos=0):
+        """ Return the match of the pattern with the groups `Pattern` adds. """
+        if pos:
+            # "^" never matches after the start of the string
+            return None
+        spans = self.find(string)
+        if spans is None:
+            return None
+        start, end = spans[0]
+        last = len(string)
+        if string.endswith('\n') and end < last:
+            # "$" matches before a final newline
+            last -= 1
+        return SpanMatch(string, [(0, last), (0, start)] + spans[1:] + [(end, last)])
+
+    def search(self, string, pos=0):
+        """
+        Return the first match of the pattern from pos, wrapped in empty
+        groups like `InlineProcessor` searches patterns.
+
+        """
+        spans = self.find(string, pos)
+        if spans is None:
+            return None
+        start, end = spans[0]
+        return SpanMatch(string, [spans[0], (start, start)] + spans[1:] + [(end, end)])
+
+
+LINK_MATCHER = LinkMatcher()
+
+
 class LinkPattern(Pattern):
     """ Return a link element from the given match. """
+    def getCompiledRegExp(self):
+        """ Return a matcher of LINK_RE that doesn't backtrack over the text. """
+        if self.pattern == LINK_RE:
+            return LINK_MATCHER
+        return self.compiled_re
+
+    def getSearchRegExp(self):
+        """ Return an unanchored matcher of LINK_RE that doesn't backtrack over the text. """
+        if self.pattern == LINK_RE:
+            return LINK_MATCHER
+        return None
+
     def handleMatch(self, m):
         el = util.etree.Element("a")
         el.text = m.group(2)
@@ -48,9 +48,40 @@ class Postprocessor(util.Processor):
 class RawHtmlPostprocessor(Postprocessor):
     """ Restore raw html to the document. """
 
+    RE = re.compile('(<p>)?%s(</p>)?' % (util.HTML_PLACEHOLDER % r'([0-9]+)'))
+
     def run(self, text):
-        """ Iterate over html stash and restore "safe" html. """
-        for i in range(self.markdown.htmlStash.html_counter):
+        """ Restore "safe" html for all of the placeholders in one pass. """
+        self.expanded = {}
+        return self.substitute(text, 0)
+
+    def substitute(self, text, start):
+        """
+        Replace the placeholders of stash entries from ``start`` on in text.
+
+        Html restored from the stash may contain placeholders of later
+        entries, which are replaced as well.
+
+        """
+        def replace(m):
+            i = int(m.group(2))
+            if i < start or i >= self.markdown.htmlStash.html_counter:
+                return m.group(0)
+            html, block = self.get_html(i)
+            if block and m.group(1) and m.group(3):
+                return html + "\n"
+            return (m.group(1) or '') + html + (m.group(3) or '')
+        if util.STX not in text:
+            return text
+        return self.RE.sub(replace, text)
+
+    def get_html(self, i):
+        """
+        Return the html to restore for stash entry ``i`` and whether it can
+        replace a whole paragraph.
+
+        """
+        if i not in self.expanded:
             html, safe  = self.markdown.htmlStash.rawHtmlBlocks[i]
             if self.markdown.safeMode and not safe:
                 if str(self.markdown.safeMode).lower() == 'escape':
@@ -59,13 +90,10 @@ class RawHtmlPostprocessor(Postprocessor):
                     html = ''
                 else:
                     html = self.markdown.html_replacement_text
-            if self.isblocklevel(html) and (safe or not self.markdown.safeMode):
-                text = text.replace("<p>%s</p>" % 
-                            (self.markdown.htmlStash.get_placeholder(i)),
-                            html + "\n")
-            text =  text.replace(self.markdown.htmlStash.get_placeholder(i), 
-                                 html)
-        return text
+            block = self.isblocklevel(html) and \
+                (safe or not self.markdown.safeMode)
+            self.expanded[i] = (self.substitute(html, i + 1), block)
+        return self.expanded[i]
 
     def escape(self, html):
         """ Basic html escaping """
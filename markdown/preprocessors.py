@@ -98,22 +98,30 @@ class HtmlBlockPreprocessor(Preprocessor):
             return tag, len(tag)+2, {}
 
     def _recursive_tagfind(self, ltag, rtag, start_index, block):
+        # number of ltags found since the first start_index still waiting
+        # for their rtag; the next rtag and ltag are only searched again
+        # once start_index moved past them
+        depth = 0
+        i = j = -2
         while 1:
-            i = block.find(rtag, start_index)
-            if i == -1:
-                return -1
-            j = block.find(ltag, start_index)
-            # if no ltag, or rtag found before another ltag, return index
+            if i < start_index:
+                i = block.find(rtag, start_index)
+                if i == -1:
+                    return -1
+            if j != -1 and j < start_index:
+                j = block.find(ltag, start_index)
+            # if no ltag, or rtag found before another ltag, it closes the
+            # last ltag found
             if (j > i or j == -1):
-                return i + len(rtag)
+                if not depth:
+                    return i + len(rtag)
+                depth -= 1
+                start_index = i + len(rtag)
+                continue
             # another ltag found before rtag, use end of ltag as starting
             # point and search again
-            j = block.find('>', j)
-            start_index = self._recursive_tagfind(ltag, rtag, j + 1, block)
-            if start_index == -1:
-                # HTML potentially malformed- ltag has no corresponding
-                # rtag
-                return -1
+            depth += 1
+            start_index = block.find('>', j) + 1
 
     def _get_right_tag(self, left_tag, left_index, block):
         for p in self.right_tag_patterns:
@@ -3,6 +3,10 @@ from __future__ import absolute_import
 from . import util
 from . import odict
 from . import inlinepatterns
+import re
+from functools import partial
+from timeit import default_timer
+from .incremental import FragmentCache, get_context
 
 
 def build_treeprocessors(md_instance, **kwargs):
@@ -41,11 +45,124 @@ class Treeprocessor(util.Processor):
         pass
 
 
+class TreeVisitor(Treeprocessor):
+    """
+    A Treeprocessor that works on the elements of the tree one at a time.
+
+    Instead of walking the tree itself, a TreeVisitor subscribes to the
+    elements whose tag is in `tags` (None subscribes to all of them).
+    Consecutive TreeVisitors are run together, in a single walk of the
+    tree (see `run_treeprocessors`):
+
+    * `start` is called with the root before the walk. Returning False
+      leaves the visitor out of the walk (and `finish` isn't called).
+    * `visit` is called with each element it subscribed to, in document
+      order. It may change the element and its children, but anything
+      else in the tree must be left alone until `finish`.
+    * `finish` is called with the root after the walk.
+
+    For each element, the visitors are called in the order of the
+    treeprocessors, and so are their `finish` methods once the walk is
+    over. `visit` sees the changes the earlier visitors made in `visit`,
+    not in `finish`: work that needs the tree as the earlier
+    treeprocessors leave it belongs in `finish`.
+
+    """
+    tags = None
+
+    def start(self, root):
+        pass
+
+    def visit(self, element):
+        pass
+
+    def finish(self, root):
+        pass
+
+    def run(self, root):
+        """ Walk the tree for this visitor alone. """
+        walk_tree(root, [self])
+
+
+def walk_tree(root, visitors):
+    """ Walk the tree once, calling each visitor on the elements it wants. """
+    visitors = [v for v in visitors if v.start(root) is not False]
+    if visitors:
+        handlers = [(v.tags, v.visit) for v in visitors]
+        subscribed = {}
+        for element in root.getiterator():
+            tag = element.tag
+            try:
+                indexes = subscribed[tag]
+            except KeyError:
+                indexes = subscribed[tag] = [
+                    i for i, (tags, visit) in enumerate(handlers)
+                    if tags is None or tag in tags
+                ]
+            for i in indexes:
+                handlers[i][1](element)
+                if element.tag != tag:
+                    # The tag was changed: the next visitors are those of the new tag
+                    for tags, visit in handlers[i + 1:]:
+                        if tags is None or element.tag in tags:
+                            visit(element)
+                    break
+
+    for visitor in visitors:
+        visitor.finish(root)
+
+
+def _fused(treeprocessor):
+    """ Check if a treeprocessor is a TreeVisitor without its own `run`. """
+    run = type(treeprocessor).run
+    return isinstance(treeprocessor, TreeVisitor) and \
+        getattr(run, '__func__', run) is TreeVisitor.__dict__['run']
+
+
+def run_treeprocessors(root, treeprocessors, run=util.run_stage):
+    """
+    Run treeprocessors against the tree and return its (new) root.
+
+    Keyword arguments:
+
+    * root: The root of the ElementTree.
+    * treeprocessors: (name, treeprocessor) pairs.
+    * run: The function running each stage (see `util.run_stage`).
+
+    Consecutive TreeVisitors share a single walk of the tree, except the
+    ones with their own `run`. Their stage is named after all of them.
+
+    """
+    names = []
+    group = []
+    for name, treeprocessor in list(treeprocessors) + [(None, None)]:
+        if treeprocessor is not None and _fused(treeprocessor):
+            names.append(name)
+            group.append(treeprocessor)
+            continue
+        if group:
+            run('treeprocessor ' + '+'.join(names), partial(walk_tree, visitors=group), root)
+            names = []
+            group = []
+        if treeprocessor is not None:
+            newRoot = run('treeprocessor ' + name, treeprocessor.run, root)
+            if newRoot is not None:
+                root = newRoot
+    return root
+
+
 class InlineProcessor(Treeprocessor):
     """
     A Treeprocessor that traverses a tree, applying inline patterns.
     """
 
+    # Once its patterns were matched against more characters than this many
+    # times its length (and at least min_scan_budget), a text is searched
+    # like with `linear_inline`: matching it again from the start after
+    # every match takes time quadratic in its length.
+    scan_budget = 64
+    min_scan_budget = 2000000
+
     def __init__(self, md):
         self.__placeholder_prefix = util.INLINE_PLACEHOLDER_PREFIX
         self.__placeholder_suffix = util.ETX
@@ -54,6 +171,8 @@ class InlineProcessor(Treeprocessor):
         self.__placeholder_re = util.INLINE_PLACEHOLDER_RE
         self.markdown = md
         self.inlinePatterns = md.inlinePatterns
+        self.cache = None
+        self.__search_res = {}
 
     def __makePlaceholder(self, type):
         """ Generate a placeholder """
@@ -85,6 +204,23 @@ class InlineProcessor(Treeprocessor):
         self.stashed_nodes[id] = node
         return placeholder
 
+    def __match(self, function, data, pos, patternIndex):
+        """
+        Return function(data, pos), a match or search of the regular
+        expression of a pattern, recorded by the pattern profiler of
+        Markdown if it has one.
+
+        """
+        profiler = getattr(self.markdown, 'pattern_profiler', None)
+        if profiler is None:
+            return function(data, pos)
+        start = default_timer()
+        match = function(data, pos)
+        profiler.add(self.inlinePatterns.keyOrder[patternIndex],
+                     default_timer() - start, len(data) - pos,
+                     match is not None)
+        return match
+
     def __handleInline(self, data, patternIndex=0):
         """
         Process string with inline patterns and replace it
@@ -99,11 +235,24 @@ class InlineProcessor(Treeprocessor):
 
         """
         if not isinstance(data, util.AtomicString):
+            linear = getattr(self.markdown, 'linear_inline', False)
+            budget = max(len(data) * self.scan_budget, self.min_scan_budget)
             startIndex = 0
             while patternIndex < len(self.inlinePatterns):
-                data, matched, startIndex = self.__applyPattern(
-                    self.inlinePatterns.value_for_index(patternIndex),
-                    data, patternIndex, startIndex)
+                pattern = self.inlinePatterns.value_for_index(patternIndex)
+                if linear:
+                    data, matched, startIndex = self.__searchPattern(
+                        pattern, data, patternIndex, startIndex)
+                elif budget < 0:
+                    # go on with the linear search from the same place
+                    linear = True
+                    data, matched, startIndex = self.__searchPattern(
+                        pattern, data, patternIndex, startIndex,
+                        startIndex > 0)
+                else:
+                    budget -= len(data) - startIndex
+                    data, matched, startIndex = self.__applyPattern(
+                        pattern, data, patternIndex, startIndex)
                 if not matched:
                     patternIndex += 1
         return data
@@ -224,7 +373,12 @@ class InlineProcessor(Treeprocessor):
         Returns: String with placeholders instead of ElementTree elements.
 
         """
-        match = pattern.getCompiledRegExp().match(data[startIndex:])
+        couldMatch = getattr(pattern, 'couldMatch', None)
+        if couldMatch is not None and not couldMatch(data, startIndex):
+            return data, False, 0
+
+        match = self.__match(pattern.getCompiledRegExp().match,
+                             data[startIndex:], 0, patternIndex)
         leftData = data[:startIndex]
 
         if not match:
@@ -253,6 +407,109 @@ class InlineProcessor(Treeprocessor):
                              match.group(1),
                              placeholder, match.groups()[-1]), True, 0
 
+    def __getSearchRegExp(self, pattern):
+        """
+        Return an unanchored version of the regular expression of a pattern.
+
+        The pattern is wrapped in empty groups so that its own groups keep the
+        numbers ``handleMatch`` expects. Returns None for patterns that do not
+        use the regular expression built by ``Pattern``, unless they have a
+        ``getSearchRegExp`` method returning their own.
+
+        """
+        try:
+            return self.__search_res[pattern]
+        except KeyError:
+            pass
+        regexp = None
+        getSearchRegExp = getattr(pattern, 'getSearchRegExp', None)
+        if getSearchRegExp is not None:
+            regexp = getSearchRegExp()
+        compiled_re = getattr(pattern, 'compiled_re', None)
+        if regexp is None and compiled_re is not None and \
+                isinstance(getattr(pattern, 'pattern', None), util.string_type) and \
+                pattern.getCompiledRegExp() is compiled_re:
+            regexp = re.compile("()%s()" % pattern.pattern, compiled_re.flags)
+        self.__search_res[pattern] = regexp
+        return regexp
+
+    def __searchPattern(self, pattern, data, patternIndex, startIndex=0,
+                        skipped=False):
+        """
+        Search for the pattern from startIndex, create the necessary
+        elements, add it to stashed_nodes.
+
+        Unlike ``__applyPattern``, the search resumes at the placeholder of
+        the last match instead of the start of the text, so the whole text is
+        only scanned once per pattern.  The text is only sliced after a match
+        the pattern skips, as ``__applyPattern`` does.
+
+        Keyword arguments:
+
+        * data: the text to be processed
+        * pattern: the pattern to be checked
+        * patternIndex: index of current pattern
+        * startIndex: string index, from which we start searching
+        * skipped: whether startIndex is the end of a match the pattern
+          skipped, after which the rest of the text is matched on its own
+
+        Returns: String with placeholders instead of ElementTree elements.
+
+        """
+        regexp = self.__getSearchRegExp(pattern)
+        if regexp is None:
+            return self.__applyPattern(pattern, data, patternIndex, startIndex)
+
+        couldMatch = getattr(pattern, 'couldMatch', None)
+        if couldMatch is not None and not couldMatch(data, startIndex):
+            return data, False, 0
+
+        if skipped:
+            offset = startIndex
+            match = self.__match(regexp.search, data[offset:], 0,
+                                 patternIndex)
+        else:
+            offset = 0
+            match = self.__match(regexp.search, data, startIndex,
+                                 patternIndex)
+        node = None
+        while match:
+            node = pattern.handleMatch(match)
+            if node is not None:
+                break
+            # Like __applyPattern, match the rest of the text on its own, so
+            # that lookbehinds and anchors don't see the text before it
+            offset += match.end()
+            if couldMatch is not None and not couldMatch(data, offset):
+                match = None
+            else:
+                match = self.__match(regexp.search, data[offset:], 0,
+                                     patternIndex)
+
+        if not match:
+            return data, False, 0
+
+        if not isString(node):
+            if not isinstance(node.text, util.AtomicString):
+                # We need to process current node too
+                for child in [node] + list(node):
+                    if child.text:
+                        child.text = self.__handleInline(child.text,
+                                                         patternIndex + 1)
+                    if child.tail:
+                        child.tail = self.__handleInline(child.tail,
+                                                         patternIndex)
+
+        placeholder = self.__stashNode(node, pattern.type())
+        start, end = match.start() + offset, match.end() + offset
+        if data.endswith('\n') and end < len(data):
+            # The "(.*?)$" group of __applyPattern stops before a final newline
+            tail = data[end:-1]
+        else:
+            tail = data[end:]
+
+        return data[:start] + placeholder + tail, True, start
+
     def run(self, tree):
         """Apply inline patterns to a parsed Markdown tree.
 
@@ -272,12 +529,55 @@ class InlineProcessor(Treeprocessor):
         """
         self.stashed_nodes = {}
 
+        if getattr(self.markdown, 'incremental', False):
+            self.__processIncremental(tree)
+        else:
+            self.__processTree(tree)
+        return tree
+
+    def __processIncremental(self, tree):
+        """
+        Apply inline patterns one top level element at a time, reusing the
+        result of the last conversion for elements that did not change.
+
+        """
+        if self.cache is None:
+            self.cache = FragmentCache(self.markdown)
+        self.cache.start()
+        context = get_context(self.markdown)
+        children = []
+        for child in list(tree):
+            indexes = []
+            signature = self.cache.signature(child, indexes)
+            key = (signature, self.cache.stashed(indexes), context)
+            elements = self.cache.get(key, indexes)
+            if elements is None:
+                base = self.markdown.htmlStash.html_counter
+                wrapper = util.etree.Element(tree.tag)
+                wrapper.append(child)
+                self.__processTree(wrapper)
+                elements = list(wrapper)
+                self.cache.set(key, indexes, elements, base)
+            children.extend(elements)
+        tree[:] = children
+        self.cache.finish()
+
+    def __processTree(self, tree):
+        """ Apply inline patterns to all of the children of tree. """
         stack = [tree]
 
         while stack:
             currElement = stack.pop()
             insertQueue = []
-            for child in currElement:
+            # The children left to process, the next one last.  The elements
+            # made from the tail of a child come right after it, and are
+            # processed next.
+            pending = list(currElement)
+            pending.reverse()
+            children = []
+            while pending:
+                child = pending.pop()
+                children.append(child)
                 if child.text and not isinstance(child.text, util.AtomicString):
                     text = child.text
                     child.text = None
@@ -293,12 +593,12 @@ class InlineProcessor(Treeprocessor):
                         child.tail = dumby.text
                     else:
                         child.tail = None
-                    pos = list(currElement).index(child) + 1
                     tailResult.reverse()
-                    for newChild in tailResult:
-                        currElement.insert(pos, newChild)
+                    pending.extend(tailResult)
                 if len(child):
                     stack.append(child)
+            if len(children) != len(currElement):
+                currElement[:] = children
 
             for element, lst in insertQueue:
                 if self.markdown.enable_attributes:
@@ -320,7 +620,6 @@ class InlineProcessor(Treeprocessor):
                                                                     newChild)
                     element.insert(i, newChild)
                     i += 1
-        return tree
 
 
 class PrettifyTreeprocessor(Treeprocessor):
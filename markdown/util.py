@@ -98,6 +98,16 @@ def parseBoolValue(value, fail_on_errors=True):
     elif fail_on_errors:
         raise ValueError('Cannot parse bool value: %r' % value)
 
+
+def run_stage(name, function, data):
+    """
+    Run a stage of the conversion: return function(data).
+
+    `Markdown.stage_timer` replaces it with one that records the time
+    the stages take, it has the same arguments.
+    """
+    return function(data)
+
 """
 MISC AUXILIARY CLASSES
 =============================================================================
@@ -149,6 +159,8 @@ class HtmlStash(object):
     def reset(self):
         self.html_counter = 0
         self.rawHtmlBlocks = []
+        self.tag_counter = 0
+        self.tag_data = []
 
     def get_placeholder(self, key):
         return HTML_PLACEHOLDER % key
@@ -1,13 +1,29 @@
 from __future__ import absolute_import
 import sublime
 import traceback
+import time
 
 ST3 = int(sublime.version()) >= 3000
+STARTUP_TIMES = []
 
+
+def record_startup_time(step, start):
+    """ Record how long a plugin loading step took since start. """
+    STARTUP_TIMES.append((step, time.time() - start))
+
+
+def startup_report():
+    """ Return a one line summary of the recorded plugin loading steps. """
+    return 'Markdown Preview startup: %s' % ', '.join(
+        '%s %.3fs' % (step, elapsed) for step, elapsed in STARTUP_TIMES
+    )
+
+_start = time.time()
 if ST3:
     from .markdown import Markdown, util
     from .markdown.extensions import Extension
     import importlib
+    record_startup_time('markdown', _start)
 else:
     import sys
     import os
@@ -16,21 +32,40 @@ else:
     pygment_path = os.path.join(sublime.packages_path(), "Markdown Preview", "lib")
     if pygment_path not in sys.path:
         sys.path.append(pygment_path)
-    # In the sublime environment, there just appears to be no other way.
-    # Loop through and import the submodules so we can find them later
-    for parent in ("lexers", "styles"):
-        parent_folder = os.path.join(pygment_path, "markdown_preview_lib", "pygments", parent)
-        for mod in os.listdir(parent_folder):
-            if mod.endswith(".py") and mod != "__init__.py":
-                __import__("lib.markdown_preview_lib.pygments.%s.%s" % (parent, mod[:-3]))
+    # Sublime Text 2 loads the plugin with the package folder as the current
+    # directory, so the packages are imported with relative search paths and
+    # their submodules can't be found once the directory changes. Make the
+    # search paths of the pygments packages absolute instead of importing all
+    # of the lexers and styles now: they are imported on first use through
+    # the LEXERS and STYLE_MAP tables.
+    for package in (
+        "lib", "lib.markdown_preview_lib", "lib.markdown_preview_lib.pygments",
+        "lib.markdown_preview_lib.pygments.lexers", "lib.markdown_preview_lib.pygments.styles",
+        "lib.markdown_preview_lib.pygments.formatters", "lib.markdown_preview_lib.pygments.filters"
+    ):
+        module = __import__(package, None, None, ['__path__'])
+        module.__path__ = [os.path.abspath(path) for path in module.__path__]
+    record_startup_time('pygments', _start)
+    _start = time.time()
     from markdown import Markdown, util
     from markdown.extensions import Extension
+    record_startup_time('markdown', _start)
 
 
 class StMarkdown(Markdown):
     def __init__(self, *args, **kwargs):
         Markdown.__init__(self, *args, **kwargs)
         self.Meta = {}
+        # StatCache of the current render, used by extensions looking at files
+        self.stat_cache = None
+        # AssetInliner of the current render, used by extensions embedding images
+        self.asset_inliner = None
+
+    def reset(self):
+        """ Reset the per document state, including the meta data. """
+        Markdown.reset(self)
+        self.Meta = {}
+        return self
 
     def registerExtensions(self, extensions, configs):
         """
@@ -111,3 +146,50 @@ class StMarkdown(Markdown):
                       "'%s': %s" % (ext_name, message)
             e.args = (message,) + e.args[1:]
             raise
+
+
+class StMarkdownCache(object):
+    """
+    Keep warm StMarkdown instances keyed by their extension list and options.
+
+    Building a Markdown instance imports and registers every extension
+    and compiles all of the inline pattern regexes, so reusing instances
+    between conversions saves that setup on every preview.  Instances
+    are reset before they are handed out again and the least recently
+    used one is dropped once the cache is full.  A size of 0 disables
+    the cache.
+    """
+
+    def __init__(self, size=4):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        """ Drop all cached instances. """
+        self._instances = {}
+        self._order = []
+
+    def resize(self, size):
+        """ Set the cache size and evict instances that no longer fit. """
+        self.size = size
+        self._evict()
+
+    def _evict(self):
+        while len(self._order) > max(self.size, 0):
+            del self._instances[self._order.pop(0)]
+
+    def get(self, extensions, **options):
+        """ Return a ready to use StMarkdown instance for the given extensions and options. """
+        key = (tuple(extensions), tuple(sorted(options.items())))
+        md = self._instances.get(key)
+        if md is None:
+            md = StMarkdown(extensions=list(extensions), **options)
+            if self.size > 0:
+                self._instances[key] = md
+                self._order.append(key)
+                self._evict()
+        else:
+            self._order.remove(key)
+            self._order.append(key)
+            md.reset()
+        return md
@@ -5,18 +5,25 @@ import sys
 import re
 
 BUILTIN_KEYS = ('basepath', 'references', 'destination')
+RE_WIN_DRIVE = re.compile(r"(^[A-Za-z]{1}:(?:\\|/))")
 
 ST3 = int(sublime.version()) >= 3000
 if ST3:
+    from .stat_cache import StatCache
     unicode_str = str
 else:
+    from stat_cache import StatCache
     unicode_str = unicode
 
 
 class Settings(object):
-    def __init__(self, settings_file, file_name):
+    def __init__(self, settings_file, file_name, stat_cache=None):
         self.file_name = file_name
         self._sub_settings = sublime.load_settings(settings_file)
+        if stat_cache is None:
+            stat_cache = StatCache(bool(self._sub_settings.get('persistent_stat_cache', False)))
+        # Files and folders looked at during this render
+        self.stat_cache = stat_cache
         self._overrides = {
             "builtin": {
                 "references": [],
@@ -24,11 +31,14 @@ class Settings(object):
             },
             "meta": {}
         }
+        # Sublime settings read so far, with the values they had
+        self.used = {}
 
     def get(self, key, default=None):
         if key in self._overrides:
             return self._overrides[key]
         else:
+            self.used[key] = self._sub_settings.get(key)
             return self._sub_settings.get(key, default)
 
     def set(self, key, value):
@@ -44,8 +54,7 @@ class Settings(object):
         absolute = False
         if pth is not None:
             if sys.platform.startswith('win'):
-                re_win_drive = re.compile(r"(^[A-Za-z]{1}:(?:\\|/))")
-                if re_win_drive.match(pth) is not None or pth.startswith("//"):
+                if RE_WIN_DRIVE.match(pth) is not None or pth.startswith("//"):
                     absolute = True
             elif pth.startswith('/'):
                 absolute = True
@@ -71,10 +80,10 @@ class Settings(object):
                 for base in (current_dir, basepath):
                     if base is not None:
                         temp = os.path.join(base, target)
-                        if os.path.exists(temp):
+                        if self.stat_cache.exists(temp):
                             target = temp
                             break
-            elif not os.path.exists(target):
+            elif not self.stat_cache.exists(target):
                 target = None
         return target
 
@@ -84,13 +93,13 @@ class Settings(object):
             basepath = os.path.expanduser(basepath)
 
         if (
-            basepath is not None and os.path.exists(basepath) and
-            self.is_abs(basepath) and os.path.isdir(basepath)
+            basepath is not None and self.is_abs(basepath) and
+            self.stat_cache.isdir(basepath)
         ):
             # A valid path was fed in
             path = basepath
             basepath = path
-        elif self.file_name is not None and os.path.exists(self.file_name):
+        elif self.file_name is not None and self.stat_cache.exists(self.file_name):
             basepath = os.path.dirname(self.file_name)
         else:
             # Okay, there is no way to tell the orign.
@@ -123,7 +132,7 @@ class Settings(object):
                     refs = []
                     for ref in value:
                         file_name = self.resolve_meta_path(ref)
-                        if file_name is not None and not os.path.isdir(file_name):
+                        if file_name is not None and not self.stat_cache.isdir(file_name):
                             refs.append(os.path.normpath(file_name))
                     self._overrides["builtin"][key] = refs
                 if key == "destination":
@@ -138,7 +147,7 @@ class Settings(object):
                             file_name = os.path.join(directory, os.path.basename(file_name))
                         if (
                             file_name is not None and
-                            (not os.path.exists(file_name) or not os.path.isdir(file_name))
+                            not self.stat_cache.isdir(file_name)
                         ):
                             self._overrides["builtin"][key] = file_name
             else:
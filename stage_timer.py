@@ -0,0 +1,124 @@
+import sys
+import timeit
+
+if sys.version_info >= (3, 0):
+    string_types = (str,)
+else:
+    string_types = (str, unicode)
+
+
+def text_size(data):
+    ''' return the number of characters of a text or a list of texts, None for anything else '''
+    if isinstance(data, string_types):
+        return len(data)
+    if isinstance(data, (list, tuple)):
+        sizes = [text_size(item) for item in data]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+    return None
+
+
+class StageTimer(object):
+    '''
+    Record how long the stages of a render take.
+
+    Each named stage keeps its wall time, the number of times it ran and
+    the characters it was given and returned (stages working on the
+    element tree have no size), summed over all of its runs.  Stages are
+    reported in the order they started; a stage includes the time of
+    the stages that ran inside it.
+    '''
+
+    def __init__(self):
+        self.stages = {}
+        self.order = []
+
+    def stage(self, name):
+        ''' return the record of the stage name, added if it is new '''
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {
+                'name': name, 'seconds': 0.0, 'calls': 0, 'size_in': None, 'size_out': None
+            }
+            self.order.append(name)
+        return stage
+
+    def add(self, name, seconds, size_in=None, size_out=None):
+        ''' record a run of a stage '''
+        stage = self.stage(name)
+        stage['seconds'] += seconds
+        stage['calls'] += 1
+        if size_in is not None:
+            stage['size_in'] = (stage['size_in'] or 0) + size_in
+        if size_out is not None:
+            stage['size_out'] = (stage['size_out'] or 0) + size_out
+
+    def run(self, name, function, data, sizes=True):
+        ''' return function(data), recorded as a run of the stage name '''
+        # registered first so that a stage is reported before the ones it runs
+        self.stage(name)
+        # measured first, the stages working on lists may empty them
+        size_in = text_size(data) if sizes else None
+        start = timeit.default_timer()
+        result = function(data)
+        self.add(name, timeit.default_timer() - start, size_in, text_size(result) if sizes else None)
+        return result
+
+    def report(self):
+        ''' return the stages, in the order they started '''
+        return [dict(self.stages[name]) for name in self.order]
+
+    def summary(self):
+        ''' return the lines of a readable report '''
+        lines = []
+        for stage in self.report():
+            line = '%8.1f ms %4dx  %s' % (stage['seconds'] * 1000, stage['calls'], stage['name'])
+            if stage['size_in'] is not None or stage['size_out'] is not None:
+                line += ' (%s -> %s chars)' % (
+                    '-' if stage['size_in'] is None else stage['size_in'],
+                    '-' if stage['size_out'] is None else stage['size_out']
+                )
+            lines.append(line)
+        return lines
+
+
+class PatternProfiler(object):
+    '''
+    Record the regular expression runs of the inline patterns of a render.
+
+    Each pattern keeps the number of times its regular expression was tried,
+    how many of them matched, the time they took and the characters of text
+    they were given to scan.  The time spent building the elements of a
+    match is not included.
+    '''
+
+    def __init__(self):
+        self.patterns = {}
+
+    def add(self, name, seconds, size, matched):
+        ''' record a run of the regular expression of the pattern name '''
+        pattern = self.patterns.get(name)
+        if pattern is None:
+            pattern = self.patterns[name] = {
+                'name': name, 'seconds': 0.0, 'attempts': 0, 'matches': 0, 'chars': 0
+            }
+        pattern['seconds'] += seconds
+        pattern['attempts'] += 1
+        pattern['chars'] += size
+        if matched:
+            pattern['matches'] += 1
+
+    def report(self, count=None):
+        ''' return the count (default all) patterns that took the most time, slowest first '''
+        patterns = sorted(self.patterns.values(), key=lambda pattern: pattern['seconds'], reverse=True)
+        return [dict(pattern) for pattern in patterns[:count]]
+
+    def summary(self, count=None):
+        ''' return the lines of a readable report '''
+        return [
+            '%8.1f ms %6d tries %5d matches %9d chars  %s' % (
+                pattern['seconds'] * 1000, pattern['attempts'], pattern['matches'],
+                pattern['chars'], pattern['name']
+            )
+            for pattern in self.report(count)
+        ]
@@ -0,0 +1,108 @@
+import os
+import stat
+import threading
+import time
+
+# number of paths remembered between renders
+SESSION_SIZE = 10000
+# coarsest modification time of the filesystems the folders may be on (FAT)
+MTIME_GRANULARITY = 2
+_session = {}
+_session_lock = threading.Lock()
+
+
+class StatCache(object):
+    '''
+    Remember the state of the files and folders a render looks at.
+
+    Each path is only stat'ed once during a render, however many links,
+    images or settings point to it.  With ``session`` set, whether a path
+    exists (and is a file or a folder) is also remembered between renders:
+    it is reused as long as the modification time of the folder holding it
+    didn't change, which happens when files are created, removed or renamed
+    in the folder.  Modification times of the files themselves are always
+    read again on the next render.
+
+    Some filesystems only keep folder modification times to the second, or
+    two seconds on FAT and exFAT, so a file created or removed just after a
+    check may not change the time of its folder.  Entries checked within
+    ``MTIME_GRANULARITY`` seconds of the last change of their folder are
+    therefore not reused.  Network mounts whose clock is ahead of the
+    local one, or whose folder times are cached by the client, can still
+    hide a new or removed file until the folder changes again.
+    '''
+
+    def __init__(self, session=False):
+        self.session = session
+        self.results = {}
+
+    def _stat(self, path):
+        try:
+            return self.results[path]
+        except KeyError:
+            pass
+        try:
+            result = os.stat(path)
+        except (OSError, TypeError, ValueError):
+            result = None
+        self.results[path] = result
+        return result
+
+    def _folder(self, path):
+        folder = os.path.dirname(path)
+        return self._stat(folder) if folder and folder != path else None
+
+    def stat(self, path):
+        ''' return the os.stat result of path, or None if it doesn't exist '''
+        if path in self.results:
+            return self.results[path]
+        result = self._stat(path)
+        if self.session:
+            folder = self._folder(path)
+            if folder is not None:
+                with _session_lock:
+                    if len(_session) >= SESSION_SIZE:
+                        _session.clear()
+                    _session[path] = (folder.st_mtime, self._kind(result), time.time())
+        return result
+
+    def _kind(self, result):
+        if result is None:
+            return None
+        elif stat.S_ISDIR(result.st_mode):
+            return 'dir'
+        elif stat.S_ISREG(result.st_mode):
+            return 'file'
+        return 'other'
+
+    def kind(self, path):
+        ''' return 'file', 'dir' or 'other' for a path that exists, else None '''
+        if path in self.results:
+            return self._kind(self.results[path])
+        if self.session:
+            with _session_lock:
+                entry = _session.get(path)
+            if entry is not None:
+                folder = self._folder(path)
+                # the folder may change again within the same mtime tick
+                if folder is not None and folder.st_mtime == entry[0] and \
+                        entry[2] - entry[0] > MTIME_GRANULARITY:
+                    return entry[1]
+        return self._kind(self.stat(path))
+
+    def exists(self, path):
+        ''' os.path.exists '''
+        return self.kind(path) is not None
+
+    def isdir(self, path):
+        ''' os.path.isdir '''
+        return self.kind(path) == 'dir'
+
+    def isfile(self, path):
+        ''' os.path.isfile '''
+        return self.kind(path) == 'file'
+
+    def getmtime(self, path):
+        ''' return the modification time of path, or None if it doesn't exist '''
+        result = self.stat(path)
+        return None if result is None else result.st_mtime
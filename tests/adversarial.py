@@ -0,0 +1,220 @@
+'''
+Benchmark the markdown conversion on pathological input.
+
+Runs outside of Sublime Text like tests/benchmark.py, whose stubs it uses:
+
+    python3 tests/adversarial.py
+    python3 tests/adversarial.py --fuzz 50 --sizes 1000,4000 --configs full
+
+Each case of CASES (long runs of brackets, asterisks, backticks, nested
+quotes...) is built at each of --sizes and the growth of its time with the
+size is reported as an exponent: about 1 for linear time, 2 for quadratic
+time.  --fuzz adds documents made of random runs of markdown syntax.  Cases
+that grow faster than --max-exponent or take longer than --budget seconds
+are reported as slow, and the exit status is 1 if there are any.
+
+Paragraphs with many inline matches (runs of emphasis, escapes, links...)
+switch to the linear inline search once they were matched against too
+many characters.  The "linear" config sets "enable_linear_inline" to use
+it from the start:
+
+    python3 tests/adversarial.py --configs full,linear
+'''
+from __future__ import print_function
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import benchmark
+
+# Markdown syntax the fuzzed documents are made of
+FRAGMENTS = (
+    '[', ']', '(', ')', '![', '](', '*', '**', '_', '__', '`', '```', '<', '>', '</', '&', ';', '"',
+    '#', '\n', '\n\n', ' ', '    ', 'a', '\\', '|', '-', ':', '~~', '^^', '{++', '++}', '{==', '==}',
+    '[^', 'http://', '@', '<div>', '</div>', '<!--', '-->', '1. ', '* ', '> '
+)
+
+
+def repeat(unit, size, end=''):
+    ''' return unit repeated to about size characters, then end '''
+    return unit * max(size // len(unit), 1) + end
+
+
+def nested_lists(size):
+    lines = []
+    length = depth = 0
+    while length < size:
+        lines.append('    ' * depth + '* a')
+        length += len(lines[-1]) + 1
+        depth += 1
+    return '\n'.join(lines)
+
+
+# Pathological documents of about size characters
+CASES = {
+    'brackets': lambda size: repeat('[', size, 'a](b)'),
+    'closed brackets': lambda size: repeat('[', size // 2) + 'a' + repeat(']', size // 2),
+    'reference brackets': lambda size: repeat('[', size, 'a][b]'),
+    'link parens': lambda size: repeat('[a](', size, ')'),
+    'link title quotes': lambda size: '[a](b ' + repeat('"', size, ')'),
+    'image parens': lambda size: repeat('![a](', size, ')'),
+    'asterisks': lambda size: repeat('*', size, 'a*'),
+    'emphasis runs': lambda size: repeat('*a', size, ' *'),
+    'strong runs': lambda size: repeat('**a', size, ' **'),
+    'underscores': lambda size: repeat('_', size, 'a_ '),
+    'smart strong': lambda size: repeat('__a', size, '__ '),
+    'backticks': lambda size: repeat('`', size, ' ``'),
+    'backtick runs': lambda size: ' '.join('`' * length for length in range(1, int(math.sqrt(2 * size)))),
+    'angle brackets': lambda size: repeat('<', size, 'a>'),
+    'autolinks': lambda size: repeat('<', size, 'http://a>'),
+    'automails': lambda size: repeat('<a@', size, '>'),
+    'entities': lambda size: repeat('&', size, 'a;'),
+    'escapes': lambda size: repeat('\\', size, '*'),
+    'line breaks': lambda size: repeat('a  \n', size),
+    'hashes': lambda size: repeat('#', size, ' a'),
+    'closing hashes': lambda size: '# a ' + repeat('#', size, ' b'),
+    'nested quotes': lambda size: repeat('>', size, ' a'),
+    'nested lists': nested_lists,
+    'html blocks': lambda size: repeat('<div>\n', size, '\n\n'),
+    'nested html': lambda size: repeat('<div>', size // 2) + 'a' + repeat('</div>', size // 2) + '\n\n',
+    'unclosed fences': lambda size: repeat('```\na\n', size),
+    'mismatched fences': lambda size: repeat('```\na\n````\n', size),
+    'table pipes': lambda size: 'a | b\n--- | ---\n' + repeat('| ', size),
+    'critic marks': lambda size: repeat('{++a', size, '++}'),
+    'footnotes': lambda size: repeat('[^', size, 'a]'),
+    'duplicate headers': lambda size: repeat('# a\n\n', size)
+}
+
+
+def fuzz_case(seed):
+    ''' return a case made of random runs of a few of the FRAGMENTS '''
+    def generate(size):
+        rng = random.Random(seed)
+        fragments = rng.sample(FRAGMENTS, rng.randint(2, 5))
+        parts = []
+        length = 0
+        while length < size:
+            part = rng.choice(fragments) * rng.choice((1, 1, 2, 3, 8, 30))
+            parts.append(part)
+            length += len(part)
+        return ''.join(parts)
+    return generate
+
+
+def exponent(sizes, seconds):
+    ''' return how the time grows with the size: time ~ size ** exponent '''
+    if seconds[0] <= 0 or seconds[-1] <= 0 or sizes[0] == sizes[-1]:
+        return 0.0
+    return math.log(seconds[-1] / seconds[0]) / math.log(float(sizes[-1]) / sizes[0])
+
+
+def run_case(plugin, stage_timer, filename, generate, sizes, budget, repeat_count):
+    ''' return the times of the builds of the case at each size '''
+    times = []
+    for size in sizes:
+        with open(filename, 'wb') as f:
+            f.write(generate(size).encode('utf-8'))
+        seconds = min(benchmark.build(plugin, stage_timer, filename)[0]['total'] for _ in range(repeat_count))
+        times.append(seconds)
+        if seconds > budget:
+            # don't wait for the larger sizes of a case that is already too slow
+            break
+    return times
+
+
+def run(cases, configs, sizes, budget, max_exponent, repeat_count, report=print):
+    ''' run the cases with each config and return the results '''
+    settings = benchmark.Settings(benchmark.load_default_settings())
+    benchmark.install_sublime_stub(settings)
+    plugin = benchmark.load_plugin()
+    stage_timer = importlib.import_module(benchmark.PACKAGE + '.stage_timer')
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'sizes': sizes,
+        'cases': {},
+        'slow': []
+    }
+    directory = tempfile.mkdtemp(prefix='markdown-preview-adversarial-')
+    filename = os.path.join(directory, 'case.md')
+    try:
+        for config in configs:
+            settings.values = benchmark.load_default_settings()
+            settings.values.update(benchmark.CONFIGS[config])
+            # warm the caches
+            with open(filename, 'wb') as f:
+                f.write(b'# a\n\n*b* `c` [d](e)\n')
+            benchmark.build(plugin, stage_timer, filename)
+            for name in sorted(cases):
+                times = run_case(plugin, stage_timer, filename, cases[name], sizes, budget, repeat_count)
+                growth = exponent(sizes[:len(times)], times)
+                slow = times[-1] > budget or (growth > max_exponent and times[-1] > 0.05)
+                key = '%s/%s' % (config, name)
+                results['cases'][key] = {'seconds': times, 'exponent': growth, 'slow': slow}
+                if slow:
+                    results['slow'].append(key)
+                report('%-36s %s  x^%.2f%s' % (
+                    key, ' '.join('%8.1f ms' % (seconds * 1000) for seconds in times), growth,
+                    '  slow' if slow else ''
+                ))
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the markdown conversion of Markdown Preview on pathological input.')
+    parser.add_argument('--sizes', default='2000,8000', help='comma separated sizes of the cases, in characters')
+    parser.add_argument(
+        '--configs', default='full',
+        help='comma separated settings to build with, out of %s' % ', '.join(sorted(benchmark.CONFIGS))
+    )
+    parser.add_argument('--cases', help='comma separated cases to run, out of %s' % ', '.join(sorted(CASES)))
+    parser.add_argument('--fuzz', type=int, default=0, help='number of random cases to add')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first random case')
+    parser.add_argument('--repeat', type=int, default=1, help='builds of each case and size, the fastest is kept')
+    parser.add_argument('--budget', type=float, default=2.0, help='seconds over which a build is reported as slow')
+    parser.add_argument(
+        '--max-exponent', type=float, default=1.5,
+        help='growth of the time with the size over which a case is reported as slow'
+    )
+    parser.add_argument('--output', help='save the results to this json file')
+    args = parser.parse_args(argv)
+
+    configs = benchmark.split_list(args.configs)
+    for name in configs:
+        if name not in benchmark.CONFIGS:
+            parser.error('unknown config: %s' % name)
+    if args.cases is None:
+        cases = dict(CASES)
+    else:
+        cases = {}
+        for name in benchmark.split_list(args.cases):
+            if name not in CASES:
+                parser.error('unknown case: %s' % name)
+            cases[name] = CASES[name]
+    for seed in range(args.seed, args.seed + args.fuzz):
+        cases['fuzz %d' % seed] = fuzz_case(seed)
+    sizes = sorted(int(size) for size in benchmark.split_list(args.sizes))
+
+    results = run(cases, configs, sizes, args.budget, args.max_exponent, max(args.repeat, 1))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if results['slow']:
+        print('slow: %s' % ', '.join(results['slow']))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
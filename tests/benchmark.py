@@ -0,0 +1,451 @@
+'''
+Benchmark the python-markdown parser and the compiler post-processing.
+
+Runs outside of Sublime Text with the stubs of headless.py, with a
+Python 3 the bundled libraries run on (3.3 to 3.10):
+
+    python3 tests/benchmark.py --sizes 20000,200000 --output results.json
+    python3 tests/benchmark.py --baseline results.json
+
+Synthetic documents are generated with a fixed seed from the features
+listed in FEATURES, then built with each set of settings in CONFIGS like
+the build command builds them.  Each case is built once to warm the
+caches, then timed --repeat times; its peak memory is measured on one
+more build.  The results can be saved as json and compared with a
+previous results file.
+
+With --critic-sizes, the critic marks of documents of those sizes are
+also stripped by the CriticDump class the critic module replaced and by
+CriticStripper, which must give the same text.
+'''
+from __future__ import print_function
+import argparse
+import copy
+import importlib
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from headless import PACKAGE, Settings, load_default_settings, install_sublime_stub, load_plugin  # noqa: E402
+
+# Settings of each benchmarked configuration, over the default settings
+CONFIGS = {
+    'default': {},
+    'full': {
+        'enabled_extensions': [
+            'default', 'codehilite', 'tasklist', 'githubemoji', 'magiclink', 'insert', 'delete',
+            'headeranchor', 'admonitionicon', 'progressbar', 'def_list', 'abbr', 'attr_list'
+        ],
+        'strip_critic_marks': 'accept'
+    },
+    'linear': {
+        'enabled_extensions': [
+            'default', 'codehilite', 'tasklist', 'githubemoji', 'magiclink', 'insert', 'delete',
+            'headeranchor', 'admonitionicon', 'progressbar', 'def_list', 'abbr', 'attr_list'
+        ],
+        'strip_critic_marks': 'accept',
+        'enable_linear_inline': True
+    },
+    'simple': {
+        'enabled_extensions': ['extra'],
+        'html_simple': True,
+        'strip_critic_marks': 'view'
+    }
+}
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+    'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud '
+    'exercitation ullamco laboris nisi aliquip ex ea commodo consequat'
+).split()
+EMOJI = (':smile:', ':+1:', ':heart:', ':rocket:', ':warning:', ':tada:')
+LANGUAGES = ('python', 'javascript', 'c', 'html')
+
+def words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def inline_text(rng, count):
+    ''' return a sentence with some inline markup '''
+    parts = []
+    for _ in range(count):
+        choice = rng.random()
+        if choice < 0.08:
+            parts.append('*%s*' % words(rng, 2))
+        elif choice < 0.14:
+            parts.append('**%s**' % words(rng, 2))
+        elif choice < 0.19:
+            parts.append('`%s()`' % rng.choice(WORDS))
+        elif choice < 0.23:
+            parts.append('[%s](http://example.com/%s)' % (words(rng, 2), rng.choice(WORDS)))
+        else:
+            parts.append(rng.choice(WORDS))
+    return ' '.join(parts).capitalize() + '.'
+
+
+def paragraph(rng, index):
+    return '\n'.join(inline_text(rng, rng.randint(8, 14)) for _ in range(rng.randint(2, 5)))
+
+
+def headers(rng, index):
+    return '%s %s %d\n\n%s' % ('#' * rng.randint(1, 4), words(rng, 3).title(), index, paragraph(rng, index))
+
+
+def tables(rng, index):
+    columns = rng.randint(2, 5)
+    lines = [
+        '| ' + ' | '.join(words(rng, 2).title() for _ in range(columns)) + ' |',
+        '| ' + ' | '.join(rng.choice((':---', '---:', ':---:', '---')) for _ in range(columns)) + ' |'
+    ]
+    for _ in range(rng.randint(3, 10)):
+        lines.append('| ' + ' | '.join(inline_text(rng, 3) for _ in range(columns)) + ' |')
+    return '\n'.join(lines)
+
+
+def lists(rng, index):
+    lines = []
+
+    def add(depth):
+        ordered = rng.random() < 0.4
+        for number in range(1, rng.randint(2, 5)):
+            marker = '%d.' % number if ordered else rng.choice('*-+')
+            task = rng.choice(('[ ] ', '[x] ')) if not ordered and rng.random() < 0.3 else ''
+            lines.append('    ' * depth + marker + ' ' + task + inline_text(rng, rng.randint(4, 10)))
+            if depth < 3 and rng.random() < 0.3:
+                add(depth + 1)
+    add(0)
+    return '\n'.join(lines)
+
+
+def code(rng, index):
+    lines = ['``` ' + rng.choice(LANGUAGES)]
+    for number in range(rng.randint(3, 15)):
+        lines.append('%sdef %s_%d(value):  # %s' % ('    ' * rng.randint(0, 2), rng.choice(WORDS), number, words(rng, 3)))
+    lines.append('```')
+    return '\n'.join(lines)
+
+
+def footnotes(rng, index):
+    return '%s[^note%d] %s\n\n[^note%d]: %s' % (
+        inline_text(rng, 8), index, inline_text(rng, 6), index, inline_text(rng, 10)
+    )
+
+
+def html(rng, index):
+    return '%s <span class="note">%s</span> <kbd>Ctrl</kbd>+<kbd>%s</kbd>.\n\n<div class="box">\n<p>%s</p>\n</div>' % (
+        inline_text(rng, 6), words(rng, 3), rng.choice('ABC'), words(rng, 8)
+    )
+
+
+def emoji(rng, index):
+    return ' '.join(
+        rng.choice(EMOJI) if rng.random() < 0.2 else rng.choice(WORDS) for _ in range(rng.randint(20, 40))
+    ).capitalize() + '.'
+
+
+def critic(rng, index):
+    return '%s {++%s++} %s {--%s--} {~~%s~>%s~~} {==%s==}{>>%s<<}.' % (
+        inline_text(rng, 5), words(rng, 2), inline_text(rng, 4), words(rng, 2),
+        rng.choice(WORDS), rng.choice(WORDS), words(rng, 3), words(rng, 4)
+    )
+
+
+# The blocks of the documents, the paragraphs and headers are always there
+FEATURES = {
+    'tables': tables,
+    'lists': lists,
+    'code': code,
+    'footnotes': footnotes,
+    'html': html,
+    'emoji': emoji,
+    'critic': critic
+}
+
+
+class CriticDump(object):
+    ''' the regular expression that stripped the critic marks before the critic module, as it was '''
+    RE_CRITIC = re.compile(
+        r'''
+            ((?P<open>\{)
+                (?:
+                    (?P<ins_open>\+{2})(?P<ins_text>.*?)(?P<ins_close>\+{2})
+                  | (?P<del_open>\-{2})(?P<del_text>.*?)(?P<del_close>\-{2})
+                  | (?P<mark_open>\={2})(?P<mark_text>.*?)(?P<mark_close>\={2})
+                  | (?P<comment>(?P<com_open>\>{2})(?P<com_text>.*?)(?P<com_close>\<{2}))
+                  | (?P<sub_open>\~{2})(?P<sub_del_text>.*?)(?P<sub_mid>\~\>)(?P<sub_ins_text>.*?)(?P<sub_close>\~{2})
+                )
+            (?P<close>\})|.)
+        ''',
+        re.MULTILINE | re.DOTALL | re.VERBOSE
+    )
+
+    def process(self, m):
+        if self.accept:
+            if m.group('ins_open'):
+                return m.group('ins_text')
+            elif m.group('del_open'):
+                return ''
+            elif m.group('mark_open'):
+                return m.group('mark_text')
+            elif m.group('com_open'):
+                return ''
+            elif m.group('sub_open'):
+                return m.group('sub_ins_text')
+            else:
+                return m.group(0)
+        else:
+            if m.group('ins_open'):
+                return ''
+            elif m.group('del_open'):
+                return m.group('del_text')
+            elif m.group('mark_open'):
+                return m.group('mark_text')
+            elif m.group('com_open'):
+                return ''
+            elif m.group('sub_open'):
+                return m.group('sub_del_text')
+            else:
+                return m.group(0)
+
+    def dump(self, source, accept):
+        text = ''
+        self.accept = accept
+        for m in self.RE_CRITIC.finditer(source):
+            text += self.process(m)
+        return text
+
+
+def generate_corpus(size, features, seed=0):
+    ''' return a document of about size characters made of the blocks of features '''
+    rng = random.Random(seed)
+    generators = [paragraph, headers] + [FEATURES[name] for name in sorted(features)]
+    blocks = []
+    length = 0
+    while length < size:
+        block = rng.choice(generators)(rng, len(blocks))
+        blocks.append(block)
+        length += len(block) + 2
+    return '\n\n'.join(blocks) + '\n'
+
+
+def build(plugin, stage_timer, filename):
+    ''' build filename like the build command does and return its timings and html size '''
+    compiler = plugin.MarkdownCompiler()
+    compiler.setup(plugin.FileView(filename))
+    compiler.timer = stage_timer.StageTimer()
+    start = default_timer()
+    page = compiler.render_page(compiler.get_contents(True))
+    total = default_timer() - start
+    stages = dict((stage['name'], stage['seconds']) for stage in compiler.timer.report())
+    return {
+        'total': total,
+        'convert': stages.get('convert', 0.0),
+        'postprocess': stages.get('postprocess', 0.0) + stages.get('postprocess html', 0.0)
+    }, len(page.html())
+
+
+def peak_memory(plugin, stage_timer, filename):
+    ''' return the most memory a build of filename allocates, in bytes (None without tracemalloc) '''
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    try:
+        build(plugin, stage_timer, filename)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def run_case(plugin, stage_timer, settings, config, filename, repeat, memory=True):
+    ''' return the results of building filename with the settings of config '''
+    settings.values = load_default_settings()
+    settings.values.update(copy.deepcopy(CONFIGS[config]))
+    runs = []
+    html_size = None
+    for _ in range(repeat + 1):
+        timings, html_size = build(plugin, stage_timer, filename)
+        runs.append(timings)
+    # the first build warms the caches
+    runs = runs[1:]
+    result = {'html_size': html_size}
+    for name in ('total', 'convert', 'postprocess'):
+        values = [timings[name] for timings in runs]
+        result[name] = {'min': min(values), 'median': median(values)}
+    result['peak_memory'] = peak_memory(plugin, stage_timer, filename) if memory else None
+    return result
+
+
+def run(sizes, features, configs, repeat, seed, memory=True, report=print):
+    ''' run the benchmark and return its results '''
+    settings = Settings(load_default_settings())
+    install_sublime_stub(settings)
+    plugin = load_plugin()
+    stage_timer = importlib.import_module(PACKAGE + '.stage_timer')
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'repeat': repeat,
+        'seed': seed,
+        'features': sorted(features),
+        'cases': {}
+    }
+    directory = tempfile.mkdtemp(prefix='markdown-preview-benchmark-')
+    try:
+        for size in sizes:
+            filename = os.path.join(directory, 'corpus-%d.md' % size)
+            with open(filename, 'wb') as f:
+                f.write(generate_corpus(size, features, seed).encode('utf-8'))
+            for config in configs:
+                name = '%s-%d' % (config, size)
+                case = run_case(plugin, stage_timer, settings, config, filename, repeat, memory)
+                case['size'] = os.path.getsize(filename)
+                results['cases'][name] = case
+                report(format_case(name, case))
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def run_critic(critic, sizes, repeat, seed, report=print):
+    ''' return the times CriticDump and CriticStripper take to accept and reject the marks of documents '''
+    results = {}
+    for size in sizes:
+        text = generate_corpus(size, ['critic'], seed)
+        for accept in (True, False):
+            mode = 'accept' if accept else 'reject'
+            times = {'dump': [], 'stripper': []}
+            for _ in range(repeat):
+                start = default_timer()
+                dumped = CriticDump().dump(text, accept)
+                times['dump'].append(default_timer() - start)
+                start = default_timer()
+                stripped = critic.strip_critic(text, mode)
+                times['stripper'].append(default_timer() - start)
+                if stripped != dumped:
+                    raise AssertionError('CriticStripper and CriticDump differ on critic-%s-%d' % (mode, size))
+            name = 'critic-%s-%d' % (mode, size)
+            case = {'size': len(text)}
+            for stripper, values in times.items():
+                case[stripper] = {'min': min(values), 'median': median(values)}
+            results[name] = case
+            report('%-20s %8.1f ms CriticDump %8.1f ms CriticStripper %6.1fx' % (
+                name, case['dump']['median'] * 1000, case['stripper']['median'] * 1000,
+                case['dump']['median'] / max(case['stripper']['median'], 1e-9)
+            ))
+    return results
+
+
+def format_case(name, case):
+    memory = '-' if case['peak_memory'] is None else '%.1f MB' % (case['peak_memory'] / 1048576.0)
+    return '%-20s %8.1f ms total %8.1f ms convert %8.1f ms postprocess %10s peak' % (
+        name, case['total']['median'] * 1000, case['convert']['median'] * 1000,
+        case['postprocess']['median'] * 1000, memory
+    )
+
+
+def compare(results, baseline, threshold, report=print):
+    ''' report how the median times of the cases changed since baseline, return the slower cases '''
+    slower = []
+    if baseline.get('features') != results['features'] or baseline.get('seed') != results['seed']:
+        report('warning: the baseline documents were generated with other features or seed')
+    for name in sorted(results['cases']):
+        old = baseline['cases'].get(name)
+        if old is None:
+            continue
+        new = results['cases'][name]
+        ratios = []
+        for stage in ('total', 'convert', 'postprocess'):
+            before = old[stage]['median']
+            ratios.append(new[stage]['median'] / before if before else 1.0)
+        mark = ''
+        if ratios[0] > threshold:
+            mark = '  slower'
+            slower.append(name)
+        elif ratios[0] < 1.0 / threshold:
+            mark = '  faster'
+        report('%-20s %6.2fx total %6.2fx convert %6.2fx postprocess%s' % ((name,) + tuple(ratios) + (mark,)))
+    return slower
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the markdown conversion of Markdown Preview.')
+    parser.add_argument('--sizes', default='10000,100000', help='comma separated document sizes, in characters')
+    parser.add_argument(
+        '--features', default=','.join(sorted(FEATURES)),
+        help='comma separated features of the documents, out of %s' % ', '.join(sorted(FEATURES))
+    )
+    parser.add_argument(
+        '--configs', default=','.join(sorted(CONFIGS)),
+        help='comma separated settings to build with, out of %s' % ', '.join(sorted(CONFIGS))
+    )
+    parser.add_argument('--repeat', type=int, default=5, help='timed builds of each case')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated documents')
+    parser.add_argument('--no-memory', action='store_true', help="don't measure the peak memory")
+    parser.add_argument(
+        '--critic-sizes', default='',
+        help='comma separated sizes of the documents to strip the critic marks of with CriticDump and CriticStripper'
+    )
+    parser.add_argument('--output', help='save the results to this json file')
+    parser.add_argument('--baseline', help='compare with the results saved in this json file')
+    parser.add_argument(
+        '--threshold', type=float, default=1.1, help='ratio of the times over which a case is reported as slower'
+    )
+    args = parser.parse_args(argv)
+
+    features = split_list(args.features)
+    configs = split_list(args.configs)
+    for name in features:
+        if name not in FEATURES:
+            parser.error('unknown feature: %s' % name)
+    for name in configs:
+        if name not in CONFIGS:
+            parser.error('unknown config: %s' % name)
+
+    results = run(
+        [int(size) for size in split_list(args.sizes)], features, configs,
+        max(args.repeat, 1), args.seed, not args.no_memory
+    )
+    critic_sizes = [int(size) for size in split_list(args.critic_sizes)]
+    if critic_sizes:
+        critic = importlib.import_module(PACKAGE + '.critic')
+        results['critic'] = run_critic(critic, critic_sizes, max(args.repeat, 1), args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print('compared with %s (%s):' % (args.baseline, baseline.get('date')))
+        compare(results, baseline, args.threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+'''
+Load the plugin outside of Sublime Text for the tests, with the stubs of
+headless.py.  Run the tests with a Python 3 the bundled libraries
+run on:
+
+    python3 -m unittest discover -s tests
+'''
+import importlib
+
+import benchmark
+
+_loaded = {}
+
+
+def load_plugin():
+    ''' return the main module of the plugin and the stub of its settings, loaded once '''
+    if not _loaded:
+        settings = benchmark.Settings(benchmark.load_default_settings())
+        benchmark.install_sublime_stub(settings)
+        _loaded['plugin'] = benchmark.load_plugin()
+        _loaded['settings'] = settings
+    return _loaded['plugin'], _loaded['settings']
+
+
+def load_module(name):
+    ''' return a module of the plugin, such as "critic" or "markdown.inlinepatterns" '''
+    load_plugin()
+    return importlib.import_module(benchmark.PACKAGE + '.' + name)
+
+
+def reset_settings(**values):
+    ''' reset the settings to the defaults, then set values '''
+    settings = load_plugin()[1]
+    settings.values = benchmark.load_default_settings()
+    settings.values.update(values)
+    return settings
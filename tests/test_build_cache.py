@@ -0,0 +1,121 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import support
+
+# 1x1 gif images, black and white
+BLACK_GIF = b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x00\x00\x00\x00\x00,' \
+    b'\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+WHITE_GIF = b'GIF89a\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00!\xf9\x04\x00\x00\x00\x00\x00,' \
+    b'\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+
+
+class BuildCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = support.load_plugin()[0]
+        self.directory = tempfile.mkdtemp(prefix='markdown-preview-test-')
+        self.settings = support.reset_settings(
+            path_tempfile=self.directory,
+            enabled_extensions=['default', 'b64(base_path=%s)' % self.directory],
+            image_path_conversion='none'
+        )
+        self.mdfile = os.path.join(self.directory, 'doc.md')
+        self.htmlfile = os.path.join(self.directory, 'doc.html')
+        self.image = os.path.join(self.directory, 'image.gif')
+        with open(self.mdfile, 'w') as f:
+            f.write('# Image\n\n![image](image.gif)\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_image(self, data, mtime):
+        with open(self.image, 'wb') as f:
+            f.write(data)
+        os.utime(self.image, (mtime, mtime))
+
+    def build(self):
+        command = self.plugin.MarkdownBuildCommand()
+        messages = command.build(self.plugin.FileView(self.mdfile), 'markdown', self.settings)
+        with open(self.htmlfile) as f:
+            return messages, f.read()
+
+    def test_changed_b64_image_is_rebuilt(self):
+        self.write_image(BLACK_GIF, 1000000000)
+        messages, html = self.build()
+        self.assertNotIn('(unchanged)', messages[0])
+        self.assertTrue('src="data:image/gif;base64,' in html)
+        black = html
+
+        messages, html = self.build()
+        self.assertIn('(unchanged)', messages[0])
+
+        self.write_image(WHITE_GIF, 1000000100)
+        messages, html = self.build()
+        self.assertNotIn('(unchanged)', messages[0])
+        self.assertTrue('src="data:image/gif;base64,' in html)
+        self.assertTrue(black != html)
+
+    def test_changed_reference_file_is_rebuilt(self):
+        self.settings.set('strip_yaml_front_matter', True)
+        references = os.path.join(self.directory, 'references.md')
+        with open(self.mdfile, 'w') as f:
+            f.write('---\nreferences: references.md\n---\n[a link][a]\n')
+        for mtime, url in ((1000000000, 'http://a.example'), (1000000100, 'http://b.example')):
+            with open(references, 'w') as f:
+                f.write('[a]: %s\n' % url)
+            os.utime(references, (mtime, mtime))
+            messages, html = self.build()
+            self.assertNotIn('(unchanged)', messages[0])
+            self.assertIn('href="%s"' % url, html)
+        self.assertIn('(unchanged)', self.build()[0][0])
+
+    def test_hit_does_not_rewrite_the_index(self):
+        self.write_image(BLACK_GIF, 1000000000)
+        self.build()
+        index = os.path.join(self.directory, support.load_module('build_cache').BUILD_CACHE_FILE)
+        os.utime(index, (1000000000, 1000000000))
+        messages, html = self.build()
+        self.assertIn('(unchanged)', messages[0])
+        self.assertEqual(os.path.getmtime(index), 1000000000)
+
+    def test_build_all_in_processes(self):
+        self.write_image(BLACK_GIF, 1000000000)
+        files = [self.mdfile]
+        for name in ('a', 'b', 'c'):
+            files.append(os.path.join(self.directory, name + '.md'))
+            with open(files[-1], 'w') as f:
+                f.write('# %s\n\n![image](image.gif)\n' % name)
+        # the workers read the settings of the user settings file
+        os.mkdir(os.path.join(self.directory, 'User'))
+        with open(os.path.join(self.directory, 'User', 'MarkdownPreview.sublime-settings'), 'w') as f:
+            json.dump(dict((name, self.settings.get(name)) for name in (
+                'path_tempfile', 'enabled_extensions', 'image_path_conversion'
+            )), f)
+        sublime = sys.modules['sublime']
+        packages_path = sublime.packages_path
+        sublime.packages_path = lambda: self.directory
+        self.addCleanup(setattr, sublime, 'packages_path', packages_path)
+
+        command = self.plugin.MarkdownBuildAllCommand()
+        output = []
+        command.puts = output.append
+        command.build_all(files, 'markdown', self.settings, 2)
+        self.assertEqual(sorted(line for line in output if line.endswith('.html')), sorted(
+            '        ->' + os.path.splitext(mdfile)[0] + '.html' for mdfile in files
+        ))
+        messages, html = self.build()
+        self.assertIn('(unchanged)', messages[0])
+        self.assertTrue('src="data:image/gif;base64,' in html)
+
+        # the workers stored every build in the index
+        del output[:]
+        command.build_all(files, 'markdown', self.settings, 2)
+        self.assertEqual(len([line for line in output if line.endswith('.html (unchanged)')]), len(files))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import time
+import unittest
+
+import support
+
+
+class CriticTest(unittest.TestCase):
+
+    def setUp(self):
+        self.critic = support.load_module('critic')
+
+    def test_marks(self):
+        text = 'a {++b++} {--c--} {~~d~>e~~} {==f==}{>>g<<} h'
+        self.assertEqual(self.critic.strip_critic(text, 'accept'), 'a b  e f h')
+        self.assertEqual(self.critic.strip_critic(text, 'reject'), 'a  c d f h')
+
+    def test_unclosed_openers(self):
+        self.assertEqual(self.critic.strip_critic('{++a {--b--} {~~c~>d', 'accept'), '{++a  {~~c~>d')
+
+    def test_chunks(self):
+        text = 'a {++b c++} d {~~e f~>g h~~} i {--j--} {==k==}{>>l<<} {++m {~~n~>o {-- ~~}'
+        for mode in self.critic.CRITIC_MODES:
+            whole = self.critic.strip_critic(text, mode)
+            stripper = self.critic.CriticStripper(mode)
+            # every cut in two, then every cut in three, inside marks and their delimiters too
+            for i in range(len(text) + 1):
+                self.assertEqual(stripper.feed(text[:i]) + stripper.feed(text[i:]) + stripper.close(), whole)
+                for j in range(i, len(text) + 1):
+                    output = stripper.feed(text[:i]) + stripper.feed(text[i:j]) + stripper.feed(text[j:])
+                    self.assertEqual(output + stripper.close(), whole, (mode, i, j))
+            # one character at a time
+            self.assertEqual(''.join(stripper.feed(c) for c in text) + stripper.close(), whole)
+
+    def test_unclosed_openers_are_linear(self):
+        for unit in ('{++ ', '{~~a~> ', '{++ {-- {== {>> {~~ '):
+            text = unit * (200000 // len(unit))
+            started = time.time()
+            self.assertEqual(self.critic.strip_critic(text, 'accept'), text)
+            self.assertLess(time.time() - started, 2.0, unit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import unittest
+
+import support
+
+SECTIONS = '# A\n\nsee [x][r], HTML and note[^1]\n\n# B\n\n<b>b</b> text\n\n# A\n\nlast <i>c</i>\n'
+
+
+class IncrementalRenderTest(unittest.TestCase):
+    ''' an incremental render after each edit must give the html of a fresh conversion '''
+
+    def setUp(self):
+        self.plugin = support.load_plugin()[0]
+        self.addCleanup(support.reset_settings)
+
+    def convert(self, text, incremental):
+        support.reset_settings(enable_incremental_render=incremental)
+        compiler = self.plugin.MarkdownCompiler()
+        compiler.setup(self.plugin.FileView(os.path.join(os.path.dirname(__file__), 'test.md')))
+        return compiler.parser_specific_convert(text)
+
+    def check(self, *texts):
+        # the first text fills the caches the edits are rendered with
+        for text in texts:
+            self.assertEqual(self.convert(text, True), self.convert(text, False), text)
+
+    def test_new_reference_definition(self):
+        self.check(SECTIONS, SECTIONS + '\n[r]: http://example.com\n', SECTIONS)
+
+    def test_footnote_added_after_its_use(self):
+        self.check(SECTIONS, SECTIONS + '\n[^1]: a note\n', SECTIONS + '\n[^1]: another note\n', SECTIONS)
+
+    def test_abbreviation_defined_later(self):
+        self.check(SECTIONS, SECTIONS + '\n*[HTML]: Hyper Text Markup Language\n', SECTIONS)
+
+    def test_block_inserted_before_a_cached_section(self):
+        self.check(
+            SECTIONS,
+            '<div>raw</div>\n\nintro <em>x</em>\n\n' + SECTIONS,
+            '# A\n\n' + SECTIONS,
+            'intro\n===\n\n' + SECTIONS,
+            SECTIONS
+        )
+
+    def test_edited_section(self):
+        self.check(SECTIONS, SECTIONS.replace('<b>b</b>', '<b>b</b> <u>u</u>'), SECTIONS.replace('# B', '# A'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import glob
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import benchmark
+import support
+
+# Inline markup next to the matches patterns with lookbehinds skip or make
+LOOKBEHIND_CASES = (
+    '[a][x]![b](c)[d][y] _e_ [f][z]_g_ h_i_ [j]',
+    '![a][x][b](c) \\`d` `e\\` f`',
+    'a---b -- c.... ... _d__ __e__f __g__ "h" \'i\'s',
+    '[a][x] <b@example.com> [c][y] http://d.com/_e_ [f](g)_h_',
+    'a[^1] b[^x] _c_[^x]_d_\n\n[^1]: e'
+)
+
+
+class InlineEngineTest(unittest.TestCase):
+    ''' the linear inline search gives the same html as the default one, but for overlapping markup '''
+
+    def setUp(self):
+        self.plugin = support.load_plugin()[0]
+        self.directory = tempfile.mkdtemp(prefix='markdown-preview-test-')
+        self.filename = os.path.join(self.directory, 'doc.md')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        support.reset_settings()
+
+    def convert(self, text, config, linear):
+        support.reset_settings(**dict(benchmark.CONFIGS[config], enable_linear_inline=linear))
+        with open(self.filename, 'w') as f:
+            f.write(text)
+        compiler = self.plugin.MarkdownCompiler()
+        compiler.setup(self.plugin.FileView(self.filename))
+        return compiler.parser_specific_convert(text)
+
+    def assertSameHtml(self, text, name):
+        for config in ('default', 'full', 'simple'):
+            self.assertEqual(
+                self.convert(text, config, False), self.convert(text, config, True), '%s, %s' % (name, config)
+            )
+
+    def test_sample_documents(self):
+        names = [os.path.join(benchmark.ROOT, name) for name in ('sample.md', 'README.md', 'CHANGES.md')]
+        names += glob.glob(os.path.join(benchmark.ROOT, 'tests', '*.md'))
+        for name in names:
+            with open(name) as f:
+                self.assertSameHtml(f.read(), name)
+        self.assertSameHtml(benchmark.generate_corpus(20000, benchmark.FEATURES), 'corpus')
+
+    def test_lookbehinds(self):
+        for text in LOOKBEHIND_CASES:
+            self.assertSameHtml(text, text)
+
+    def test_overlapping_markup(self):
+        # the difference stated with the enable_linear_inline setting
+        markdown = support.load_module('markdown')
+        self.assertEqual(markdown.Markdown().convert('**a* b*'), '<p><em><em>a</em> b</em></p>')
+        self.assertEqual(markdown.Markdown(linear_inline=True).convert('**a* b*'), '<p>*<em>a</em> b*</p>')
+
+    def test_text_after_a_skipped_match(self):
+        markdown = support.load_module('markdown')
+        inlinepatterns = support.load_module('markdown.inlinepatterns')
+        util = support.load_module('markdown.util')
+
+        class SkipPattern(inlinepatterns.Pattern):
+            ''' "b" and a letter not after an "a", skipped when the letter is an "a" '''
+
+            def handleMatch(self, m):
+                if m.group(2) == 'a':
+                    return None
+                element = util.etree.Element('b')
+                element.text = m.group(2)
+                return element
+
+        class SkipExtension(markdown.Extension):
+            def extendMarkdown(self, md, md_globals):
+                md.inlinePatterns.add('skip', SkipPattern(r'(?<!a)b(\w)'), '_begin')
+
+        # the match after "ba" doesn't see the "a" before it
+        for linear in (False, True):
+            md = markdown.Markdown(extensions=[SkipExtension()], linear_inline=linear)
+            self.assertEqual(md.convert('x bab1 bac bd'), '<p>x ba<b>1</b> bac <b>d</b></p>')
+
+
+class InlineTimeTest(unittest.TestCase):
+    ''' paragraphs with many inline matches take about linear time with the default settings '''
+
+    def setUp(self):
+        self.plugin = support.load_plugin()[0]
+        self.directory = tempfile.mkdtemp(prefix='markdown-preview-test-')
+        self.filename = os.path.join(self.directory, 'doc.md')
+        support.reset_settings()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_many_matches(self):
+        for unit in ('\\\\', '*a* ', '`a` ', '[a] '):
+            text = unit * (16000 // len(unit))
+            with open(self.filename, 'w') as f:
+                f.write(text)
+            compiler = self.plugin.MarkdownCompiler()
+            compiler.setup(self.plugin.FileView(self.filename))
+            started = time.time()
+            compiler.parser_specific_convert(text)
+            self.assertLess(time.time() - started, 2.0, unit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import support
+
+
+class ConvertFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        # markdown/__main__.py imports the markdown package by its own name
+        sys.modules.setdefault('markdown', support.load_module('markdown'))
+        self.cli = support.load_module('markdown.__main__')
+        self.directory = tempfile.mkdtemp(prefix='markdown-preview-test-')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name)) as f:
+            return f.read()
+
+    def test_output_dir_keeps_the_folders(self):
+        files = [self.write('docs/a/index.md', '# A\n'), self.write('docs/b/index.md', '# B\n')]
+        output_dir = os.path.join(self.directory, 'html')
+        self.assertEqual(self.cli.convert_files(files, output_dir=output_dir, jobs=2), 0)
+        self.assertIn('A</h1>', self.read('html/a/index.html'))
+        self.assertIn('B</h1>', self.read('html/b/index.html'))
+
+    def test_built_like_the_build_command(self):
+        text = '---\ntitle: Hello\n---\n[a]\n\n[a]: http://example.com\n'
+        mdfile = self.write('docs/index.md', text)
+        htmlfile = os.path.join(self.directory, 'index.html')
+        plugin = support.load_plugin()[0]
+        settings = support.reset_settings(strip_yaml_front_matter=True)
+        self.assertEqual(self.cli.convert_files([mdfile], jobs=2, settings=settings.values), 0)
+        plugin.MarkdownBuildCommand().build(plugin.FileView(mdfile), 'markdown', settings, htmlfile)
+        html = self.read('docs/index.html')
+        self.assertIn('<title>Hello</title>', html)
+        self.assertIn('<a href="http://example.com">a</a>', html)
+        self.assertEqual(html, self.read('index.html'))
+
+    def test_settings(self):
+        mdfile = self.write('index.md', '# A\n')
+        settings = self.cli.load_settings()
+        settings['html_simple'] = True
+        self.assertEqual(self.cli.convert_files([mdfile], jobs=1, settings=settings), 0)
+        html = self.read('index.html')
+        self.assertIn('A</h1>', html)
+        self.assertNotIn('<html>', html)
+
+    def test_same_output_is_refused(self):
+        path = self.write('docs/index.md', '# A\n')
+        files = [path, os.path.join(self.directory, 'docs', '..', 'docs', 'index.md')]
+        output_dir = os.path.join(self.directory, 'html')
+        self.assertEqual(self.cli.convert_files(files, output_dir=output_dir, jobs=1), 2)
+        self.assertFalse(os.path.exists(output_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import random
+import re
+import time
+import unittest
+
+import support
+
+
+class LinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.markdown = support.load_module('markdown')
+        self.inlinepatterns = support.load_module('markdown.inlinepatterns')
+
+    def test_nested_parentheses(self):
+        self.assertEqual(self.markdown.markdown('[a](b(c(d)e)f)'), '<p><a href="b(c(d)e">a</a>f)</p>')
+        self.assertEqual(
+            self.markdown.markdown('[a](http://x/(a(b)c))'), '<p><a href="http://x/(a(b)c">a</a>)</p>'
+        )
+
+    def test_titles_and_angles(self):
+        self.assertEqual(self.markdown.markdown('[a](b(c) "t")'), '<p><a href="b(c)" title="t">a</a></p>')
+        self.assertEqual(self.markdown.markdown('[a](<b c>)'), '<p><a href="b c">a</a></p>')
+        self.assertEqual(self.markdown.markdown('[a](b(c "t")'), '<p>[a](b(c "t")</p>')
+
+    def test_matcher_matches_like_the_regex(self):
+        ip = self.inlinepatterns
+        regex = re.compile('^(.*?)%s(.*?)$' % ip.LINK_RE, re.DOTALL | re.UNICODE)
+        search = re.compile('()%s()' % ip.LINK_RE, re.DOTALL | re.UNICODE)
+        alphabet = ['[', ']', '(', ')', '<', '>', '"', "'", ' ', '\n', 'a', '!', '](', '[a](']
+        rng = random.Random(0)
+        for _ in range(5000):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 20)))
+            expected = regex.match(text)
+            found = ip.LINK_MATCHER.match(text)
+            self.assertEqual(expected and expected.groups(), found and found.groups(), text)
+            pos = rng.randint(0, len(text))
+            expected = search.search(text, pos)
+            found = ip.LINK_MATCHER.search(text, pos)
+            self.assertEqual(expected and expected.groups(), found and found.groups(), (text, pos))
+
+    def test_unclosed_links_are_linear(self):
+        for unit in ('[a](', '[a](b(', '[a](<', '[a](b "'):
+            text = unit * (100000 // len(unit))
+            started = time.time()
+            self.assertIsNone(self.inlinepatterns.LINK_MATCHER.match(text))
+            self.assertLess(time.time() - started, 2.0, unit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+
+
+class StatCacheTest(unittest.TestCase):
+    ''' each render checks the files it points to with a new session cache '''
+
+    def setUp(self):
+        self.stat_cache = support.load_module('stat_cache')
+        self.stat_cache._session.clear()
+        self.addCleanup(self.stat_cache._session.clear)
+        self.directory = tempfile.mkdtemp(prefix='markdown-preview-test-')
+        self.path = os.path.join(self.directory, 'image.gif')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def render(self):
+        return self.stat_cache.StatCache(session=True).isfile(self.path)
+
+    def set_folder_mtime(self, mtime):
+        os.utime(self.directory, (mtime, mtime))
+
+    def test_file_created_and_removed_between_renders(self):
+        # on a filesystem with coarse times the folder keeps its time
+        self.assertFalse(self.render())
+        mtime = os.path.getmtime(self.directory)
+        open(self.path, 'w').close()
+        self.set_folder_mtime(mtime)
+        self.assertTrue(self.render())
+        os.remove(self.path)
+        self.set_folder_mtime(mtime)
+        self.assertFalse(self.render())
+
+    def test_old_folder_is_reused_until_it_changes(self):
+        self.set_folder_mtime(1000000000)
+        self.assertFalse(self.render())
+        open(self.path, 'w').close()
+        self.set_folder_mtime(1000000000)
+        self.assertFalse(self.render())
+        self.set_folder_mtime(1000000002)
+        self.assertTrue(self.render())
+
+
+if __name__ == '__main__':
+    unittest.main()